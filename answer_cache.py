@@ -0,0 +1,89 @@
+from typing import Dict, Any, Optional
+from collections import OrderedDict
+import json
+import os
+import time
+
+from question_index import QuestionIndex
+
+
+class AnswerCache:
+    """LRU + TTL cache of AI-suggested answers keyed by question cluster."""
+
+    DEFAULT_TTL = 30 * 60  # seconds
+    DEFAULT_MAX_ENTRIES = 500
+
+    def __init__(self, ttl: float = None, max_entries: int = None, path: str = None):
+        self.ttl = ttl or self.DEFAULT_TTL
+        self.max_entries = max_entries or self.DEFAULT_MAX_ENTRIES
+        self.path = path
+        self.entries = OrderedDict()  # key -> {'answer': str, 'created_at': epoch}
+        self.hits = 0
+        self.misses = 0
+
+        if self.path and os.path.exists(self.path):
+            self._load()
+
+    @staticmethod
+    def key_for(question: str) -> str:
+        """Normalize a question so every phrasing in a cluster shares a key."""
+        return ' '.join(sorted(QuestionIndex.tokenize(question)))
+
+    def get(self, question: str) -> Optional[str]:
+        """Return a fresh cached answer for the question, if any."""
+        key = self.key_for(question)
+        entry = self.entries.get(key)
+        if entry is None or time.time() - entry['created_at'] > self.ttl:
+            if entry is not None:
+                del self.entries[key]
+            self.misses += 1
+            return None
+
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry['answer']
+
+    def put(self, question: str, answer: str) -> None:
+        """Store an answer, evicting the least recently used entries."""
+        key = self.key_for(question)
+        self.entries[key] = {'answer': answer, 'created_at': time.time()}
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+        if self.path:
+            self._save()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get hit/miss counters for the cache."""
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self.entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0
+        }
+
+    def _load(self) -> None:
+        """Load unexpired entries persisted by a previous run."""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                stored = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Error loading answer cache: {e}")
+            return
+
+        now = time.time()
+        for key, entry in stored.items():
+            if now - entry['created_at'] <= self.ttl:
+                self.entries[key] = entry
+
+    def _save(self) -> None:
+        """Atomically write the cache to disk."""
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.entries, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Error saving answer cache: {e}")
@@ -0,0 +1,224 @@
+"""Offline analysis of archived chat dumps, split across a process pool.
+
+Input files are JSON arrays of messages (like comments.json) or JSONL with
+one message per line; both are read incrementally, so a file never has to
+fit in memory as one list. Messages are cut into chunks that worker
+processes analyze with their own MessageProcessor, and the partial
+aggregates are merged per stream in input order (MessageProcessor.merge).
+Messages belong to the stream named by --stream-key, falling back to the
+file name. Each stream's processed data is written to <out>/<stream>.json.
+
+Usage:
+  python batch_analysis.py archive/*.jsonl
+  python batch_analysis.py comments.json --workers 4 --out reports
+  python batch_analysis.py chat.jsonl --stream-key video_id --chunk-size 20000
+"""
+from typing import List, Dict, Any, Iterator, Tuple
+from collections import deque
+import argparse
+import json
+import multiprocessing
+import os
+import re
+import time
+
+from message_processor import MessageProcessor
+
+DEFAULT_CHUNK_SIZE = 10000
+READ_SIZE = 1 << 20  # characters read at a time from a JSON array
+PENDING_PER_WORKER = 2  # chunks queued per worker; bounds memory on fast input
+
+
+def iter_json_array(f, read_size: int = READ_SIZE) -> Iterator[Any]:
+    """Yield the elements of a top-level JSON array from a text file one at a time."""
+    decoder = json.JSONDecoder()
+    buffer = f.read(read_size).lstrip()
+    if not buffer.startswith('['):
+        raise ValueError("expected a JSON array")
+    buffer = buffer[1:]
+    position = 0
+    eof = False
+    while True:
+        # Skip the separator before the next element
+        while True:
+            while position < len(buffer) and buffer[position] in ' \t\r\n,':
+                position += 1
+            if position < len(buffer) or eof:
+                break
+            buffer, position = f.read(read_size), 0
+            eof = not buffer
+        if position >= len(buffer):
+            raise ValueError("unterminated JSON array")
+        if buffer[position] == ']':
+            return
+        try:
+            element, end = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            # The element runs past the buffer: read more and retry
+            more = '' if eof else f.read(read_size)
+            if not more:
+                raise
+            eof = False
+            buffer, position = buffer[position:] + more, 0
+            continue
+        if end == len(buffer) and not eof:
+            # A number may continue in the next read
+            more = f.read(read_size)
+            if more:
+                buffer, position = buffer[position:] + more, 0
+                continue
+            eof = True
+        yield element
+        position = end
+
+
+def iter_records(path: str) -> Iterator[Any]:
+    """Messages in a file: parsed dicts from a JSON array, raw lines from JSONL.
+
+    JSONL lines are left for the workers to parse.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        first = f.read(1)
+        while first and first.isspace():
+            first = f.read(1)
+        f.seek(0)
+        if first == '[':
+            yield from iter_json_array(f)
+            return
+        for line in f:
+            if line.strip():
+                yield line
+
+
+def iter_chunks(paths: List[str], chunk_size: int) -> Iterator[Tuple[str, List[Any]]]:
+    """(source name, records) chunks of at most chunk_size records, in input order."""
+    for path in paths:
+        source = os.path.splitext(os.path.basename(path))[0]
+        chunk = []
+        for record in iter_records(path):
+            chunk.append(record)
+            if len(chunk) >= chunk_size:
+                yield source, chunk
+                chunk = []
+        if chunk:
+            yield source, chunk
+
+
+def analyze_chunk(task: Tuple[str, List[Any], str, bool]) -> Tuple[int, int, Dict[str, Dict[str, Any]]]:
+    """Worker: aggregate one chunk per stream.
+
+    Returns (messages analyzed, records skipped, {stream: processor state
+    without the stored messages}).
+    """
+    source, records, stream_key, dedup = task
+    streams = {}
+    skipped = 0
+    for record in records:
+        if isinstance(record, str):
+            try:
+                record = json.loads(record)
+            except ValueError:
+                skipped += 1
+                continue
+        if not isinstance(record, dict) or not isinstance(record.get('message'), str):
+            skipped += 1
+            continue
+        record.setdefault('username', '')
+        stream = record.get(stream_key) if stream_key else None
+        streams.setdefault(str(stream) if stream is not None else source, []).append(record)
+
+    states = {}
+    for stream, messages in streams.items():
+        processor = MessageProcessor(dedup=dedup)
+        processor.load_messages(messages)
+        # The reports only read the aggregates, so the message texts stay here
+        states[stream] = processor.get_state(include_messages=False)
+    return sum(len(messages) for messages in streams.values()), skipped, states
+
+
+def _ordered_results(pool, tasks: Iterator[Any], max_pending: int) -> Iterator[Any]:
+    """Like pool.imap, but with at most max_pending tasks submitted ahead of the results."""
+    pending = deque()
+    for task in tasks:
+        pending.append(pool.apply_async(analyze_chunk, (task,)))
+        if len(pending) >= max_pending:
+            yield pending.popleft().get()
+    while pending:
+        yield pending.popleft().get()
+
+
+def run(paths: List[str], workers: int = None, chunk_size: int = DEFAULT_CHUNK_SIZE,
+        stream_key: str = None, dedup: bool = True) -> Tuple[Dict[str, MessageProcessor], Dict[str, Any]]:
+    """Analyze the files and return ({stream: merged processor}, run stats)."""
+    workers = workers or os.cpu_count() or 1
+    tasks = (
+        (source, records, stream_key, dedup)
+        for source, records in iter_chunks(paths, chunk_size)
+    )
+    processors = {}
+    stats = {'messages': 0, 'skipped': 0, 'chunks': 0}
+    started = time.perf_counter()
+
+    def merge(result):
+        analyzed, skipped, states = result
+        stats['messages'] += analyzed
+        stats['skipped'] += skipped
+        stats['chunks'] += 1
+        for stream, state in states.items():
+            partial = MessageProcessor(dedup=dedup)
+            partial.load_state(state)
+            if stream in processors:
+                processors[stream].merge(partial)
+            else:
+                processors[stream] = partial
+
+    if workers == 1:
+        for task in tasks:
+            merge(analyze_chunk(task))
+    else:
+        with multiprocessing.Pool(workers) as pool:
+            for result in _ordered_results(pool, tasks, workers * PENDING_PER_WORKER):
+                merge(result)
+
+    stats['seconds'] = time.perf_counter() - started
+    stats['workers'] = workers
+    return processors, stats
+
+
+def report_path(out_dir: str, stream: str) -> str:
+    name = re.sub(r'[^\w.-]+', '_', stream).strip('._') or 'stream'
+    return os.path.join(out_dir, f"{name}.json")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('paths', nargs='+', help='JSON array or JSONL chat dumps')
+    parser.add_argument('--out', default='reports', help='directory for the per-stream reports')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: CPU count)')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='messages per worker task')
+    parser.add_argument('--stream-key', help='message field naming its stream (default: the file name)')
+    parser.add_argument('--no-dedup', action='store_true', help='count duplicate messages individually')
+    args = parser.parse_args()
+
+    processors, stats = run(
+        args.paths, workers=args.workers, chunk_size=args.chunk_size,
+        stream_key=args.stream_key, dedup=not args.no_dedup
+    )
+
+    os.makedirs(args.out, exist_ok=True)
+    print(f"{'stream':<30} {'messages':>10} {'users':>8}  report")
+    for stream, processor in processors.items():
+        path = report_path(args.out, stream)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(processor.get_processed_data(), f, ensure_ascii=False, indent=2, default=str)
+        engagement = processor.get_processed_data().get('engagement', {})
+        print(f"{stream:<30} {engagement.get('total_messages', 0):>10,} "
+              f"{engagement.get('unique_users', 0):>8,}  {path}")
+
+    rate = stats['messages'] / stats['seconds'] if stats['seconds'] else 0
+    print(f"{stats['messages']:,} messages in {stats['chunks']} chunks, {stats['skipped']} records skipped, "
+          f"{stats['seconds']:.2f}s with {stats['workers']} workers ({rate:,.0f} msgs/sec)")
+
+
+if __name__ == '__main__':
+    main()
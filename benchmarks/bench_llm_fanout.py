@@ -0,0 +1,53 @@
+"""Compare sequential and concurrent LLM fan-out against the stub server.
+
+Usage: python benchmarks/bench_llm_fanout.py [delay_seconds]
+"""
+import asyncio
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from chat_analyzer import StreamChatAnalyzer
+from stub_llm_server import start_stub_server
+
+
+def main():
+    delay = float(sys.argv[1]) if len(sys.argv) > 1 else 0.2
+    server, base_url = start_stub_server(delay=delay)
+    with open(os.path.join(ROOT, 'comments.json')) as f:
+        messages = json.load(f)
+    questions = [
+        {'username': f'viewer{i}', 'message': text}
+        for i, text in enumerate([
+            'next game kab hai?',
+            'who is winning right now?',
+            'stream quality low kyu hai?',
+            'can you play kaliya music?'
+        ])
+    ]
+    batch = messages + questions
+
+    sequential = StreamChatAnalyzer('stub', base_url=base_url)
+    start = time.perf_counter()
+    sequential.process_new_messages(batch)
+    sequential_time = time.perf_counter() - start
+
+    concurrent = StreamChatAnalyzer('stub', base_url=base_url, max_concurrency=8)
+    start = time.perf_counter()
+    result = asyncio.run(concurrent.process_new_messages_async(batch))
+    concurrent_time = time.perf_counter() - start
+
+    server.shutdown()
+    print(f"stub delay: {delay:.2f}s per call")
+    print(f"sequential: {sequential_time:.3f}s")
+    print(f"concurrent: {concurrent_time:.3f}s")
+    print(f"answers:    {sum(1 for q in result['qa'] if q.get('ai_suggested_answer'))}")
+
+
+if __name__ == '__main__':
+    main()
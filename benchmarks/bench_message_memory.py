@@ -0,0 +1,81 @@
+"""Compare memory of per-message dicts against the columnar MessageStore.
+
+Usage: python benchmarks/bench_message_memory.py [num_messages]
+"""
+import os
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from message_processor import MessageProcessor
+from message_store import MessageStore
+
+WORDS = ['bhai', 'kaliya', 'bheem', 'chess', 'game', 'samay', 'stream', 'op', 'gg', 'lol']
+EMOJIS = ['🤣', '😂', '🔥', '👍', '😭']
+
+
+def synthetic_stream(count: int, seed: int = 11):
+    rng = random.Random(seed)
+    users = [f'viewer_{i}' for i in range(max(count // 50, 1))]
+    for _ in range(count):
+        words = rng.choices(WORDS, k=rng.randint(1, 6))
+        if rng.random() < 0.3:
+            words.append(rng.choice(EMOJIS) * rng.randint(1, 3))
+        yield {'username': rng.choice(users), 'message': ' '.join(words)}
+
+
+def measure(build):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = build()
+    elapsed = time.perf_counter() - start
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current, elapsed
+
+
+def build_dicts(messages, processor):
+    """The previous load_messages representation: one enriched dict per message."""
+    now = datetime.now()
+    return [
+        {
+            **msg,
+            'timestamp': now,
+            'id': idx,
+            'has_emoji': bool(processor._find_emojis(msg['message'])),
+            'tags': processor._generate_tags(msg['message'])
+        }
+        for idx, msg in enumerate(messages)
+    ]
+
+
+def build_store(messages, processor):
+    store = MessageStore()
+    now = datetime.now().timestamp()
+    for msg in messages:
+        store.append(msg['username'], msg['message'], now, processor._generate_tags(msg['message']))
+    return store
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    # Materialize inputs up front so both paths share the same message strings
+    messages = list(synthetic_stream(count))
+    processor = MessageProcessor()
+
+    dicts, dict_bytes, dict_time = measure(lambda: build_dicts(messages, processor))
+    del dicts
+    store, store_bytes, store_time = measure(lambda: build_store(messages, processor))
+
+    print(f"messages:    {count}")
+    print(f"dict path:   {dict_bytes / 2**20:8.1f} MiB  {dict_time:.2f}s")
+    print(f"store path:  {store_bytes / 2**20:8.1f} MiB  {store_time:.2f}s")
+    print(f"reduction:   {dict_bytes / store_bytes:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
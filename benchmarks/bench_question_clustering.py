@@ -0,0 +1,102 @@
+"""Compare indexed question clustering against the pairwise Jaccard scan.
+
+Usage: python benchmarks/bench_question_clustering.py [num_questions]
+"""
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from question_index import QuestionIndex
+
+VOCABULARY = [
+    'bhai', 'kab', 'game', 'chess', 'stream', 'kya', 'hai', 'kaun', 'jeetega',
+    'samay', 'video', 'quality', 'kaliya', 'bheem', 'next', 'match', 'kitne',
+    'baje', 'start', 'hoga', 'why', 'what', 'is', 'the', 'score', 'arjun',
+    'pragg', 'gukesh', 'vaishali', 'music', 'play', 'please', 'when', 'live'
+]
+
+
+def synthetic_questions(count: int, seed: int = 7):
+    rng = random.Random(seed)
+    templates = [rng.sample(VOCABULARY, rng.randint(3, 7)) for _ in range(count // 20 + 1)]
+    questions = []
+    for _ in range(count):
+        words = list(rng.choice(templates))
+        # Perturb a template so clusters are near- rather than exact duplicates
+        if rng.random() < 0.5:
+            words[rng.randrange(len(words))] = rng.choice(VOCABULARY)
+        if rng.random() < 0.3:
+            words.append(rng.choice(VOCABULARY))
+        questions.append(' '.join(words) + '?')
+    return questions
+
+
+def are_questions_similar(q1: str, q2: str) -> bool:
+    """The original pairwise check: Jaccard similarity of the cleaned words above 0.5."""
+    def clean_text(text):
+        text = text.lower()
+        text = re.sub(r'[^\w\s]', '', text)
+        return set(text.split())
+
+    words1 = clean_text(q1)
+    words2 = clean_text(q2)
+    intersection = len(words1.intersection(words2))
+    union = len(words1.union(words2))
+    return intersection / union > 0.5 if union > 0 else False
+
+
+def cluster_pairwise(questions):
+    """The original O(n^2) scan from StreamChatAnalyzer._process_questions."""
+    clusters = []
+    assignments = []
+    for question in questions:
+        for cluster_id, representative in enumerate(clusters):
+            if are_questions_similar(question, representative):
+                assignments.append(cluster_id)
+                break
+        else:
+            assignments.append(len(clusters))
+            clusters.append(question)
+    return assignments
+
+
+def cluster_indexed(questions):
+    index = QuestionIndex()
+    assignments = []
+    for question in questions:
+        tokens = index.tokenize(question)
+        cluster_id = index.find(tokens)
+        if cluster_id is None:
+            cluster_id = len(index)
+            index.add(cluster_id, tokens)
+        assignments.append(cluster_id)
+    return assignments
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    questions = synthetic_questions(count)
+
+    start = time.perf_counter()
+    expected = cluster_pairwise(questions)
+    pairwise_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    actual = cluster_indexed(questions)
+    indexed_time = time.perf_counter() - start
+
+    print(f"questions:  {count}")
+    print(f"clusters:   {max(expected) + 1}")
+    print(f"pairwise:   {pairwise_time:.3f}s")
+    print(f"indexed:    {indexed_time:.3f}s ({pairwise_time / indexed_time:.1f}x)")
+    print(f"equivalent: {expected == actual}")
+    if expected != actual:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""Load test: many synthetic channels across sharded worker processes.
+
+Kills one worker part way through and checks that every channel ends with
+its full message count: the crashed shard's channels recover from their
+per-channel event logs, plus the batches the supervisor resends, with the
+default replay size.
+
+Usage: python benchmarks/bench_sharding.py [channels] [workers] [batches]
+"""
+import functools
+import os
+import random
+import signal
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sharding import ShardSupervisor
+from stream_controller import create_stream_controller
+from stub_llm_server import start_stub_server
+
+WORDS = ['bhai', 'kaliya', 'bheem', 'chess', 'game', 'samay', 'op', 'gg', '🤣', '😂', '🔥']
+BATCH_SIZE = 50
+
+
+def synthetic_batch(rng: random.Random, channel: str):
+    return [
+        {
+            'username': f'{channel}_viewer_{rng.randint(0, 200)}',
+            'message': ' '.join(rng.choices(WORDS, k=rng.randint(1, 6)))
+        }
+        for _ in range(BATCH_SIZE)
+    ]
+
+
+def wait_for_counts(supervisor, expected, timeout=60.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        insights = supervisor.collect(timeout=0.2)
+        if all(
+            insights.get(channel, {}).get('metrics', {}).get('total_messages') == count
+            for channel, count in expected.items()
+        ):
+            return True
+    return False
+
+
+def main():
+    num_channels = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    num_workers = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    num_batches = int(sys.argv[3]) if len(sys.argv) > 3 else 40
+
+    server, base_url = start_stub_server()
+    log_dir = tempfile.TemporaryDirectory(prefix='bench-sharding-')
+    factory = functools.partial(
+        create_stream_controller, 'stub', base_url=base_url, event_log_dir=log_dir.name
+    )
+    supervisor = ShardSupervisor(factory, num_workers=num_workers)
+    supervisor.start()
+
+    rng = random.Random(3)
+    channels = [f'channel-{i}' for i in range(num_channels)]
+    expected = {channel: 0 for channel in channels}
+
+    start = time.perf_counter()
+    for batch_idx in range(num_batches):
+        for channel in channels:
+            supervisor.route(channel, synthetic_batch(rng, channel))
+            expected[channel] += BATCH_SIZE
+        if batch_idx == num_batches // 2 - 1:
+            # Let the workers catch up, so the batches still in flight when the
+            # worker dies fit in the replay window
+            wait_for_counts(supervisor, expected)
+        if batch_idx == num_batches // 2:
+            victim = supervisor.workers[0]
+            os.kill(victim.pid, signal.SIGKILL)
+            victim.join()
+            supervisor.collect()
+
+    complete = wait_for_counts(supervisor, expected)
+    elapsed = time.perf_counter() - start
+    total = sum(expected.values())
+
+    crashed = {c for c in channels if supervisor.shard_for(c) == 0}
+    print(f"channels:   {num_channels} on {num_workers} workers")
+    print(f"messages:   {total} in {elapsed:.2f}s ({total / elapsed:,.0f} msgs/sec)")
+    print(f"restarts:   {supervisor.restarts} (shard 0, {len(crashed)} channels recovered)")
+    print(f"replay:     {supervisor.replay_size} messages per channel, {num_batches * BATCH_SIZE} sent")
+    print(f"complete:   {complete}")
+    supervisor.shutdown()
+    server.shutdown()
+    log_dir.cleanup()
+    if not complete:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+"""Startup cost of the entry points, measured with python -X importtime.
+
+Each scenario runs several times in a fresh interpreter. The report shows
+the median total import time (from -X importtime), the median wall time of
+the whole process, and the heaviest top-level imports. No scenario makes
+an LLM call, so any that imports the LLM stack (openai, httpx) fails.
+Results are compared with benchmarks/baselines.json like replay.py.
+
+Usage:
+  python benchmarks/bench_startup.py
+  python benchmarks/bench_startup.py --runs 9 --scenarios offline_job
+  python benchmarks/bench_startup.py --save-baseline
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+BASELINE_PATH = os.path.join(BENCH_DIR, 'baselines.json')
+
+# name -> code run in a fresh interpreter
+SCENARIOS = {
+    'import_processor': "import message_processor",
+    'import_analyzer': "import chat_analyzer",
+    'import_controller': "import stream_controller",
+    'offline_job': (
+        "import json\n"
+        "from message_processor import process_chat_data\n"
+        "process_chat_data(json.load(open('comments.json', encoding='utf-8')))"
+    ),
+    'offline_controller': (
+        "from stream_controller import create_stream_controller\n"
+        "create_stream_controller(None, offline=True)"
+    ),
+    # The client is only built on the first LLM call
+    'online_controller': (
+        "from stream_controller import create_stream_controller\n"
+        "create_stream_controller('key')"
+    ),
+}
+LLM_MODULES = ('openai', 'httpx')
+TOP_IMPORTS_LIMIT = 5
+MIN_SLACK_MS = 20  # startup times are small; ignore regressions below this
+
+
+def parse_importtime(stderr: str):
+    """Total import microseconds and the cumulative time of each top-level import."""
+    top_level = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        _, cumulative_us, name = line.split('|')
+        # Nesting is shown by two spaces of indentation per level
+        if not name.startswith('  '):
+            top_level.append((name.strip(), int(cumulative_us)))
+    return sum(us for _, us in top_level), top_level
+
+
+def run_once(code: str) -> dict:
+    started = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=ROOT, capture_output=True, text=True
+    )
+    wall = time.perf_counter() - started
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr[-2000:])
+    total_us, top_level = parse_importtime(proc.stderr)
+    imported = {
+        line.split('|')[-1].strip()
+        for line in proc.stderr.splitlines() if line.startswith('import time:')
+    }
+    return {
+        'import_ms': total_us / 1000,
+        'wall_ms': wall * 1000,
+        'top_level': top_level,
+        'llm_imported': any(module in imported for module in LLM_MODULES)
+    }
+
+
+def run_scenario(name: str, runs: int) -> dict:
+    samples = [run_once(SCENARIOS[name]) for _ in range(runs)]
+    heaviest = sorted(samples[-1]['top_level'], key=lambda item: item[1], reverse=True)
+    return {
+        'scenario': name,
+        'import_ms': statistics.median(s['import_ms'] for s in samples),
+        'wall_ms': statistics.median(s['wall_ms'] for s in samples),
+        'llm_imported': any(s['llm_imported'] for s in samples),
+        'heaviest': [f"{module} {us / 1000:.1f}ms" for module, us in heaviest[:TOP_IMPORTS_LIMIT]]
+    }
+
+
+def compare(result: dict, baseline: dict, tolerance: float) -> list:
+    """Return descriptions of metrics that regressed beyond the tolerance."""
+    regressions = []
+    for metric in ('import_ms', 'wall_ms'):
+        if result[metric] > max(baseline[metric] * (1 + tolerance), baseline[metric] + MIN_SLACK_MS):
+            regressions.append(f"{metric} {result[metric]:.1f} > {baseline[metric]:.1f}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5, help='fresh interpreters per scenario')
+    parser.add_argument('--scenarios', nargs='+', choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed regression fraction')
+    parser.add_argument('--save-baseline', action='store_true')
+    args = parser.parse_args()
+
+    baselines = {}
+    if os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH, 'r', encoding='utf-8') as f:
+            baselines = json.load(f)
+
+    failed = False
+    print(f"{'scenario':<20} {'import ms':>10} {'wall ms':>9}  heaviest top-level imports")
+    for name in args.scenarios:
+        result = run_scenario(name, args.runs)
+        print(f"{name:<20} {result['import_ms']:>10.1f} {result['wall_ms']:>9.1f}  {', '.join(result['heaviest'])}")
+        if result['llm_imported']:
+            print(f"  FAIL: imports the LLM stack ({', '.join(LLM_MODULES)}) before any LLM call")
+            failed = True
+
+        key = f"startup:{name}"
+        baseline_fields = {k: result[k] for k in ('scenario', 'import_ms', 'wall_ms')}
+        if args.save_baseline:
+            baselines[key] = baseline_fields
+        elif key in baselines:
+            for regression in compare(result, baselines[key], args.tolerance):
+                print(f"  REGRESSION vs baseline: {regression}")
+                failed = True
+
+    if args.save_baseline:
+        with open(BASELINE_PATH, 'w', encoding='utf-8') as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+        print(f"Saved baselines to {BASELINE_PATH}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
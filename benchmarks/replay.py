@@ -0,0 +1,248 @@
+"""Replay recorded or synthetic chat through each pipeline and report throughput.
+
+Pipelines:
+  process_chat_data  one offline call over the whole stream (materialized list)
+  processor          MessageProcessor.ingest_messages per batch
+  controller         StreamController.process_messages per batch, LLM tier
+                     pointed at the local stub server
+
+Each pipeline runs in a fresh process so peak RSS is its own. Results are
+compared with benchmarks/baselines.json and regressions are flagged.
+
+Usage:
+  python benchmarks/replay.py --messages 100000
+  python benchmarks/replay.py --input chat.jsonl --rate 500 --pipelines controller
+  python benchmarks/replay.py --messages 100000 --save-baseline
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import resource
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, BENCH_DIR)
+
+BASELINE_PATH = os.path.join(BENCH_DIR, 'baselines.json')
+PIPELINES = ('process_chat_data', 'processor', 'controller')
+
+# Hinglish and emoji flavour on top of the recorded comments.json seed
+EXTRA_WORDS = ['bhai', 'kya', 'scene', 'hai', 'op', 'gg', 'samay', 'chess', 'game',
+               'kaliya', 'bheem', 'stream', 'lag', 'kar', 'raha', 'mast', 'wow', 'lol']
+EMOJIS = ['🤣', '😂', '🔥', '👍', '😭', '💯', '😡', '🤔']
+
+
+def synthetic_pool(seed_messages, size: int = 5000, seed: int = 5):
+    """Build a pool of realistic message variants to sample the stream from."""
+    rng = random.Random(seed)
+    texts = [m['message'] for m in seed_messages] or ['hi']
+    pool = []
+    for _ in range(size):
+        roll = rng.random()
+        if roll < 0.05:
+            text = ''
+        elif roll < 0.2:
+            text = rng.choice(EMOJIS) * rng.randint(1, 6)
+        elif roll < 0.6:
+            text = rng.choice(texts)
+        else:
+            text = ' '.join(rng.choices(EXTRA_WORDS, k=rng.randint(1, 8)))
+            if rng.random() < 0.3:
+                text += ' ' + rng.choice(EMOJIS) * rng.randint(1, 3)
+        if text and rng.random() < 0.08:
+            text += '?'
+        pool.append(text)
+    return pool
+
+
+def synthetic_stream(count: int, seed_messages, seed: int = 9):
+    """Yield count messages without materializing the stream."""
+    rng = random.Random(seed)
+    pool = synthetic_pool(seed_messages)
+    users = [m['username'] for m in seed_messages] + [f'viewer_{i}' for i in range(max(count // 40, 50))]
+    for _ in range(count):
+        yield {'username': rng.choice(users), 'message': rng.choice(pool)}
+
+
+def recorded_stream(path: str, count: int = None):
+    """Yield messages from a JSON array or JSONL file, cycling up to count."""
+    with open(path, 'r', encoding='utf-8') as f:
+        if path.endswith('.jsonl'):
+            messages = [json.loads(line) for line in f if line.strip()]
+        else:
+            messages = json.load(f)
+    if count is None:
+        yield from messages
+        return
+    for idx in range(count):
+        yield messages[idx % len(messages)]
+
+
+def batched(stream, batch_size: int, rate: float):
+    """Group the stream into batches, pacing them to rate msgs/sec if set."""
+    started = time.perf_counter()
+    sent = 0
+    batch = []
+    for msg in stream:
+        batch.append(msg)
+        if len(batch) == batch_size:
+            if rate:
+                delay = started + sent / rate - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            sent += len(batch)
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def percentile(values, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * pct / 100), len(ordered) - 1)]
+
+
+def run_pipeline(pipeline: str, options: dict) -> dict:
+    """Run one pipeline in the current process and return its measurements."""
+    with open(os.path.join(ROOT, 'comments.json'), 'r', encoding='utf-8') as f:
+        seed_messages = json.load(f)
+    if options['input']:
+        stream = recorded_stream(options['input'], options['messages'])
+    else:
+        stream = synthetic_stream(options['messages'], seed_messages)
+
+    latencies = []
+    count = 0
+    started = time.perf_counter()
+
+    if pipeline == 'process_chat_data':
+        from message_processor import process_chat_data
+        messages = list(stream)
+        count = len(messages)
+        started = time.perf_counter()
+        call_started = time.perf_counter()
+        process_chat_data(messages)
+        latencies.append(time.perf_counter() - call_started)
+
+    elif pipeline == 'processor':
+        from message_processor import MessageProcessor
+        processor = MessageProcessor()
+        for batch in batched(stream, options['batch_size'], options['rate']):
+            call_started = time.perf_counter()
+            processor.ingest_messages(batch)
+            latencies.append(time.perf_counter() - call_started)
+            count += len(batch)
+
+    elif pipeline == 'controller':
+        from stream_controller import create_stream_controller
+        from stub_llm_server import start_stub_server
+        server, base_url = start_stub_server(delay=options['llm_delay'])
+        controller = create_stream_controller('stub', base_url=base_url)
+
+        async def replay():
+            nonlocal count
+            for batch in batched(stream, options['batch_size'], options['rate']):
+                call_started = time.perf_counter()
+                await controller.process_messages(batch)
+                latencies.append(time.perf_counter() - call_started)
+                count += len(batch)
+                await asyncio.sleep(0)  # let LLM tasks make progress
+            await controller.wait_for_llm_tasks()
+
+        asyncio.run(replay())
+        server.shutdown()
+    else:
+        raise ValueError(f"Unknown pipeline: {pipeline}")
+
+    elapsed = time.perf_counter() - started
+    return {
+        'pipeline': pipeline,
+        'messages': count,
+        'seconds': elapsed,
+        'msgs_per_sec': count / elapsed if elapsed else 0.0,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        # ru_maxrss is in KiB on Linux
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    }
+
+
+def run_isolated(pipeline: str, options: dict) -> dict:
+    """Run a pipeline in a fresh process so its peak RSS is measured alone."""
+    with multiprocessing.get_context('spawn').Pool(1) as pool:
+        return pool.apply(run_pipeline, (pipeline, options))
+
+
+def baseline_key(result: dict, options: dict) -> str:
+    source = os.path.basename(options['input']) if options['input'] else 'synthetic'
+    return f"{result['pipeline']}:{source}:{result['messages']}"
+
+
+def compare(result: dict, baseline: dict, tolerance: float) -> list:
+    """Return descriptions of metrics that regressed beyond the tolerance."""
+    regressions = []
+    if result['msgs_per_sec'] < baseline['msgs_per_sec'] * (1 - tolerance):
+        regressions.append(f"msgs/sec {result['msgs_per_sec']:,.0f} < {baseline['msgs_per_sec']:,.0f}")
+    for metric in ('p99_ms', 'peak_rss_mb'):
+        if result[metric] > baseline[metric] * (1 + tolerance):
+            regressions.append(f"{metric} {result[metric]:.1f} > {baseline[metric]:.1f}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--messages', type=int, default=100000, help='messages to replay (10k-10M)')
+    parser.add_argument('--input', help='recorded chat as a JSON array or JSONL file')
+    parser.add_argument('--rate', type=float, default=0, help='messages per second, 0 = unthrottled')
+    parser.add_argument('--batch-size', type=int, default=200)
+    parser.add_argument('--llm-delay', type=float, default=0.05, help='stub LLM latency in seconds')
+    parser.add_argument('--pipelines', nargs='+', choices=PIPELINES, default=list(PIPELINES))
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed regression fraction')
+    parser.add_argument('--save-baseline', action='store_true')
+    args = parser.parse_args()
+
+    options = {
+        'messages': args.messages,
+        'input': args.input,
+        'rate': args.rate,
+        'batch_size': args.batch_size,
+        'llm_delay': args.llm_delay
+    }
+    baselines = {}
+    if os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH, 'r', encoding='utf-8') as f:
+            baselines = json.load(f)
+
+    print(f"{'pipeline':<18} {'messages':>10} {'msgs/sec':>12} {'p50 ms':>9} {'p99 ms':>9} {'RSS MB':>8}")
+    regressed = False
+    for pipeline in args.pipelines:
+        result = run_isolated(pipeline, options)
+        key = baseline_key(result, options)
+        print(f"{pipeline:<18} {result['messages']:>10,} {result['msgs_per_sec']:>12,.0f} "
+              f"{result['p50_ms']:>9.2f} {result['p99_ms']:>9.2f} {result['peak_rss_mb']:>8.1f}")
+
+        if args.save_baseline:
+            baselines[key] = result
+        elif key in baselines:
+            for regression in compare(result, baselines[key], args.tolerance):
+                regressed = True
+                print(f"  REGRESSION vs baseline: {regression}")
+
+    if args.save_baseline:
+        with open(BASELINE_PATH, 'w', encoding='utf-8') as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+        print(f"Saved baselines to {BASELINE_PATH}")
+    if regressed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""Local OpenAI-compatible stub server for exercising the LLM code paths.
+
+Usage: python benchmarks/stub_llm_server.py [port] [delay_seconds]
+"""
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+POLL = {
+    "question": "Who wins the next game?",
+    "options": ["Arjun", "Pragg", "Gukesh", "Vaishali"],
+    "relevance_score": 80
+}
+SENTIMENT = {
+    "score": 72,
+    "positive": 60,
+    "negative": 10,
+    "topics": [{"topic": "chess", "sentiment": "positive"}]
+}
+HIGHLIGHTS = {
+    "highlights": [{
+        "title": "Chat erupts",
+        "summary": "Viewers react to the kaliya moment",
+        "category": "reaction",
+        "timestamp": "00:00"
+    }]
+}
+
+
+def canned_reply(system_prompt: str) -> str:
+    """Pick a canned completion based on which task the prompt is for."""
+    prompt = system_prompt.lower()
+    if 'in one json object' in prompt:
+        return json.dumps({
+            "poll": POLL,
+            "sentiment": SENTIMENT,
+            "highlights": HIGHLIGHTS["highlights"]
+        })
+    if 'poll' in prompt:
+        return json.dumps(POLL)
+    if 'sentiment' in prompt:
+        return json.dumps(SENTIMENT)
+    if 'highlight' in prompt:
+        return json.dumps(HIGHLIGHTS)
+    return "The next game starts right after this break."
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    delay = 0.0
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+        time.sleep(self.delay)
+        system_prompt = next(
+            (m['content'] for m in body.get('messages', []) if m['role'] == 'system'), ''
+        )
+        content = canned_reply(system_prompt)
+        payload = json.dumps({
+            "id": "stub",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get('model', 'stub'),
+            "choices": [{
+                "index": 0,
+                "finish_reason": "stop",
+                "message": {"role": "assistant", "content": content}
+            }],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+        }).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub_server(port: int = 0, delay: float = 0.0):
+    """Start the stub server on a background thread; returns (server, base_url)."""
+    handler = type('DelayedStubHandler', (StubHandler,), {'delay': delay})
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1/"
+
+
+if __name__ == '__main__':
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8000
+    delay = float(sys.argv[2]) if len(sys.argv) > 2 else 0.0
+    server, base_url = start_stub_server(port, delay)
+    print(f"Stub LLM server listening on {base_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -4,6 +4,7 @@ import styles from './InteractiveFeatures.module.css';
 import TopicRelationships from '../TopicRelationship/TopicRelationship';
 import SentimentFlow from '../SentimentFlow/SentimentFlow';
 import MoodBubbleChart from '../MoodBubbleChart/MoodBubbleChart';
+import useInsightStream from '../../hooks/useInsightStream';
 
 const LivePoll = ({ pollData }) => {
   const [votes, setVotes] = useState({});
@@ -87,18 +88,26 @@ const InteractiveFeatures = () => {
     }
   });
 
+  // Live insights from the insight server replace the sample data once they arrive
+  const insights = useInsightStream();
+  const liveData = insights.local?.sentiment ? {
+    ...chatData,
+    ...insights.local,
+    pollData: insights.polls?.[0] ?? chatData.pollData
+  } : chatData;
+
   return (
     <div className={styles.container}>
       <div className={styles.layout}>
         {/* Interactive Features Column */}
         <div className={styles.interactiveColumn}>
-          <LivePoll pollData={chatData.pollData} />
-          <CommonQuestions questions={chatData.questions} />
+          <LivePoll pollData={liveData.pollData} />
+          <CommonQuestions questions={liveData.questions} />
         </div>
         
         {/* Analytics Column */}
         <div className={styles.analyticsColumn}>
-          <MoodDistribution chatData={chatData} />
+          <MoodDistribution chatData={liveData} />
           {/* <TopicRelationships chatData={chatData}/> */}
           {/* <SentimentFlow chatData={chatData}/> */}
           {/* <MoodBubbleChart sentimentData={chatData}/> */}
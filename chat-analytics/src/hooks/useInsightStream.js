@@ -0,0 +1,53 @@
+import { useEffect, useState } from 'react';
+
+const unescape = (segment) => segment.replace(/~1/g, '/').replace(/~0/g, '~');
+
+// Apply JSON-patch style ops from the insight server to a copy of the state
+const applyPatch = (state, ops) => {
+  const next = structuredClone(state);
+  for (const { op, path, value } of ops) {
+    if (path === '') {
+      return value;
+    }
+    const keys = path.slice(1).split('/').map(unescape);
+    const last = keys.pop();
+    const parent = keys.reduce((node, key) => node[key], next);
+    if (Array.isArray(parent)) {
+      // '-' is the end of the list; adds insert and removes shift like JSON patch
+      const index = last === '-' ? parent.length : Number(last);
+      if (op === 'add') {
+        parent.splice(index, 0, value);
+      } else if (op === 'remove') {
+        parent.splice(index, 1);
+      } else {
+        parent[index] = value;
+      }
+    } else if (op === 'remove') {
+      delete parent[last];
+    } else {
+      parent[last] = value;
+    }
+  }
+  return next;
+};
+
+// Subscribe to live insights pushed by insight_server.InsightServer over SSE
+const useInsightStream = (url = 'http://127.0.0.1:8765/insights') => {
+  const [insights, setInsights] = useState({});
+
+  useEffect(() => {
+    const source = new EventSource(url);
+    source.addEventListener('snapshot', (event) => {
+      setInsights(JSON.parse(event.data).insights);
+    });
+    source.addEventListener('patch', (event) => {
+      const { ops } = JSON.parse(event.data);
+      setInsights((current) => applyPatch(current, ops));
+    });
+    return () => source.close();
+  }, [url]);
+
+  return insights;
+};
+
+export default useInsightStream;
@@ -1,32 +1,245 @@
+import asyncio
+import heapq
 import json
-from typing import List, Dict, Any
-import re
+import random
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Callable
 from collections import Counter
 from datetime import datetime
-from openai import OpenAI
+
+from answer_cache import AnswerCache
+from dedup import MessageDeduper
+from history import MessageHistory
+from instrumentation import Metrics, default_metrics
+from llm_client import LLMClient
+from message_processor import MessageProcessor
+from prompt_packer import PackedPrompt, PromptPacker
+from question_index import QuestionIndex
+from sentiment_model import SentimentModel
 
 class StreamChatAnalyzer:
-    def __init__(self, nebius_api_key: str):
-        """Initialize the chat analyzer with Nebius API key."""
-        self.client = OpenAI(
-            base_url="https://api.studio.nebius.ai/v1/",
-            api_key=nebius_api_key
+    NEBIUS_BASE_URL = "https://api.studio.nebius.ai/v1/"
+    TOP_QUESTIONS_LIMIT = 5
+    MAX_QUESTION_CLUSTERS = 1000
+    SENTIMENT_SAMPLE_SIZE = 40  # messages per batch the LLM labels to check the local model
+    LLM_TASKS = ('polls', 'qa', 'sentiment', 'highlights')
+    FALLBACK_ANSWER = "Unable to generate response at this time."
+    # Everything a restart needs to resume (see get_state)
+    STATE_FIELDS = (
+        'message_history', 'current_poll', 'question_cache', '_next_question_id',
+        'question_index', 'last_prompt_tokens', 'prompt_tokens_sent'
+    )
+
+    def __init__(self, nebius_api_key: str, base_url: str = None,
+                 max_concurrency: int = 4, llm_timeout: float = 30.0,
+                 answer_cache_path: str = None, answer_cache_ttl: float = None,
+                 history_size: int = None, prompt_token_budget: int = None,
+                 combined_analysis: bool = False, metrics: Metrics = None,
+                 models: Dict[str, str] = None, task_timeouts: Dict[str, float] = None,
+                 sentiment_model_path: str = None, dedup: bool = True,
+                 offline: bool = False, peak_resolution: float = None):
+        """Initialize the chat analyzer with Nebius API key.
+
+        models and task_timeouts override LLMClient's per-task model routes
+        and time budgets. sentiment_model_path loads trained SentimentModel
+        weights instead of the lexicon seed. With dedup, process_new_messages
+        collapses duplicate and flood messages into weighted entries first.
+        An offline analyzer never calls (or imports) the LLM stack: sentiment
+        is scored locally, questions are clustered and answered from the
+        answer cache only, and polls and highlights stay empty.
+        peak_resolution sets the bin length, in seconds, of the engagement
+        metrics' peak times.
+        """
+        self.metrics = metrics or default_metrics
+        self.offline = offline
+        self.llm = None if offline else LLMClient(
+            nebius_api_key,
+            base_url or self.NEBIUS_BASE_URL,
+            timeout=llm_timeout,
+            models=models,
+            task_timeouts=task_timeouts,
+            metrics=self.metrics
         )
-        self.message_history = []
+        self.max_concurrency = max_concurrency
+        self.llm_timeout = llm_timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency)
+        self.message_history = MessageHistory(max_messages=history_size, peak_resolution=peak_resolution)
         self.current_poll = None
         self.question_cache = {}
+        self._question_heap = []  # (frequency, question id), refreshed lazily on eviction
+        self._next_question_id = 0
+        self.question_index = QuestionIndex()
+        self.answer_cache = AnswerCache(ttl=answer_cache_ttl, path=answer_cache_path)
+        self.prompt_packer = PromptPacker(token_budget=prompt_token_budget)
+        self.sentiment_model = SentimentModel(
+            MessageProcessor.POSITIVE_EMOJIS, MessageProcessor.NEGATIVE_EMOJIS,
+            weights_path=sentiment_model_path
+        )
+        self.last_prompt_tokens = {}
+        self.prompt_tokens_sent = Counter()
+        self._last_topics = []  # last topics the LLM labelled, kept while it is failing
+        self._last_packed = (None, None)
+        self.combined_analysis = combined_analysis
+        self.deduper = MessageDeduper() if dedup else None
 
     def process_new_messages(self, messages: List[Dict[str, str]]) -> Dict[str, Any]:
         """Process new chat messages and return comprehensive analysis."""
-        self.message_history.extend(messages)
-        
+        messages = self.collapse(messages)
+        self.record_messages(messages)
+        if self.offline:
+            return self._analyze_offline(messages, self.LLM_TASKS)
+        analysis = self._generate_combined_analysis(messages) if self.combined_analysis else {}
+
+        # Per-task calls for anything the combined response did not cover
+        for key, (task, _) in self._analysis_tasks().items():
+            if key not in analysis:
+                analysis[key] = task(messages)
+
         return {
-            "polls": self._generate_poll_suggestions(messages),
+            "polls": analysis['polls'],
             "qa": self._process_questions(messages),
-            "sentiment": self._analyze_sentiment(messages),
-            "highlights": self._generate_highlights(messages)
+            "sentiment": analysis['sentiment'],
+            "highlights": analysis['highlights']
+        }
+
+    def _analysis_tasks(self) -> Dict[str, Any]:
+        """Per-task analysis methods and their failure defaults, by result key."""
+        return {
+            "polls": (self._generate_poll_suggestions, None),
+            "sentiment": (self._analyze_sentiment, None),
+            "highlights": (self._generate_highlights, [])
         }
 
+    async def process_new_messages_async(self, messages: List[Dict[str, str]]) -> Dict[str, Any]:
+        """Process new chat messages with all LLM calls issued concurrently."""
+        messages = self.collapse(messages)
+        self.record_messages(messages)
+        analysis = await self.analyze_async(messages)
+        return {key: analysis[key] for key in self.LLM_TASKS}
+
+    def collapse(self, messages: List[Dict[str, str]]) -> List[Dict[str, Any]]:
+        """Collapse duplicate and flood messages into weighted entries (if dedup is on)."""
+        if self.deduper is None:
+            return messages
+        empty_before = self.deduper.empty_dropped
+        entries = self.deduper.collapse(messages)
+        collapsed = len(messages) - len(entries) - (self.deduper.empty_dropped - empty_before)
+        self.metrics.inc('dedup_collapsed_total', collapsed, component='analyzer')
+        return entries
+
+    def record_messages(self, messages: List[Dict[str, str]]) -> None:
+        """Record messages (or weighted entries) in the history behind the engagement metrics."""
+        self.metrics.inc(
+            'messages_in_total', sum(msg.get('weight', 1) for msg in messages), component='analyzer'
+        )
+        self.message_history.extend(messages)
+
+    async def analyze_async(self, messages: List[Dict[str, str]],
+                            tasks: List[str] = None) -> Dict[str, Any]:
+        """Run the requested LLM tasks (default: all of LLM_TASKS) over messages concurrently."""
+        tasks = list(tasks or self.LLM_TASKS)
+        if self.offline:
+            return self._analyze_offline(messages, tasks)
+        top_questions = []
+        uncached = []
+        answer_calls = []
+        if 'qa' in tasks:
+            top_questions = self._cluster_questions(messages)
+
+            # Only clusters without a cached answer need an LLM call
+            for q in top_questions:
+                answer = self._cached_answer(q['question'])
+                if answer is None:
+                    uncached.append(q)
+                else:
+                    q['ai_suggested_answer'] = answer
+
+            answer_calls = [
+                self._run_llm_task(
+                    self._generate_ai_response, q['question'],
+                    default=self.FALLBACK_ANSWER
+                )
+                for q in uncached
+            ]
+
+        per_task = {key: spec for key, spec in self._analysis_tasks().items() if key in tasks}
+        analysis = {}
+        answers = []
+        if self.combined_analysis and len(per_task) > 1:
+            combined, *answers = await asyncio.gather(
+                self._run_llm_task(self._generate_combined_analysis, messages, default={}),
+                *answer_calls
+            )
+            analysis = {key: value for key, value in combined.items() if key in per_task}
+            answer_calls = []
+
+        # Per-task calls for anything the combined response did not cover
+        pending = [key for key in per_task if key not in analysis]
+        results = await asyncio.gather(
+            *[
+                self._run_llm_task(per_task[key][0], messages, default=per_task[key][1])
+                for key in pending
+            ],
+            *answer_calls
+        )
+        analysis.update(zip(pending, results))
+        if answer_calls:
+            answers = results[len(pending):]
+
+        for q, answer in zip(uncached, answers):
+            if answer != self.FALLBACK_ANSWER:
+                self.answer_cache.put(q['question'], answer)
+            self._set_answer(q, answer)
+
+        if 'qa' in tasks:
+            analysis['qa'] = top_questions
+        return analysis
+
+    def _analyze_offline(self, messages: List[Dict[str, str]], tasks: List[str]) -> Dict[str, Any]:
+        """The requested task results from local models and caches only."""
+        analysis = {}
+        if 'qa' in tasks:
+            analysis['qa'] = self._cluster_questions(messages)
+            for q in analysis['qa']:
+                q['ai_suggested_answer'] = self._cached_answer(q['question'])
+        if 'sentiment' in tasks:
+            texts, weights = self._sentiment_texts(messages)
+            analysis['sentiment'] = {**self.sentiment_model.summarize(texts, weights), 'topics': []}
+        if 'polls' in tasks:
+            analysis['polls'] = None
+        if 'highlights' in tasks:
+            analysis['highlights'] = []
+        return analysis
+
+    async def _run_llm_task(self, task: Callable, payload: Any, default: Any = None) -> Any:
+        """Run a blocking LLM task on the worker pool with a timeout."""
+        loop = asyncio.get_running_loop()
+        try:
+            return await asyncio.wait_for(
+                loop.run_in_executor(self._executor, task, payload),
+                timeout=self.llm_timeout
+            )
+        except asyncio.TimeoutError:
+            self.metrics.inc('llm_timeouts_total', task=task.__name__)
+            print(f"Timed out in {task.__name__} after {self.llm_timeout}s")
+            return default
+
+    def _create_completion(self, task: str, **request) -> Any:
+        """Issue a chat completion, recording calls, errors, latency and token usage."""
+        self.metrics.inc('llm_calls_total', task=task)
+        try:
+            with self.metrics.timer('llm_call_seconds', task=task):
+                response = self.llm.complete(task, **request)
+        except Exception:
+            self.metrics.inc('llm_errors_total', task=task)
+            raise
+
+        usage = getattr(response, 'usage', None)
+        if usage is not None:
+            self.metrics.inc('llm_tokens_total', usage.prompt_tokens or 0, task=task, kind='prompt')
+            self.metrics.inc('llm_tokens_total', usage.completion_tokens or 0, task=task, kind='completion')
+        return response
+
     def _generate_poll_suggestions(self, messages: List[Dict[str, str]]) -> Dict[str, Any]:
         """Generate poll suggestions based on chat topics."""
         prompt = """
@@ -38,12 +251,13 @@ class StreamChatAnalyzer:
         }
         """
         
+        packed = self._pack_messages('polls', messages)
         try:
-            response = self.client.chat.completions.create(
-                model="meta-llama/Meta-Llama-3.1-70B-Instruct",
+            response = self._create_completion(
+                'polls',
                 messages=[
                     {"role": "system", "content": prompt},
-                    {"role": "user", "content": str(messages)}
+                    {"role": "user", "content": packed.text}
                 ],
                 temperature=0.7,
                 response_format={ "type": "json_object" }
@@ -53,73 +267,250 @@ class StreamChatAnalyzer:
             print(f"Error generating poll: {e}")
             return None
 
+    def _generate_combined_analysis(self, messages: List[Dict[str, str]]) -> Dict[str, Any]:
+        """Request poll, sentiment and highlights in one completion.
+
+        Returns only the sections that pass validation, keyed like the
+        per-task results, so callers can fall back for the rest.
+        """
+        prompt = """
+        Analyze these chat messages and return all of the following in one JSON object:
+        1. "poll": a relevant poll suggestion
+        2. "sentiment": overall sentiment score (0-100), percentage of positive and
+           negative messages, and key topics with their sentiment
+        3. "highlights": highlight summaries of key moments, popular reactions,
+           important announcements and community interactions
+
+        Format as JSON: {
+            "poll": {
+                "question": "poll question",
+                "options": ["option1", "option2", "option3", "option4"],
+                "relevance_score": 0-100
+            },
+            "sentiment": {
+                "score": number,
+                "positive": number,
+                "negative": number,
+                "topics": [{"topic": string, "sentiment": "positive|negative"}]
+            },
+            "highlights": [{
+                "title": string,
+                "summary": string,
+                "category": string,
+                "timestamp": string
+            }]
+        }
+        """
+
+        packed = self._pack_messages('combined', messages)
+        try:
+            response = self._create_completion(
+                'combined',
+                messages=[
+                    {"role": "system", "content": prompt},
+                    {"role": "user", "content": packed.text}
+                ],
+                temperature=0.7,
+                response_format={ "type": "json_object" }
+            )
+            result = json.loads(response.choices[0].message.content)
+        except Exception as e:
+            print(f"Error generating combined analysis: {e}")
+            return {}
+
+        if not isinstance(result, dict):
+            print("Combined analysis was not a JSON object, falling back to per-task calls")
+            return {}
+
+        sections = {
+            "polls": (result.get("poll"), self._is_valid_poll),
+            "sentiment": (result.get("sentiment"), self._is_valid_sentiment),
+            "highlights": (result.get("highlights"), self._is_valid_highlights)
+        }
+        analysis = {}
+        for key, (section, is_valid) in sections.items():
+            if is_valid(section):
+                analysis[key] = section
+            else:
+                print(f"Invalid '{key}' section in combined analysis, falling back")
+
+        if 'sentiment' in analysis:
+            # Scores come from the local model; the LLM contributes the topics
+            texts, weights = self._sentiment_texts(messages)
+            analysis['sentiment'] = {
+                **analysis['sentiment'], **self.sentiment_model.summarize(texts, weights)
+            }
+        return analysis
+
+    @staticmethod
+    def _is_valid_poll(poll: Any) -> bool:
+        return (
+            isinstance(poll, dict)
+            and isinstance(poll.get('question'), str)
+            and isinstance(poll.get('options'), list)
+            and isinstance(poll.get('relevance_score', 0), (int, float))
+        )
+
+    @staticmethod
+    def _is_valid_sentiment(sentiment: Any) -> bool:
+        return (
+            isinstance(sentiment, dict)
+            and all(isinstance(sentiment.get(k), (int, float)) for k in ('score', 'positive', 'negative'))
+            and isinstance(sentiment.get('topics', []), list)
+        )
+
+    @staticmethod
+    def _is_valid_highlights(highlights: Any) -> bool:
+        return (
+            isinstance(highlights, list)
+            and all(isinstance(h, dict) and isinstance(h.get('title'), str) for h in highlights)
+        )
+
     def _process_questions(self, messages: List[Dict[str, str]]) -> List[Dict[str, Any]]:
         """Identify and process questions from chat."""
-        questions = []
-        
+        top_questions = self._cluster_questions(messages)
+
+        for q in top_questions:
+            self._set_answer(q, self._get_suggested_answer(q['question']))
+
+        return top_questions
+
+    def _set_answer(self, cluster: Dict[str, Any], answer: str) -> None:
+        """Give a cluster its answer; if the LLM call failed, keep its last good one."""
+        previous = cluster.get('ai_suggested_answer')
+        if answer == self.FALLBACK_ANSWER and previous not in (None, self.FALLBACK_ANSWER):
+            self.metrics.inc('llm_stale_served_total', task='answer')
+            return
+        cluster['ai_suggested_answer'] = answer
+
+    def _get_suggested_answer(self, question: str) -> str:
+        """Return the cached answer for a question's cluster, generating it on a miss."""
+        answer = self._cached_answer(question)
+        if answer is None:
+            answer = self._generate_ai_response(question)
+            if answer != self.FALLBACK_ANSWER:
+                self.answer_cache.put(question, answer)
+        return answer
+
+    def _cached_answer(self, question: str) -> Any:
+        """Look up the answer cache, counting hits and misses."""
+        answer = self.answer_cache.get(question)
+        self.metrics.inc('answer_cache_lookups_total', result='miss' if answer is None else 'hit')
+        return answer
+
+    def _cluster_questions(self, messages: List[Dict[str, str]]) -> List[Dict[str, Any]]:
+        """Group new questions into clusters and return the most frequent ones."""
         for msg in messages:
             if '?' in msg['message']:
                 # Group similar questions
-                similar_found = False
-                for existing_q in self.question_cache.values():
-                    if self._are_questions_similar(msg['message'], existing_q['question']):
-                        existing_q['frequency'] += 1
-                        existing_q['askers'].append(msg['username'])
-                        similar_found = True
-                        break
-                
-                if not similar_found:
-                    question_id = len(self.question_cache)
+                tokens = self.question_index.tokenize(msg['message'])
+                question_id = self.question_index.find(tokens)
+                if question_id is not None:
+                    existing_q = self.question_cache[question_id]
+                    existing_q['frequency'] += msg.get('weight', 1)
+                    existing_q['askers'].extend(msg.get('usernames') or [msg['username']])
+                else:
+                    if len(self.question_cache) >= self.MAX_QUESTION_CLUSTERS:
+                        self._evict_question_cluster()
+                    question_id = self._next_question_id
+                    self._next_question_id += 1
+                    frequency = msg.get('weight', 1)
                     self.question_cache[question_id] = {
                         'question': msg['message'],
-                        'frequency': 1,
-                        'askers': [msg['username']],
+                        'frequency': frequency,
+                        'askers': list(msg.get('usernames') or [msg['username']]),
                         'timestamp': datetime.now()
                     }
+                    self.question_index.add(question_id, tokens)
+                    heapq.heappush(self._question_heap, (frequency, question_id))
         
-        # Generate AI responses for top questions
-        top_questions = sorted(
+        return sorted(
             self.question_cache.values(),
             key=lambda x: x['frequency'],
             reverse=True
-        )[:5]
+        )[:self.TOP_QUESTIONS_LIMIT]
 
-        for q in top_questions:
-            ai_response = self._generate_ai_response(q['question'])
-            q['ai_suggested_answer'] = ai_response
-
-        return top_questions
+    def _evict_question_cluster(self) -> None:
+        """Drop the least asked (then oldest) cluster to keep the cache bounded."""
+        # Frequencies only grow, so an entry is either current or too low:
+        # re-queue stale ones until the smallest entry is current
+        while True:
+            frequency, question_id = heapq.heappop(self._question_heap)
+            current = self.question_cache[question_id]['frequency']
+            if current == frequency:
+                break
+            heapq.heappush(self._question_heap, (current, question_id))
+        del self.question_cache[question_id]
+        self.question_index.remove(question_id)
 
     def _analyze_sentiment(self, messages: List[Dict[str, str]]) -> Dict[str, Any]:
-        """Analyze sentiment of chat messages."""
+        """Score sentiment locally; the LLM only labels topics and checks a sample."""
+        texts, weights = self._sentiment_texts(messages)
+        sentiment = self.sentiment_model.summarize(texts, weights)
+        sentiment['topics'] = []
+        sample = self._sentiment_sample(texts)
+        if not sample:
+            return sentiment
+
         prompt = """
-        Analyze the sentiment of these chat messages and provide:
-        1. Overall sentiment score (0-100)
-        2. Percentage of positive and negative messages
-        3. Key topics and their sentiment
-        
+        For these numbered chat messages provide:
+        1. Key topics and their sentiment
+        2. The sentiment of each message, in order
+
         Format as JSON: {
-            "score": number,
-            "positive": number,
-            "negative": number,
-            "topics": [{"topic": string, "sentiment": "positive|negative"}]
+            "topics": [{"topic": string, "sentiment": "positive|negative"}],
+            "labels": ["positive|negative|neutral", ...]
         }
         """
-        
+
+        numbered = "\n".join(f"{i}. {text}" for i, text in enumerate(sample, 1))
+        self._record_prompt_tokens('sentiment', self.prompt_packer.estimate_tokens(numbered))
         try:
-            response = self.client.chat.completions.create(
-                model="meta-llama/Meta-Llama-3.1-70B-Instruct",
+            response = self._create_completion(
+                'sentiment',
                 messages=[
                     {"role": "system", "content": prompt},
-                    {"role": "user", "content": str(messages)}
+                    {"role": "user", "content": numbered}
                 ],
-                temperature=0.7,
+                temperature=0.3,
                 response_format={ "type": "json_object" }
             )
-            return json.loads(response.choices[0].message.content)
+            result = json.loads(response.choices[0].message.content)
         except Exception as e:
-            print(f"Error analyzing sentiment: {e}")
-            return None
+            print(f"Error labelling sentiment topics: {e}")
+            if self._last_topics:
+                # Topics change slowly: the last labelled ones beat none
+                self.metrics.inc('llm_stale_served_total', task='sentiment')
+                sentiment['topics'] = self._last_topics
+            return sentiment
+
+        if not isinstance(result, dict):
+            return sentiment
+        if isinstance(result.get('topics'), list):
+            sentiment['topics'] = self._last_topics = result['topics']
+        labels = result.get('labels')
+        if (
+            isinstance(labels, list) and len(labels) == len(sample)
+            and all(label in SentimentModel.LABEL_VALUES for label in labels)
+        ):
+            # Agreement is measured before the model learns from the labels
+            agreement = self.sentiment_model.partial_fit(sample, labels)
+            sentiment['llm_agreement'] = round(agreement * 100, 1)
+            self.metrics.set('sentiment_llm_agreement', agreement)
+        return sentiment
+
+    @staticmethod
+    def _sentiment_texts(messages: List[Dict[str, str]]):
+        """Non-empty texts and how many messages each stands for."""
+        kept = [msg for msg in messages if msg['message'].strip()]
+        return [msg['message'] for msg in kept], [msg.get('weight', 1) for msg in kept]
+
+    def _sentiment_sample(self, texts: List[str]) -> List[str]:
+        """Distinct messages for the LLM to label, at most SENTIMENT_SAMPLE_SIZE."""
+        distinct = list(dict.fromkeys(texts))
+        if len(distinct) <= self.SENTIMENT_SAMPLE_SIZE:
+            return distinct
+        return random.sample(distinct, self.SENTIMENT_SAMPLE_SIZE)
 
     def _generate_highlights(self, messages: List[Dict[str, str]]) -> List[Dict[str, str]]:
         """Generate stream highlights based on chat activity."""
@@ -139,37 +530,41 @@ class StreamChatAnalyzer:
         }]
         """
         
+        packed = self._pack_messages('highlights', messages)
         try:
-            response = self.client.chat.completions.create(
-                model="meta-llama/Meta-Llama-3.1-70B-Instruct",
+            response = self._create_completion(
+                'highlights',
                 messages=[
                     {"role": "system", "content": prompt},
-                    {"role": "user", "content": str(messages)}
+                    {"role": "user", "content": packed.text}
                 ],
                 temperature=0.7,
                 response_format={ "type": "json_object" }
             )
-            return json.loads(response.choices[0].message.content)
+            highlights = json.loads(response.choices[0].message.content)
         except Exception as e:
             print(f"Error generating highlights: {e}")
             return []
 
-    def _are_questions_similar(self, q1: str, q2: str) -> bool:
-        """Check if two questions are similar using simple text comparison."""
-        # Clean and tokenize questions
-        def clean_text(text):
-            text = text.lower()
-            text = re.sub(r'[^\w\s]', '', text)
-            return set(text.split())
-        
-        words1 = clean_text(q1)
-        words2 = clean_text(q2)
-        
-        # Calculate Jaccard similarity
-        intersection = len(words1.intersection(words2))
-        union = len(words1.union(words2))
-        
-        return intersection / union > 0.5 if union > 0 else False
+        # JSON mode returns an object, so the array usually arrives wrapped in one
+        if isinstance(highlights, dict):
+            highlights = next((v for v in highlights.values() if isinstance(v, list)), [highlights])
+        return highlights
+
+    def _pack_messages(self, task: str, messages: List[Dict[str, str]]) -> PackedPrompt:
+        """Pack a batch for a prompt, reusing the result across tasks and recording tokens sent."""
+        source, packed = self._last_packed
+        if source is not messages:
+            packed = self.prompt_packer.pack(messages)
+            self._last_packed = (messages, packed)
+        self._record_prompt_tokens(task, packed.tokens)
+        self.metrics.inc('prompt_omitted_messages_total', packed.omitted, task=task)
+        return packed
+
+    def _record_prompt_tokens(self, task: str, tokens: int) -> None:
+        self.last_prompt_tokens[task] = tokens
+        self.prompt_tokens_sent[task] += tokens
+        self.metrics.inc('prompt_packed_tokens_total', tokens, task=task)
 
     def _generate_ai_response(self, question: str) -> str:
         """Generate AI response for a question."""
@@ -181,8 +576,8 @@ class StreamChatAnalyzer:
         """
         
         try:
-            response = self.client.chat.completions.create(
-                model="meta-llama/Meta-Llama-3.1-70B-Instruct",
+            response = self._create_completion(
+                'answer',
                 messages=[
                     {"role": "system", "content": prompt},
                     {"role": "user", "content": question}
@@ -193,42 +588,24 @@ class StreamChatAnalyzer:
             return response.choices[0].message.content
         except Exception as e:
             print(f"Error generating AI response: {e}")
-            return "Unable to generate response at this time."
-
-    def get_engagement_metrics(self) -> Dict[str, Any]:
-        """Calculate engagement metrics from message history."""
-        if not self.message_history:
-            return {
-                "total_messages": 0,
-                "active_users": 0,
-                "avg_response_time": 0,
-                "peak_times": []
-            }
-
-        user_activity = Counter(msg['username'] for msg in self.message_history)
-        message_times = [msg.get('timestamp') for msg in self.message_history if msg.get('timestamp')]
+            return self.FALLBACK_ANSWER
 
-        metrics = {
-            "total_messages": len(self.message_history),
-            "active_users": len(user_activity),
-            "most_active_users": user_activity.most_common(5),
-            "peak_times": self._calculate_peak_times(message_times) if message_times else []
-        }
+    def get_state(self) -> Dict[str, Any]:
+        """Picklable history, question clusters and learned sentiment weights."""
+        state = {name: getattr(self, name) for name in self.STATE_FIELDS}
+        state['sentiment_model'] = (self.sentiment_model.weights, self.sentiment_model.bias)
+        return state
 
-        return metrics
+    def load_state(self, state: Dict[str, Any]) -> None:
+        """Resume from a get_state() result."""
+        for name in self.STATE_FIELDS:
+            setattr(self, name, state[name])
+        self._question_heap = [(q['frequency'], qid) for qid, q in self.question_cache.items()]
+        heapq.heapify(self._question_heap)
+        weights, bias = state['sentiment_model']
+        self.sentiment_model.weights = weights
+        self.sentiment_model.bias = bias
 
-    def _calculate_peak_times(self, timestamps: List[datetime]) -> List[Dict[str, Any]]:
-        """Calculate peak activity times."""
-        hour_counts = Counter(ts.hour for ts in timestamps)
-        total_messages = len(timestamps)
-        
-        peak_times = [
-            {
-                "hour": hour,
-                "message_count": count,
-                "percentage": (count / total_messages) * 100
-            }
-            for hour, count in hour_counts.most_common(3)
-        ]
-        
-        return peak_times
\ No newline at end of file
+    def get_engagement_metrics(self) -> Dict[str, Any]:
+        """Calculate engagement metrics from message history."""
+        return self.message_history.get_engagement_metrics()
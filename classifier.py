@@ -0,0 +1,125 @@
+from typing import List, Dict, Iterable, NamedTuple, Set
+import re
+
+
+class Classification(NamedTuple):
+    emojis: Set[str]
+    tags: List[str]
+    moods: List[str]
+    polarity: str
+
+
+class MessageClassifier:
+    """Single-scan tag, mood and polarity classifier compiled from keyword rules.
+
+    All keywords and the emoji range are folded into one regex with an
+    overlapping lookahead, so each message is scanned once. Keyword matching
+    keeps substring semantics: a match also credits every configured keyword
+    it contains, which covers shorter keywords starting at the same position.
+    """
+
+    def __init__(self, tag_keywords: Dict[str, Iterable[str]],
+                 mood_indicators: Dict[str, Set[str]],
+                 mood_keywords: Dict[str, Iterable[str]],
+                 positive_emojis: Set[str], negative_emojis: Set[str],
+                 emoji_pattern: str, emoji_tag: str = 'reaction'):
+        self.tag_keywords = {tag: list(words) for tag, words in tag_keywords.items()}
+        self.mood_indicators = {mood: set(emojis) for mood, emojis in mood_indicators.items()}
+        self.mood_keywords = {mood: list(words) for mood, words in mood_keywords.items()}
+        self.positive_emojis = set(positive_emojis)
+        self.negative_emojis = set(negative_emojis)
+        self.emoji_pattern = emoji_pattern
+        self.emoji_tag = emoji_tag
+        self._compile()
+
+    def _compile(self) -> None:
+        """Build the combined regex and keyword/emoji lookup tables."""
+        keyword_labels = {}  # keyword -> set of ('tag'|'mood', label)
+        for tag, words in self.tag_keywords.items():
+            for word in words:
+                keyword_labels.setdefault(word.lower(), set()).add(('tag', tag))
+        for mood, words in self.mood_keywords.items():
+            for word in words:
+                keyword_labels.setdefault(word.lower(), set()).add(('mood', mood))
+
+        # A match on one keyword implies every keyword that is a substring of it
+        self._keyword_hits = {
+            keyword: frozenset(
+                label
+                for other, labels in keyword_labels.items() if other in keyword
+                for label in labels
+            )
+            for keyword in keyword_labels
+        }
+
+        self._emoji_moods = {}
+        for mood, emojis in self.mood_indicators.items():
+            for emoji in emojis:
+                self._emoji_moods.setdefault(emoji, set()).add(mood)
+
+        alternatives = [re.escape(k) for k in sorted(keyword_labels, key=len, reverse=True)]
+        alternatives.append(self.emoji_pattern)
+        self._scanner = re.compile('(?=(' + '|'.join(alternatives) + '))')
+        self._emoji_re = re.compile(self.emoji_pattern)
+        self._tag_order = list(self.tag_keywords) + [self.emoji_tag]
+
+    def extend(self, rules: Dict[str, Dict[str, Iterable[str]]]) -> 'MessageClassifier':
+        """Return a new classifier with extra channel-specific rules merged in.
+
+        ``rules`` may contain ``tags``, ``mood_keywords`` and ``mood_emojis``
+        mappings of label to keywords (or emojis).
+        """
+        tag_keywords = {tag: list(words) for tag, words in self.tag_keywords.items()}
+        for tag, words in rules.get('tags', {}).items():
+            tag_keywords.setdefault(tag, []).extend(words)
+
+        mood_keywords = {mood: list(words) for mood, words in self.mood_keywords.items()}
+        for mood, words in rules.get('mood_keywords', {}).items():
+            mood_keywords.setdefault(mood, []).extend(words)
+
+        mood_indicators = {mood: set(emojis) for mood, emojis in self.mood_indicators.items()}
+        for mood, emojis in rules.get('mood_emojis', {}).items():
+            mood_indicators.setdefault(mood, set()).update(emojis)
+
+        return MessageClassifier(
+            tag_keywords, mood_indicators, mood_keywords,
+            self.positive_emojis, self.negative_emojis,
+            self.emoji_pattern, self.emoji_tag
+        )
+
+    def classify(self, text: str) -> Classification:
+        """Classify a message into emojis, tags, moods and polarity in one scan."""
+        emojis = set()
+        hits = set()
+        keyword_hits = self._keyword_hits
+        for match in self._scanner.finditer(text.lower()):
+            token = match.group(1)
+            labels = keyword_hits.get(token)
+            if labels is not None:
+                hits.update(labels)
+            else:
+                emojis.add(token)
+
+        if emojis:
+            hits.add(('tag', self.emoji_tag))
+        tags = [tag for tag in self._tag_order if ('tag', tag) in hits]
+
+        emoji_moods = set()
+        for emoji in emojis:
+            emoji_moods.update(self._emoji_moods.get(emoji, ()))
+        if emoji_moods:
+            moods = [mood for mood in self.mood_indicators if mood in emoji_moods]
+        else:
+            moods = [mood for mood in self.mood_keywords if ('mood', mood) in hits]
+
+        if not emojis.isdisjoint(self.positive_emojis):
+            polarity = 'positive'
+        elif not emojis.isdisjoint(self.negative_emojis):
+            polarity = 'negative'
+        else:
+            polarity = 'neutral'
+
+        return Classification(emojis, tags, moods or ['neutral'], polarity)
+
+    def find_emojis(self, text: str) -> Set[str]:
+        return set(self._emoji_re.findall(text))
@@ -0,0 +1,149 @@
+from typing import List, Dict, Any, Tuple
+from collections import deque
+import re
+import time
+
+from timestamps import to_epoch
+
+
+class MessageDeduper:
+    """Collapse duplicate and near-duplicate chat messages into weighted entries.
+
+    Messages are normalized before comparison: case, ASCII punctuation other
+    than '?' and whitespace are ignored, character runs are capped at two
+    ("soooo" == "soo"), repeated tokens collapse ("🤣🤣🤣🤣" == "🤣",
+    "lol lol lol" == "lol") and a message that is one phrase repeated is
+    reduced to that phrase. Repetition is found by comparing polynomial
+    rolling hashes of the token sequence against itself shifted by each
+    candidate period, and the key of a message is the hash of its base
+    phrase. Chat commands ("!vote 2") carry arguments that matter, so they
+    only collapse with the same command, compared with case and spacing
+    ignored.
+
+    ``collapse`` returns one entry per distinct key in the batch: the first
+    message with ``weight`` (how many messages it stands for) and
+    ``usernames`` (every sender, repeats included) added. An entry only
+    absorbs messages timestamped within ``window_seconds`` of its first one,
+    so a long archive loaded as one batch keeps its shape over time. Empty
+    messages are dropped. ``repeats`` counts entries whose key was already
+    seen within the last ``window_seconds``.
+    """
+
+    DEFAULT_WINDOW_SECONDS = 30
+    MAX_TRACKED_KEYS = 50000
+    HASH_BASE = 1000003
+    HASH_MOD = (1 << 61) - 1
+
+    COMMAND_PREFIX = '!'
+    TOKEN_PATTERN = re.compile(r"\w+|\?|[^\w\s!-/:-@\[-`{-~]")
+    CHAR_RUN_PATTERN = re.compile(r'(\w)\1{2,}')
+
+    def __init__(self, window_seconds: float = None, max_tracked_keys: int = None):
+        self.window_seconds = window_seconds or self.DEFAULT_WINDOW_SECONDS
+        self.max_tracked_keys = max_tracked_keys or self.MAX_TRACKED_KEYS
+        self._seen = {}  # key -> last seen time
+        self._seen_order = deque()  # (time, key), oldest first
+        self.messages_in = 0
+        self.entries_out = 0
+        self.empty_dropped = 0
+        self.repeats = 0
+
+    def key(self, text: str) -> Tuple[int, int]:
+        """Near-duplicate key of a message: (rolling hash, token count) of its base phrase.
+
+        Commands get (hash of the normalized command, 0). Returns None for
+        messages with nothing left after normalization.
+        """
+        if text.lstrip().startswith(self.COMMAND_PREFIX):
+            return hash(' '.join(text.lower().split())), 0
+        text = self.CHAR_RUN_PATTERN.sub(r'\1\1', text.lower())
+        tokens = []
+        for token in self.TOKEN_PATTERN.findall(text):
+            if not tokens or tokens[-1] != token:
+                tokens.append(token)
+        if not tokens:
+            return None
+
+        # prefix[i] is the rolling hash of tokens[:i]
+        base, mod = self.HASH_BASE, self.HASH_MOD
+        prefix = [0]
+        powers = [1]
+        for token in tokens:
+            prefix.append((prefix[-1] * base + hash(token)) % mod)
+            powers.append(powers[-1] * base % mod)
+
+        count = len(tokens)
+        for period in range(1, count // 2 + 1):
+            # tokens is periodic with this period iff tokens[period:] == tokens[:-period]
+            if count % period == 0:
+                shifted = (prefix[count] - prefix[period] * powers[count - period]) % mod
+                if shifted == prefix[count - period]:
+                    return prefix[period], period
+        return prefix[count], count
+
+    def collapse(self, messages: List[Dict[str, Any]], now: float = None) -> List[Dict[str, Any]]:
+        """Collapse a batch into weighted entries, in order of first occurrence."""
+        now = time.time() if now is None else now
+        self._expire(now)
+        entries = {}  # key -> (open entry, its first timestamp)
+        collapsed = []
+        for msg in messages:
+            self.messages_in += 1
+            key = self.key(msg.get('message', ''))
+            if key is None:
+                self.empty_dropped += 1
+                continue
+
+            timestamp = msg.get('timestamp')
+            if timestamp is not None:
+                timestamp = to_epoch(timestamp)
+            open_entry = entries.get(key)
+            if open_entry is not None:
+                entry, started = open_entry
+                if timestamp is None or started is None or timestamp - started <= self.window_seconds:
+                    entry['weight'] += msg.get('weight', 1)
+                    entry['usernames'].extend(msg.get('usernames') or [msg['username']])
+                    continue
+
+            entry = dict(msg)
+            entry['weight'] = msg.get('weight', 1)
+            entry['usernames'] = list(msg.get('usernames') or [msg['username']])
+            if key in self._seen or open_entry is not None:
+                self.repeats += 1
+            entries[key] = (entry, timestamp)
+            collapsed.append(entry)
+
+        for key in entries:
+            if key not in self._seen:
+                self._seen_order.append((now, key))
+            self._seen[key] = now
+        while len(self._seen) > self.max_tracked_keys:
+            _, key = self._seen_order.popleft()
+            self._seen.pop(key, None)
+
+        self.entries_out += len(collapsed)
+        return collapsed
+
+    def _expire(self, now: float) -> None:
+        """Forget keys not seen within the window."""
+        cutoff = now - self.window_seconds
+        while self._seen_order and self._seen_order[0][0] < cutoff:
+            seen_at, key = self._seen_order.popleft()
+            last_seen = self._seen.get(key)
+            if last_seen is None:
+                continue
+            if last_seen < cutoff:
+                del self._seen[key]
+            else:
+                # Seen again since: requeue at its latest time
+                self._seen_order.append((last_seen, key))
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'messages_in': self.messages_in,
+            'entries_out': self.entries_out,
+            'empty_dropped': self.empty_dropped,
+            'repeats': self.repeats,
+            'collapse_ratio': self.entries_out / self.messages_in if self.messages_in else 1.0,
+            'tracked_keys': len(self._seen)
+        }
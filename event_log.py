@@ -0,0 +1,164 @@
+from typing import Dict, Any, Iterator, List, Tuple
+import json
+import mmap
+import os
+import pickle
+import struct
+import zlib
+
+
+class EventLog:
+    """Append-only binary log of ingested chat events, with snapshot checkpoints.
+
+    The log file starts with ``MAGIC``; each record is a fixed header
+    (payload length, CRC-32 of kind and payload, kind) followed by the
+    payload as compact UTF-8 JSON. Records are only ever appended, so a crash
+    can at worst leave a torn last record; opening the log checks the records
+    after the latest snapshot and truncates anything that fails the length
+    or CRC check.
+
+    A snapshot is the pickled, zlib-compressed aggregate state together with
+    the log offset it covers, written atomically next to the log
+    (``<path>.snapshot``). Recovery loads the snapshot and replays only the
+    records after its offset, reading them through a memory map. Snapshots
+    are trusted local files: do not load one from an untrusted source.
+    """
+
+    MAGIC = b'CHATLOG1'
+    SNAPSHOT_MAGIC = b'CHATSNP1'
+    RECORD_HEADER = struct.Struct('<IIB')  # payload length, crc32, kind
+    SNAPSHOT_HEADER = struct.Struct('<8sQ')  # magic, log offset
+    MAX_RECORD_SIZE = 64 * 1024 * 1024
+
+    # Record kinds
+    MESSAGES = 1  # a batch of (collapsed) messages, or {'batch_id', 'messages'}
+    VOTE = 2  # a poll vote
+    POLL = 3  # a poll opened
+
+    def __init__(self, path: str, fsync: bool = False):
+        """Open or create the log at path.
+
+        Appends are flushed to the OS on every record; with fsync they are
+        also forced to disk, which survives power loss at a latency cost.
+        """
+        self.path = path
+        self.snapshot_path = f"{path}.snapshot"
+        self.fsync = fsync
+        self.truncated_bytes = 0
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            with open(path, 'wb') as f:
+                f.write(self.MAGIC)
+        self._check_magic()
+        self._truncate_torn_tail()
+        self._file = open(path, 'ab')
+        self.size = self._file.tell()
+
+    def _check_magic(self) -> None:
+        with open(self.path, 'rb') as f:
+            if f.read(len(self.MAGIC)) != self.MAGIC:
+                raise ValueError(f"{self.path} is not a chat event log")
+
+    def _truncate_torn_tail(self) -> None:
+        """Cut the log after the last intact record following the snapshot."""
+        size = os.path.getsize(self.path)
+        end = self.snapshot_offset()
+        if end > size:
+            end = len(self.MAGIC)
+        for _, _, end in self._records(end, decode=False):
+            pass
+        if end < size:
+            print(f"Truncating {size - end} bytes of torn records from {self.path}")
+            self.truncated_bytes = size - end
+            os.truncate(self.path, end)
+
+    def append(self, kind: int, payload: Any) -> int:
+        """Append a record and return the log offset after it."""
+        data = json.dumps(payload, ensure_ascii=False, separators=(',', ':'), default=str).encode('utf-8')
+        header = self.RECORD_HEADER.pack(len(data), zlib.crc32(data, kind), kind)
+        self._file.write(header + data)
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+        self.size += len(header) + len(data)
+        return self.size
+
+    def append_messages(self, messages: List[Dict[str, Any]], batch_id: int = None) -> int:
+        """Log a batch, tagged with the sender's batch id if it has one."""
+        if batch_id is None:
+            return self.append(self.MESSAGES, messages)
+        return self.append(self.MESSAGES, {'batch_id': batch_id, 'messages': messages})
+
+    def append_vote(self, poll_id: int, option: str, user: str, timestamp: float) -> int:
+        return self.append(
+            self.VOTE, {'poll_id': poll_id, 'option': option, 'user': user, 'timestamp': timestamp}
+        )
+
+    def append_poll(self, poll: Dict[str, Any]) -> int:
+        return self.append(self.POLL, poll)
+
+    def replay(self, offset: int = None) -> Iterator[Tuple[int, Any, int]]:
+        """Yield (kind, payload, end offset) for every record from offset (default: the start)."""
+        self._file.flush()
+        for kind, payload, end in self._records(offset or len(self.MAGIC)):
+            yield kind, payload, end
+
+    def _records(self, offset: int, decode: bool = True) -> Iterator[Tuple[int, Any, int]]:
+        """Walk intact records from offset through a memory map, stopping at the first bad one."""
+        size = os.path.getsize(self.path)
+        if offset > size:
+            # The log is older than the snapshot: it no longer covers it
+            print(f"{self.path} ends before offset {offset}, replaying it whole")
+            offset = len(self.MAGIC)
+        if offset >= size:
+            return
+        header_size = self.RECORD_HEADER.size
+        with open(self.path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            while offset + header_size <= size:
+                length, crc, kind = self.RECORD_HEADER.unpack_from(mm, offset)
+                end = offset + header_size + length
+                if length > self.MAX_RECORD_SIZE or end > size:
+                    break
+                data = mm[offset + header_size:end]
+                if zlib.crc32(data, kind) != crc:
+                    break
+                yield kind, json.loads(data) if decode else None, end
+                offset = end
+
+    def write_snapshot(self, state: Dict[str, Any], offset: int = None) -> None:
+        """Atomically write a checkpoint of state covering the log up to offset (default: all of it)."""
+        offset = self.size if offset is None else offset
+        blob = zlib.compress(pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL), 1)
+        tmp_path = f"{self.snapshot_path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(self.SNAPSHOT_HEADER.pack(self.SNAPSHOT_MAGIC, offset))
+            f.write(blob)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+
+    def snapshot_offset(self) -> int:
+        """Log offset covered by the latest snapshot (the log start if there is none)."""
+        try:
+            with open(self.snapshot_path, 'rb') as f:
+                magic, offset = self.SNAPSHOT_HEADER.unpack(f.read(self.SNAPSHOT_HEADER.size))
+        except (OSError, struct.error):
+            return len(self.MAGIC)
+        return offset if magic == self.SNAPSHOT_MAGIC else len(self.MAGIC)
+
+    def load_snapshot(self) -> Tuple[int, Dict[str, Any]]:
+        """Latest snapshot as (log offset, state), or (log start, None) if there is none."""
+        try:
+            with open(self.snapshot_path, 'rb') as f:
+                magic, offset = self.SNAPSHOT_HEADER.unpack(f.read(self.SNAPSHOT_HEADER.size))
+                if magic != self.SNAPSHOT_MAGIC:
+                    raise ValueError("bad snapshot header")
+                state = pickle.loads(zlib.decompress(f.read()))
+        except FileNotFoundError:
+            return len(self.MAGIC), None
+        except (OSError, ValueError, struct.error, zlib.error, pickle.UnpicklingError) as e:
+            print(f"Error loading snapshot, replaying the whole log: {e}")
+            return len(self.MAGIC), None
+        return offset, state
+
+    def close(self) -> None:
+        self._file.close()
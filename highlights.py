@@ -0,0 +1,192 @@
+from typing import List, Dict, Any, Iterator
+from collections import deque
+from datetime import datetime
+import hashlib
+import json
+import time
+
+
+class HighlightStore:
+    """Recent stream highlights, deduplicated by content and evicted oldest first.
+
+    Highlights are keyed by a hash of their normalized title and summary, so
+    the LLM repeating a highlight only bumps its ``mentions``. Entries sit in
+    a deque in arrival order, which is also time order, so TTL and size
+    eviction pop from the left. Evicted highlights go to an append-only JSONL
+    archive (or, without ``archive_path``, a bounded in-memory one) that
+    ``archived`` streams back and ``chapters`` turns into VOD chapters.
+
+    The LLM's own 'timestamp' is free text, so it is kept as 'stream_time';
+    'timestamp' is when the highlight was recorded.
+    """
+
+    DEFAULT_TTL = 30 * 60  # seconds
+    DEFAULT_MAX_SIZE = 10
+    MEMORY_ARCHIVE_SIZE = 1000
+    MIN_CHAPTER_SPACING = 60  # seconds; closer highlights merge into one chapter
+
+    def __init__(self, ttl: float = None, max_size: int = None, archive_path: str = None):
+        self.ttl = ttl or self.DEFAULT_TTL
+        self.max_size = max_size or self.DEFAULT_MAX_SIZE
+        self.archive_path = archive_path
+        self.entries = {}  # key -> highlight
+        self._order = deque()  # keys, oldest first
+        self._memory_archive = deque(maxlen=self.MEMORY_ARCHIVE_SIZE)
+        self._archive_file = None
+        self.archived_count = 0
+        self._version = 0
+        self._published = (-1, [])  # (version, newest-first snapshot)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # The archive file handle is reopened on the next eviction
+        state = self.__dict__.copy()
+        state['_archive_file'] = None
+        return state
+
+    @staticmethod
+    def key(highlight: Dict[str, Any]) -> str:
+        """Content hash of a highlight: its title and summary, case and spacing ignored."""
+        text = ' '.join(f"{highlight.get('title', '')}\n{highlight.get('summary', '')}".lower().split())
+        return hashlib.blake2b(text.encode('utf-8'), digest_size=12).hexdigest()
+
+    def add(self, highlights: List[Dict[str, Any]], now: float = None) -> List[Dict[str, Any]]:
+        """Add LLM highlights, returning the ones that were new."""
+        now = time.time() if now is None else now
+        self.expire(now)
+        added = []
+        for highlight in highlights:
+            if not isinstance(highlight, dict) or not highlight.get('title'):
+                continue
+            key = self.key(highlight)
+            existing = self.entries.get(key)
+            if existing is not None:
+                existing['mentions'] += 1
+                continue
+
+            entry = {k: v for k, v in highlight.items() if k != 'timestamp'}
+            if highlight.get('timestamp'):
+                entry['stream_time'] = str(highlight['timestamp'])
+            entry.update(key=key, created_at=now, mentions=1)
+            self.entries[key] = entry
+            self._order.append(key)
+            added.append(entry)
+
+        evicted = []
+        while len(self._order) > self.max_size:
+            evicted.append(self.entries.pop(self._order.popleft()))
+        self._archive(evicted)
+        if highlights or evicted:
+            self._version += 1
+        return added
+
+    def expire(self, now: float = None) -> int:
+        """Archive highlights older than the TTL; returns how many were evicted."""
+        cutoff = (time.time() if now is None else now) - self.ttl
+        evicted = []
+        while self._order and self.entries[self._order[0]]['created_at'] <= cutoff:
+            evicted.append(self.entries.pop(self._order.popleft()))
+        self._archive(evicted)
+        if evicted:
+            self._version += 1
+        return len(evicted)
+
+    def _archive(self, evicted: List[Dict[str, Any]]) -> None:
+        if not evicted:
+            return
+        self.archived_count += len(evicted)
+        if not self.archive_path:
+            self._memory_archive.extend(evicted)
+            return
+        try:
+            if self._archive_file is None:
+                self._archive_file = open(self.archive_path, 'a', encoding='utf-8')
+            for highlight in evicted:
+                self._archive_file.write(json.dumps(highlight, ensure_ascii=False, default=str) + '\n')
+            self._archive_file.flush()
+        except OSError as e:
+            print(f"Error archiving highlights: {e}")
+
+    def recent(self) -> List[Dict[str, Any]]:
+        """Live highlights, newest first; cached until the next change."""
+        version, highlights = self._published
+        if version != self._version:
+            highlights = [
+                {**self.entries[key], 'timestamp': datetime.fromtimestamp(self.entries[key]['created_at'])}
+                for key in reversed(self._order)
+            ]
+            self._published = (self._version, highlights)
+        return highlights
+
+    def archived(self, since: float = None, until: float = None,
+                 category: str = None) -> Iterator[Dict[str, Any]]:
+        """Stream archived highlights recorded between since and until (epoch seconds)."""
+        for highlight in self._read_archive():
+            created_at = highlight.get('created_at', 0)
+            if since is not None and created_at < since:
+                continue
+            if until is not None and created_at > until:
+                continue
+            if category is not None and highlight.get('category') != category:
+                continue
+            yield highlight
+
+    def _read_archive(self) -> Iterator[Dict[str, Any]]:
+        if not self.archive_path:
+            yield from list(self._memory_archive)
+            return
+        if self._archive_file is not None:
+            self._archive_file.flush()
+        try:
+            with open(self.archive_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        continue  # torn last line after a crash
+        except FileNotFoundError:
+            return
+
+    def chapters(self, stream_start: float, stream_end: float = None,
+                 min_spacing: float = None) -> List[Dict[str, Any]]:
+        """VOD chapters from archived and live highlights, in YouTube's format.
+
+        Highlights closer than min_spacing seconds merge into one chapter
+        titled by the most mentioned of them. The first chapter starts at 0:00.
+        """
+        min_spacing = min_spacing or self.MIN_CHAPTER_SPACING
+        seen = {}
+        live = list(self.entries.values())
+        for highlight in [*self.archived(since=stream_start, until=stream_end), *live]:
+            # A highlight can be archived twice across a restart from a snapshot
+            seen.setdefault(highlight['key'], highlight)
+
+        chapters = [{'offset': 0.0, 'title': 'Stream start', 'mentions': 0}]
+        for highlight in sorted(seen.values(), key=lambda h: h['created_at']):
+            offset = max(highlight['created_at'] - stream_start, 0.0)
+            if stream_end is not None and highlight['created_at'] > stream_end:
+                continue
+            last = chapters[-1]
+            if offset - last['offset'] < min_spacing:
+                if highlight['mentions'] > last['mentions'] and last['offset'] > 0:
+                    last.update(title=highlight['title'], mentions=highlight['mentions'])
+                continue
+            chapters.append({'offset': offset, 'title': highlight['title'], 'mentions': highlight['mentions']})
+
+        return [
+            {'offset': chapter['offset'], 'time': self._format_offset(chapter['offset']), 'title': chapter['title']}
+            for chapter in chapters
+        ]
+
+    @staticmethod
+    def _format_offset(offset: float) -> str:
+        hours, rest = divmod(int(offset), 3600)
+        minutes, seconds = divmod(rest, 60)
+        return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
+
+    def close(self) -> None:
+        if self._archive_file is not None:
+            self._archive_file.close()
+            self._archive_file = None
@@ -0,0 +1,108 @@
+from typing import List, Dict, Any, Iterable, Iterator, Tuple
+from collections import Counter, deque
+from datetime import datetime
+
+from message_store import MessageStore
+from timeseries import ChatTimeSeries
+from timestamps import to_epoch
+
+
+class MessageHistory:
+    """Bounded chat history with incrementally maintained engagement rollups.
+
+    Only the most recent ``max_messages`` are retained, in a columnar
+    ``MessageStore`` ring buffer. Totals, per-user counts, hourly rollups
+    and the ``ChatTimeSeries`` bins behind the peak times (``peak_resolution``
+    seconds each) cover the whole stream and are updated as messages arrive,
+    so reading the metrics never walks the history.
+    """
+
+    DEFAULT_MAX_MESSAGES = 10000
+    DEFAULT_MAX_HOURS = 48
+    TOP_USERS_LIMIT = 5
+    PEAK_TIMES_LIMIT = 3
+    DEFAULT_PEAK_RESOLUTION = 300  # seconds per bin when finding peak times
+
+    def __init__(self, max_messages: int = None, max_hours: int = None,
+                 peak_resolution: float = None):
+        max_messages = max_messages or self.DEFAULT_MAX_MESSAGES
+        self.store = MessageStore(capacity=max_messages)
+        self.total_messages = 0
+        self.user_counts = Counter()
+        self.timeseries = ChatTimeSeries(
+            resolution=peak_resolution or self.DEFAULT_PEAK_RESOLUTION, capacity=max_messages
+        )
+        # (hour start epoch, message count) for the most recent hours
+        self.hourly_rollups = deque(maxlen=max_hours or self.DEFAULT_MAX_HOURS)
+        self._top_users = {}
+
+    def extend(self, messages: Iterable[Dict[str, Any]]) -> None:
+        """Append messages, folding each one into the rollups."""
+        for msg in messages:
+            self.append(msg)
+
+    def append(self, message: Dict[str, Any]) -> None:
+        """Append a single message, or a weighted entry from MessageDeduper."""
+        username = message['username']
+        weight = message.get('weight', 1)
+        timestamp = to_epoch(message.get('timestamp'))
+        self.store.append(username, message['message'], timestamp, [])
+
+        self.total_messages += weight
+        for sender in message.get('usernames') or (username,):
+            self.user_counts[sender] += 1
+            self._update_top_users(sender, self.user_counts[sender])
+
+        self.timeseries.append(timestamp, weight=weight)
+        hour_start = timestamp - timestamp % 3600
+        if self.hourly_rollups and self.hourly_rollups[-1][0] == hour_start:
+            self.hourly_rollups[-1] = (hour_start, self.hourly_rollups[-1][1] + weight)
+        else:
+            self.hourly_rollups.append((hour_start, weight))
+
+    def __len__(self) -> int:
+        return len(self.store)
+
+    def __iter__(self) -> Iterator[Tuple[str, str, float]]:
+        return self.store.iter_compact()
+
+    def get_engagement_metrics(self) -> Dict[str, Any]:
+        """Get engagement metrics for the whole stream."""
+        if not self.total_messages:
+            return {
+                "total_messages": 0,
+                "active_users": 0,
+                "avg_response_time": 0,
+                "peak_times": []
+            }
+
+        return {
+            "total_messages": self.total_messages,
+            "active_users": len(self.user_counts),
+            "most_active_users": sorted(
+                self._top_users.items(), key=lambda x: x[1], reverse=True
+            ),
+            "peak_times": self._calculate_peak_times(),
+            "hourly_rollups": [
+                {"hour_start": datetime.fromtimestamp(start).isoformat(), "message_count": count}
+                for start, count in self.hourly_rollups
+            ]
+        }
+
+    def _calculate_peak_times(self) -> List[Dict[str, Any]]:
+        """Calculate the busiest periods of peak_resolution seconds."""
+        return [
+            {**peak, "start": datetime.fromtimestamp(peak["start"]).isoformat()}
+            for peak in self.timeseries.peak_times(limit=self.PEAK_TIMES_LIMIT)
+        ]
+
+    def _update_top_users(self, username: str, count: int) -> None:
+        """Keep the top users current; counts only grow, so this stays exact."""
+        if username in self._top_users or len(self._top_users) < self.TOP_USERS_LIMIT:
+            self._top_users[username] = count
+            return
+
+        weakest = min(self._top_users, key=self._top_users.get)
+        if count > self._top_users[weakest]:
+            del self._top_users[weakest]
+            self._top_users[username] = count
@@ -0,0 +1,89 @@
+from typing import List, Dict, Any
+from collections import Counter, deque
+import asyncio
+import time
+
+
+class MessageBuffer:
+    """Bounded buffer of pending chat messages with an overload policy.
+
+    Policies, applied when a message arrives and the buffer is full:
+    ``drop_oldest`` evicts the oldest pending message, ``drop_newest``
+    rejects the incoming one, and ``coalesce`` rejects the incoming message
+    if the same text is already pending (it adds nothing new) and otherwise
+    falls back to evicting the oldest.
+    """
+
+    POLICIES = ('drop_oldest', 'drop_newest', 'coalesce')
+
+    def __init__(self, max_pending: int = 5000, policy: str = 'drop_oldest'):
+        if policy not in self.POLICIES:
+            raise ValueError(f"Unknown overflow policy: {policy}")
+        self.max_pending = max_pending
+        self.policy = policy
+        self.pending = deque()  # (enqueued_at, message)
+        self.pending_texts = Counter()
+        self.dropped = 0
+        self.coalesced = 0
+        self.total_enqueued = 0
+        self.last_batch_lag = 0.0
+        self._not_empty = asyncio.Event()
+
+    def __len__(self) -> int:
+        return len(self.pending)
+
+    def put_many(self, messages: List[Dict[str, Any]]) -> None:
+        """Add messages, applying the overflow policy when full."""
+        now = time.monotonic()
+        for msg in messages:
+            self.total_enqueued += 1
+            if len(self.pending) >= self.max_pending:
+                if self.policy == 'drop_newest':
+                    self.dropped += 1
+                    continue
+                if self.policy == 'coalesce' and self.pending_texts[self._key(msg)]:
+                    self.coalesced += 1
+                    continue
+                self._pop_oldest()
+                self.dropped += 1
+
+            self.pending.append((now, msg))
+            self.pending_texts[self._key(msg)] += 1
+        if self.pending:
+            self._not_empty.set()
+
+    async def get_batch(self, max_size: int, max_delay: float) -> List[Dict[str, Any]]:
+        """Wait for a micro-batch: max_size messages or max_delay seconds after the first."""
+        while not self.pending:
+            self._not_empty.clear()
+            await self._not_empty.wait()
+
+        deadline = self.pending[0][0] + max_delay
+        while len(self.pending) < max_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            self._not_empty.clear()
+            try:
+                await asyncio.wait_for(self._not_empty.wait(), timeout=remaining)
+            except asyncio.TimeoutError:
+                break
+
+        self.last_batch_lag = time.monotonic() - self.pending[0][0]
+        return [self._pop_oldest()[1] for _ in range(min(max_size, len(self.pending)))]
+
+    def lag(self) -> float:
+        """Seconds the oldest pending message has been waiting."""
+        return time.monotonic() - self.pending[0][0] if self.pending else 0.0
+
+    def _pop_oldest(self):
+        enqueued_at, msg = self.pending.popleft()
+        key = self._key(msg)
+        self.pending_texts[key] -= 1
+        if not self.pending_texts[key]:
+            del self.pending_texts[key]
+        return enqueued_at, msg
+
+    @staticmethod
+    def _key(message: Dict[str, Any]) -> str:
+        return message.get('message', '').strip().lower()
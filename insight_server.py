@@ -0,0 +1,266 @@
+from typing import List, Dict, Any, Optional
+import asyncio
+import hmac
+import json
+from urllib.parse import urlsplit, parse_qs
+
+from instrumentation import Metrics, Profiler, default_metrics, default_profiler
+
+
+def json_diff(old: Any, new: Any, path: str = '') -> List[Dict[str, Any]]:
+    """JSON-patch style operations (add/remove/replace) turning old into new.
+
+    Items appended to a list are added at ``<path>/-`` and items removed
+    from it are removed by index, so a list that grows by one costs one op.
+    """
+    if isinstance(old, dict) and isinstance(new, dict):
+        ops = []
+        for key in old:
+            if key not in new:
+                ops.append({'op': 'remove', 'path': f"{path}/{_escape(key)}"})
+        for key, value in new.items():
+            child = f"{path}/{_escape(key)}"
+            if key not in old:
+                ops.append({'op': 'add', 'path': child, 'value': value})
+            else:
+                ops.extend(json_diff(old[key], value, child))
+        return ops
+
+    if isinstance(old, list) and isinstance(new, list):
+        return _list_diff(old, new, path)
+
+    if old != new:
+        return [{'op': 'replace', 'path': path, 'value': new}]
+    return []
+
+
+def _list_diff(old: List[Any], new: List[Any], path: str) -> List[Dict[str, Any]]:
+    """Operations for a list, sending only the appended items when it grew or slid."""
+    # A growing or sliding list (e.g. the newest N questions) is old minus a
+    # few items at the front plus new ones at the end
+    for shift in range(len(old)):
+        kept = len(old) - shift
+        if kept <= len(new) and old[shift:] == new[:kept]:
+            ops = [{'op': 'remove', 'path': f"{path}/0"} for _ in range(shift)]
+            ops.extend({'op': 'add', 'path': f"{path}/-", 'value': item} for item in new[kept:])
+            return ops
+
+    ops = []
+    for idx, (old_item, new_item) in enumerate(zip(old, new)):
+        ops.extend(json_diff(old_item, new_item, f"{path}/{idx}"))
+    ops.extend({'op': 'add', 'path': f"{path}/-", 'value': item} for item in new[len(old):])
+    ops.extend({'op': 'remove', 'path': f"{path}/{idx}"} for idx in range(len(old) - 1, len(new) - 1, -1))
+    return ops
+
+
+def _escape(key: str) -> str:
+    return str(key).replace('~', '~0').replace('/', '~1')
+
+
+class InsightClient:
+    """One connected dashboard with its own bounded outbound queue."""
+
+    def __init__(self, writer: asyncio.StreamWriter, queue_size: int):
+        self.writer = writer
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.needs_snapshot = False
+        self.resyncs = 0
+        self.task = asyncio.current_task()  # the connection handler streaming to it
+
+
+class InsightServer:
+    """Server-Sent Events server pushing insight deltas to many dashboards.
+
+    ``GET /insights`` opens an event stream that starts with a full
+    ``snapshot`` event followed by ``patch`` events carrying JSON-patch style
+    operations. Every client has its own bounded queue and writer task; a
+    client whose queue fills up has its backlog dropped and is sent a fresh
+    snapshot instead, so a slow browser never holds up the others.
+    ``GET /snapshot`` returns the current insights as plain JSON.
+
+    Operational endpoints, which are sent without CORS headers so browsers
+    on other origins cannot call them: ``GET /metrics`` serves the Prometheus
+    text format, ``POST /profile/start?mode=sampling|cprofile`` starts the
+    profiler on the event loop thread and ``POST /profile/stop`` returns its
+    report. The profile endpoints need an ``Authorization: Bearer <ops_token>``
+    header and are disabled when no ops_token is set.
+    """
+
+    DEFAULT_QUEUE_SIZE = 32
+    HEARTBEAT_SECONDS = 15
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 8765,
+                 client_queue_size: int = None, allowed_origin: str = '*',
+                 metrics: Metrics = None, profiler: Profiler = None,
+                 ops_token: str = None):
+        self.host = host
+        self.port = port
+        self.client_queue_size = client_queue_size or self.DEFAULT_QUEUE_SIZE
+        self.allowed_origin = allowed_origin
+        self.metrics = metrics or default_metrics
+        self.profiler = profiler or default_profiler
+        self.ops_token = ops_token
+        self.clients = set()
+        self.snapshot = {}
+        self.version = 0
+        self._server = None
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        """Stop accepting connections and end every client stream."""
+        if self._server:
+            self._server.close()
+        # The stream handlers wait on their queues indefinitely: cancel them,
+        # and each closes its own writer
+        tasks = [client.task for client in self.clients if client.task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if self._server:
+            await self._server.wait_closed()
+
+    def publish(self, insights: Dict[str, Any]) -> None:
+        """Queue the delta between the last published insights and these."""
+        # Round-trip through JSON so datetimes etc. compare as they will be sent
+        new_snapshot = json.loads(json.dumps(insights, default=str))
+        ops = json_diff(self.snapshot, new_snapshot)
+        if not ops:
+            return
+
+        self.snapshot = new_snapshot
+        self.version += 1
+        event = self._format_event('patch', {'version': self.version, 'ops': ops})
+        for client in self.clients:
+            if client.needs_snapshot:
+                continue
+            try:
+                client.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # Too far behind: drop its backlog and resync with a snapshot
+                client.needs_snapshot = True
+                client.resyncs += 1
+                while not client.queue.empty():
+                    client.queue.get_nowait()
+                client.queue.put_nowait(None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'clients': len(self.clients),
+            'version': self.version,
+            'max_client_backlog': max((c.queue.qsize() for c in self.clients), default=0),
+            'resyncs': sum(c.resyncs for c in self.clients)
+        }
+
+    async def _handle_connection(self, reader: asyncio.StreamReader,
+                                 writer: asyncio.StreamWriter) -> None:
+        try:
+            request_line = await reader.readline()
+            headers = {}
+            while True:
+                line = (await reader.readline()).decode('latin-1').strip()
+                if not line:
+                    break
+                name, _, value = line.partition(':')
+                headers[name.strip().lower()] = value.strip()
+            parts = request_line.decode('latin-1').split()
+            method = parts[0].upper() if parts else 'GET'
+            url = urlsplit(parts[1] if len(parts) > 1 else '/')
+            path = url.path
+
+            if path.startswith('/insights'):
+                await self._stream(writer)
+            elif path.startswith('/snapshot'):
+                body = json.dumps({'version': self.version, 'insights': self.snapshot}).encode()
+                writer.write(self._headers('200 OK', 'application/json', len(body)) + body)
+                await writer.drain()
+            elif path == '/metrics':
+                for name, value in self.get_stats().items():
+                    self.metrics.set(f'sse_{name}', value)
+                await self._write_text(writer, self.metrics.render_prometheus(),
+                                       'text/plain; version=0.0.4', cors=False)
+            elif path in ('/profile/start', '/profile/stop'):
+                await self._handle_profile(writer, method, path, url.query, headers)
+            else:
+                writer.write(self._headers('404 Not Found', 'text/plain', 0))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except asyncio.CancelledError:
+            pass  # the server is stopping
+        finally:
+            writer.close()
+
+    async def _handle_profile(self, writer: asyncio.StreamWriter, method: str, path: str,
+                              query: str, headers: Dict[str, str]) -> None:
+        """Start or stop the profiler for an authorized POST."""
+        if method != 'POST':
+            await self._write_text(writer, "use POST\n", status='405 Method Not Allowed', cors=False)
+            return
+        if not self._authorized(headers):
+            await self._write_text(writer, "forbidden\n", status='403 Forbidden', cors=False)
+            return
+        if path == '/profile/stop':
+            await self._write_text(writer, self.profiler.stop() or "profiler not running\n", cors=False)
+            return
+        mode = parse_qs(query).get('mode', ['sampling'])[0]
+        try:
+            self.profiler.start(mode)
+            await self._write_text(writer, f"profiling ({mode})\n", cors=False)
+        except ValueError as e:
+            await self._write_text(writer, f"{e}\n", status='400 Bad Request', cors=False)
+
+    def _authorized(self, headers: Dict[str, str]) -> bool:
+        if not self.ops_token:
+            return False
+        scheme, _, token = headers.get('authorization', '').partition(' ')
+        return scheme.lower() == 'bearer' and hmac.compare_digest(token.strip(), self.ops_token)
+
+    async def _stream(self, writer: asyncio.StreamWriter) -> None:
+        client = InsightClient(writer, self.client_queue_size)
+        writer.write(self._headers('200 OK', 'text/event-stream'))
+        writer.write(self._snapshot_event())
+        self.clients.add(client)
+        try:
+            await writer.drain()
+            while True:
+                try:
+                    event = await asyncio.wait_for(client.queue.get(), timeout=self.HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    event = b': heartbeat\n\n'
+                if event is None:
+                    client.needs_snapshot = False
+                    event = self._snapshot_event()
+                writer.write(event)
+                await writer.drain()
+        finally:
+            self.clients.discard(client)
+
+    async def _write_text(self, writer: asyncio.StreamWriter, text: str,
+                          content_type: str = 'text/plain', status: str = '200 OK',
+                          cors: bool = True) -> None:
+        body = text.encode()
+        writer.write(self._headers(status, content_type, len(body), cors) + body)
+        await writer.drain()
+
+    def _snapshot_event(self) -> bytes:
+        return self._format_event('snapshot', {'version': self.version, 'insights': self.snapshot})
+
+    @staticmethod
+    def _format_event(event: str, data: Any) -> bytes:
+        return f"event: {event}\ndata: {json.dumps(data)}\n\n".encode()
+
+    def _headers(self, status: str, content_type: str, length: Optional[int] = None,
+                 cors: bool = True) -> bytes:
+        lines = [f"HTTP/1.1 {status}", f"Content-Type: {content_type}"]
+        if cors:
+            lines.append(f"Access-Control-Allow-Origin: {self.allowed_origin}")
+        lines.append("Cache-Control: no-cache")
+        if length is None:
+            lines.append("Connection: keep-alive")
+        else:
+            lines.append(f"Content-Length: {length}")
+            lines.append("Connection: close")
+        return ('\r\n'.join(lines) + '\r\n\r\n').encode()
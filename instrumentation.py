@@ -0,0 +1,216 @@
+from typing import Dict, Any, Tuple
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+import cProfile
+import io
+import pstats
+import sys
+import threading
+import time
+
+
+class Metrics:
+    """Thread-safe registry of counters, gauges and timers.
+
+    Metrics are keyed by name plus keyword labels, e.g.
+    ``metrics.inc('llm_calls_total', task='sentiment')``. Timers keep count,
+    sum and max of the observed seconds, which is enough for averages and
+    rates on a dashboard without per-sample storage. ``render_prometheus``
+    returns the Prometheus text exposition format.
+    """
+
+    PREFIX = 'chat_insights_'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = defaultdict(float)
+        self.gauges = {}
+        self.timers = {}  # key -> [count, sum, max]
+
+    @staticmethod
+    def _key(name: str, labels: Dict[str, Any]) -> Tuple[str, Tuple]:
+        return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        key = self._key(name, labels)
+        with self._lock:
+            self.counters[key] += value
+
+    def set(self, name: str, value: float, **labels) -> None:
+        key = self._key(name, labels)
+        with self._lock:
+            self.gauges[key] = value
+
+    def observe(self, name: str, seconds: float, **labels) -> None:
+        key = self._key(name, labels)
+        with self._lock:
+            stats = self.timers.get(key)
+            if stats is None:
+                self.timers[key] = [1, seconds, seconds]
+            else:
+                stats[0] += 1
+                stats[1] += seconds
+                stats[2] = max(stats[2], seconds)
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        """Time the enclosed block into the named timer."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def reset(self) -> None:
+        with self._lock:
+            self.counters.clear()
+            self.gauges.clear()
+            self.timers.clear()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Plain-dict view of every metric, keyed by 'name{labels}'."""
+        with self._lock:
+            return {
+                'counters': {self._format(key): value for key, value in self.counters.items()},
+                'gauges': {self._format(key): value for key, value in self.gauges.items()},
+                'timers': {
+                    self._format(key): {'count': count, 'sum': total, 'max': peak}
+                    for key, (count, total, peak) in self.timers.items()
+                }
+            }
+
+    def render_prometheus(self) -> str:
+        """Render every metric in the Prometheus text exposition format."""
+        with self._lock:
+            counters = sorted(self.counters.items())
+            gauges = sorted(self.gauges.items())
+            timers = sorted((key, list(stats)) for key, stats in self.timers.items())
+
+        lines = []
+        typed = set()
+
+        def declare(name: str, kind: str) -> None:
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} {kind}")
+
+        for key, value in counters:
+            name = self.PREFIX + key[0]
+            declare(name, 'counter')
+            lines.append(f"{self._format(key, name)} {value:g}")
+        for key, value in gauges:
+            name = self.PREFIX + key[0]
+            declare(name, 'gauge')
+            lines.append(f"{self._format(key, name)} {value:g}")
+        for key, (count, total, _) in timers:
+            name = self.PREFIX + key[0]
+            declare(name, 'summary')
+            lines.append(f"{self._format(key, name + '_count')} {count}")
+            lines.append(f"{self._format(key, name + '_sum')} {total:.6f}")
+        # Maxima are their own gauge family; samples of a family must stay together
+        for key, (_, _, peak) in timers:
+            name = self.PREFIX + key[0] + '_max'
+            declare(name, 'gauge')
+            lines.append(f"{self._format(key, name)} {peak:.6f}")
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def _format(key: Tuple[str, Tuple], name: str = None) -> str:
+        metric, labels = key
+        name = name or metric
+        if not labels:
+            return name
+        rendered = ','.join(
+            '{}="{}"'.format(k, v.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+            for k, v in labels
+        )
+        return f"{name}{{{rendered}}}"
+
+
+class Profiler:
+    """Profiler that can be switched on and off while the stream is running.
+
+    ``cprofile`` mode records every call deterministically (accurate but
+    slows the hot path noticeably); ``sampling`` mode has a background thread
+    record the stack of a target thread every ``interval`` seconds, which is
+    cheap enough to leave on in production. ``stop`` returns a text report
+    of the hottest functions.
+    """
+
+    MODES = ('cprofile', 'sampling')
+    REPORT_LIMIT = 30
+
+    def __init__(self):
+        self.mode = None
+        self._profile = None
+        self._samples = Counter()
+        self._sample_count = 0
+        self._sampler = None
+        self._stop_sampling = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return self.mode is not None
+
+    def start(self, mode: str = 'sampling', interval: float = 0.005,
+              thread_id: int = None) -> None:
+        """Start profiling; sampling targets thread_id (default: the calling thread)."""
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown profiler mode: {mode}")
+        if self.running:
+            return
+        self.mode = mode
+        if mode == 'cprofile':
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+            return
+
+        self._samples = Counter()
+        self._sample_count = 0
+        self._stop_sampling.clear()
+        target = thread_id or threading.get_ident()
+        self._sampler = threading.Thread(
+            target=self._sample_loop, args=(target, interval),
+            name='profiler-sampler', daemon=True
+        )
+        self._sampler.start()
+
+    def stop(self) -> str:
+        """Stop profiling and return the report (empty if it was not running)."""
+        if not self.running:
+            return ''
+        mode, self.mode = self.mode, None
+        if mode == 'cprofile':
+            self._profile.disable()
+            out = io.StringIO()
+            pstats.Stats(self._profile, stream=out).sort_stats('cumulative').print_stats(self.REPORT_LIMIT)
+            self._profile = None
+            return out.getvalue()
+
+        self._stop_sampling.set()
+        self._sampler.join()
+        lines = [f"{self._sample_count} samples, inclusive share per function:"]
+        for location, hits in self._samples.most_common(self.REPORT_LIMIT):
+            lines.append(f"{hits / max(self._sample_count, 1):7.1%}  {location}")
+        return '\n'.join(lines) + '\n'
+
+    def _sample_loop(self, thread_id: int, interval: float) -> None:
+        while not self._stop_sampling.wait(interval):
+            frame = sys._current_frames().get(thread_id)
+            if frame is None:
+                continue
+            self._sample_count += 1
+            seen = set()
+            while frame is not None:
+                code = frame.f_code
+                location = f"{code.co_filename}:{code.co_firstlineno} {code.co_name}"
+                # Count recursive functions once per sample
+                if location not in seen:
+                    seen.add(location)
+                    self._samples[location] += 1
+                frame = frame.f_back
+
+
+# Process-wide defaults shared by the processor, analyzer and controller
+default_metrics = Metrics()
+default_profiler = Profiler()
@@ -0,0 +1,215 @@
+from typing import Dict, Any
+import random
+import threading
+import time
+
+from instrumentation import Metrics, default_metrics
+
+
+def _load_openai():
+    """Import the OpenAI SDK on first use.
+
+    It pulls in httpx and pydantic, which dominates startup for offline
+    jobs that never call an LLM.
+    """
+    import openai
+    return openai
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the provider while the circuit is open."""
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker.
+
+    After ``failure_threshold`` failures in a row the circuit opens and calls
+    fail fast for ``reset_timeout`` seconds. Then a single trial call is let
+    through (half-open); its success closes the circuit, its failure opens it
+    again.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == 'closed':
+                return True
+            if self.state == 'open' and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = 'half_open'
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = 'closed'
+            self.failures = 0
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.state == 'half_open' or self.failures >= self.failure_threshold:
+                self.state = 'open'
+                self.opened_at = time.monotonic()
+
+
+class LLMClient:
+    """Shared, resilient chat-completion client for the analyzer tasks.
+
+    - One pooled OpenAI client per (base_url, api_key) is shared by every
+      LLMClient in the process, so analyzers for many channels reuse the
+      same keep-alive connections.
+    - Each task has a time budget covering all of its attempts, and a model
+      route (a small fast model for sentiment and answers, the large one for
+      polls and highlights).
+    - Timeouts, connection errors, 429s and 5xx responses are retried with
+      full-jitter exponential backoff. A 429 honours ``Retry-After`` and
+      holds back every task until it passes instead of hammering the
+      provider.
+    - A circuit breaker fails fast while the provider is unhealthy; the
+      analyzer then keeps its last good results where they stay meaningful.
+    - The OpenAI SDK is imported and the HTTP client built on the first
+      call, not at construction.
+    """
+
+    LARGE_MODEL = "meta-llama/Meta-Llama-3.1-70B-Instruct"
+    SMALL_MODEL = "meta-llama/Meta-Llama-3.1-8B-Instruct"
+    DEFAULT_MODELS = {
+        'sentiment': SMALL_MODEL,
+        'answer': SMALL_MODEL,
+        'polls': LARGE_MODEL,
+        'highlights': LARGE_MODEL,
+        'combined': LARGE_MODEL
+    }
+    DEFAULT_TASK_TIMEOUTS = {
+        'sentiment': 10.0,
+        'answer': 10.0,
+        'polls': 20.0,
+        'highlights': 20.0,
+        'combined': 25.0
+    }
+    MAX_RETRIES = 2
+    BACKOFF_BASE = 0.5
+    BACKOFF_MAX = 8.0
+    # Names in the openai module, resolved when the SDK is first imported
+    RETRYABLE_ERRORS = (
+        'APITimeoutError',
+        'APIConnectionError',
+        'RateLimitError',
+        'InternalServerError'
+    )
+
+    _shared_clients = {}
+    _shared_lock = threading.Lock()
+
+    def __init__(self, api_key: str, base_url: str, timeout: float = 30.0,
+                 models: Dict[str, str] = None, task_timeouts: Dict[str, float] = None,
+                 max_retries: int = None, failure_threshold: int = 5,
+                 reset_timeout: float = 30.0, metrics: Metrics = None):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.timeout = timeout
+        self.models = {**self.DEFAULT_MODELS, **(models or {})}
+        self.task_timeouts = {**self.DEFAULT_TASK_TIMEOUTS, **(task_timeouts or {})}
+        self.max_retries = self.MAX_RETRIES if max_retries is None else max_retries
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.metrics = metrics or default_metrics
+        self._client = None
+        self._rate_limited_until = 0.0
+
+    @property
+    def client(self) -> Any:
+        """The shared OpenAI client, built on first use."""
+        if self._client is None:
+            self._client = self._shared_client(self.base_url, self.api_key)
+        return self._client
+
+    @classmethod
+    def _shared_client(cls, base_url: str, api_key: str) -> Any:
+        key = (base_url, api_key)
+        with cls._shared_lock:
+            client = cls._shared_clients.get(key)
+            if client is None:
+                # Retries are handled here, with task-aware budgets
+                client = _load_openai().OpenAI(base_url=base_url, api_key=api_key, max_retries=0)
+                cls._shared_clients[key] = client
+            return client
+
+    def model_for(self, task: str) -> str:
+        return self.models.get(task, self.LARGE_MODEL)
+
+    def complete(self, task: str, **request) -> Any:
+        """Create a chat completion for a task with retries and the circuit breaker."""
+        try:
+            return self._complete_with_retries(task, request)
+        finally:
+            self.metrics.set('llm_circuit_open', int(self.breaker.state != 'closed'))
+
+    def _complete_with_retries(self, task: str, request: Dict[str, Any]) -> Any:
+        request.setdefault('model', self.model_for(task))
+        openai = _load_openai()
+        retryable = tuple(getattr(openai, name) for name in self.RETRYABLE_ERRORS)
+        budget = min(self.task_timeouts.get(task, self.timeout), self.timeout)
+        deadline = time.monotonic() + budget
+        attempt = 0
+        while True:
+            if not self.breaker.allow():
+                self.metrics.inc('llm_circuit_rejections_total', task=task)
+                raise CircuitOpenError(f"LLM circuit open, skipping {task}")
+
+            wait = self._rate_limited_until - time.monotonic()
+            if wait > 0:
+                if time.monotonic() + wait >= deadline:
+                    raise TimeoutError(f"Rate limited beyond the {task} budget")
+                time.sleep(wait)
+
+            remaining = deadline - time.monotonic()
+            try:
+                response = self.client.chat.completions.create(timeout=remaining, **request)
+            except retryable as e:
+                self.breaker.record_failure()
+                retry_after = self._retry_after(e)
+                delay = retry_after or self._backoff(attempt)
+                attempt += 1
+                if attempt > self.max_retries or time.monotonic() + delay >= deadline:
+                    raise
+                self.metrics.inc('llm_retries_total', task=task, error=type(e).__name__)
+                time.sleep(delay)
+                continue
+            except Exception:
+                # The provider answered (e.g. a 400): our fault, not an unhealthy provider
+                self.breaker.record_success()
+                raise
+            self.breaker.record_success()
+            return response
+
+    def _retry_after(self, error: Exception) -> float:
+        """Seconds the provider asked us to wait on a 429, also applied to every task."""
+        if not isinstance(error, _load_openai().RateLimitError):
+            return 0.0
+        self.metrics.inc('llm_rate_limited_total')
+        try:
+            retry_after = float(error.response.headers.get('retry-after', 0))
+        except (AttributeError, TypeError, ValueError):
+            retry_after = 0.0
+        delay = retry_after or self._backoff(0)
+        self._rate_limited_until = max(self._rate_limited_until, time.monotonic() + delay)
+        return delay
+
+    def _backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff."""
+        return random.uniform(0, min(self.BACKOFF_MAX, self.BACKOFF_BASE * 2 ** attempt))
+
+    def get_status(self) -> Dict[str, Any]:
+        return {
+            'circuit': self.breaker.state,
+            'consecutive_failures': self.breaker.failures,
+            'rate_limited_for': max(self._rate_limited_until - time.monotonic(), 0.0),
+            'models': dict(self.models)
+        }
@@ -2,7 +2,17 @@ import json
 from datetime import datetime
 from typing import List, Dict, Any, Set
 from collections import Counter, defaultdict
-import re
+from functools import partial
+import heapq
+
+from classifier import Classification, MessageClassifier
+from dedup import MessageDeduper
+from instrumentation import Metrics, default_metrics
+from message_store import MessageStore
+from timestamps import to_epoch
+from trending import SpaceSavingSketch, TrendingIndex
+# timeseries and sentiment_model import NumPy, most of this module's import
+# time, so they are imported when the first processor is built
 
 class MessageProcessor:
     # Class-level constants
@@ -12,6 +22,10 @@ class MessageProcessor:
     TRENDING_TOPICS_LIMIT = 10
     KEYWORDS_PER_MOOD = 2
     TOP_KEYWORDS_LIMIT = 3
+    WORD_CAPACITY = 5000  # distinct words counted for the all-time trending topics
+    MOOD_KEYWORD_CAPACITY = 500  # distinct keywords counted per mood
+    ACTIVITY_RESOLUTION = 60  # seconds per bin of the activity series
+    ACTIVITY_BINS = 60  # most recent bins published in the activity series
 
     # Mood and sentiment indicators
     MOOD_INDICATORS = {
@@ -33,250 +47,314 @@ class MessageProcessor:
         'concerned': ['please', 'help', 'why']
     }
 
-    def __init__(self):
-        self.messages = []
+    # Tag rules: a message gets the tag if it contains any of the keywords
+    TAG_KEYWORDS = {
+        'chess': ['chess'],
+        'game': ['game'],
+        'technical': ['video', 'stream', 'quality'],
+        'entertainment': ['bheem', 'kaliya']
+    }
+    EMOJI_TAG = 'reaction'
+
+    # Everything a restart needs to resume the aggregates (see get_state)
+    STATE_FIELDS = (
+        'messages', 'processed_data', '_users', '_total_messages', '_emoji_messages',
+        '_tag_counts', '_word_counts', 'trending_index', '_mood_counts', '_mood_keywords',
+        'timeseries', '_basic_sentiment', '_questions'
+    )
+
+    _default_classifier = None
+    _default_sentiment_model = None
+
+    def __init__(self, rules: Dict[str, Dict[str, List[str]]] = None, metrics: Metrics = None,
+                 dedup: bool = True, capacity: int = None, max_questions: int = None):
+        """Create a processor, optionally extending the keyword rules for a channel.
+
+        With dedup, load_messages collapses duplicate and near-duplicate
+        messages into weighted entries first (see MessageDeduper). For a
+        long-running stream, capacity bounds the stored messages and time
+        series entries to the newest ones and max_questions the questions
+        kept and published; the counters still cover every message. Word
+        and mood keyword counts are Space-Saving sketches, so they stay
+        bounded too while keeping the heavy hitters they publish.
+        """
+        self.metrics = metrics or default_metrics
+        self.dedup = dedup
+        self.capacity = capacity
+        self.max_questions = max_questions
+        self.classifier = self._get_default_classifier()
+        if rules:
+            self.classifier = self.classifier.extend(rules)
+        self.sentiment_model = self._get_default_sentiment_model()
+        self.messages = MessageStore(capacity=capacity)
         self.processed_data = defaultdict(list)
         self.current_batch_size = 100
+        self._reset_aggregates()
+
+    @classmethod
+    def _get_default_classifier(cls) -> MessageClassifier:
+        """Compile the class-level rules once and share the classifier."""
+        if cls.__dict__.get('_default_classifier') is None:
+            cls._default_classifier = MessageClassifier(
+                cls.TAG_KEYWORDS, cls.MOOD_INDICATORS, cls.MOOD_KEYWORDS,
+                cls.POSITIVE_EMOJIS, cls.NEGATIVE_EMOJIS,
+                cls.EMOJI_PATTERN, cls.EMOJI_TAG
+            )
+        return cls._default_classifier
+
+    @classmethod
+    def _get_default_sentiment_model(cls) -> Any:
+        """Build the lexicon-seeded sentiment model once and share it."""
+        if cls.__dict__.get('_default_sentiment_model') is None:
+            from sentiment_model import SentimentModel
+            cls._default_sentiment_model = SentimentModel(cls.POSITIVE_EMOJIS, cls.NEGATIVE_EMOJIS)
+        return cls._default_sentiment_model
+
+    def _reset_aggregates(self) -> None:
+        """Reset the running counters that back the processed data."""
+        self._users = set()
+        self._total_messages = 0
+        self._emoji_messages = 0
+        self._tag_counts = Counter()
+        self._word_counts = SpaceSavingSketch(self.WORD_CAPACITY)
+        self.trending_index = TrendingIndex()
+        self._mood_counts = defaultdict(int)
+        self._mood_keywords = defaultdict(partial(SpaceSavingSketch, self.MOOD_KEYWORD_CAPACITY))
+        from timeseries import ChatTimeSeries
+        self.timeseries = ChatTimeSeries(resolution=self.ACTIVITY_RESOLUTION, capacity=self.capacity)
+        self._basic_sentiment = {'positive_count': 0, 'negative_count': 0, 'neutral_count': 0}
+        self._questions = []
+
+    def get_state(self, include_messages: bool = True) -> Dict[str, Any]:
+        """Picklable aggregate state; the shared classifier and model are not included.
+
+        Without include_messages the stored messages are left out; the
+        aggregates do not need them.
+        """
+        return {
+            name: getattr(self, name) for name in self.STATE_FIELDS
+            if include_messages or name != 'messages'
+        }
+
+    def load_state(self, state: Dict[str, Any]) -> None:
+        """Resume from a get_state() result, replacing the current aggregates."""
+        self.messages = MessageStore(capacity=self.capacity)
+        for name in self.STATE_FIELDS:
+            if name in state:
+                setattr(self, name, state[name])
+
+    def merge(self, other: 'MessageProcessor') -> None:
+        """Fold another processor's aggregates into this one and republish.
+
+        Every aggregate merges associatively (counters and the trending
+        buckets add, user sets union, the store and time series append and
+        questions interleave by timestamp), so processors built over slices
+        of one stream, e.g. in worker processes, combine in any grouping to
+        the same result as one processor over the whole stream, apart from
+        duplicates collapsed across slice boundaries and the approximate
+        tail of the word sketches. Slices should be merged in stream order
+        to keep the stored messages in order.
+        """
+        self.messages.merge(other.messages)
+        self._users |= other._users
+        self._total_messages += other._total_messages
+        self._emoji_messages += other._emoji_messages
+        self._tag_counts.update(other._tag_counts)
+        self._word_counts.merge(other._word_counts)
+        self.trending_index.merge(other.trending_index)
+        for mood, count in other._mood_counts.items():
+            self._mood_counts[mood] += count
+        for mood, keywords in other._mood_keywords.items():
+            self._mood_keywords[mood].merge(keywords)
+        self.timeseries.merge(other.timeseries)
+        for key, count in other._basic_sentiment.items():
+            self._basic_sentiment[key] += count
+        self._questions = list(heapq.merge(self._questions, other._questions, key=lambda q: q['timestamp']))
+        self._trim_questions()
+        self._process_current_batch()
 
     def load_messages(self, messages: List[Dict[str, str]]) -> None:
-        """Load messages with timestamps and metadata."""
-        current_time = datetime.now()
-        self.messages = [
-            {
-                **msg,
-                'timestamp': current_time,
-                'id': idx,
-                'has_emoji': bool(self._find_emojis(msg['message'])),
-                'tags': self._generate_tags(msg['message'])
-            }
-            for idx, msg in enumerate(messages)
-        ]
+        """Load messages with timestamps and metadata, replacing any previous state."""
+        self.messages = MessageStore(capacity=self.capacity)
+        self._reset_aggregates()
+        if self.dedup:
+            messages = MessageDeduper().collapse(messages)
+        self.ingest_messages(messages)
+
+    def ingest_messages(self, messages: List[Dict[str, str]]) -> None:
+        """Incrementally fold new messages into the running aggregates.
+
+        Messages keep their own 'timestamp' (datetime, epoch seconds or
+        ISO-8601); messages without one are stamped with the arrival time.
+        Weighted entries from MessageDeduper count as 'weight' messages sent
+        by 'usernames'.
+        """
+        arrival_time = datetime.now().timestamp()
+        self.metrics.inc('messages_in_total', len(messages), component='processor')
+        with self.metrics.timer('stage_seconds', component='processor', stage='fold'):
+            # Text polarity comes from the sentiment model, scored for the whole batch at once
+            polarities = self.sentiment_model.polarities([msg['message'] for msg in messages])
+            for msg, polarity in zip(messages, polarities):
+                timestamp = to_epoch(msg.get('timestamp'), arrival_time)
+                result = self.classifier.classify(msg['message'])._replace(polarity=polarity)
+                self.messages.append(msg['username'], msg['message'], timestamp, result.tags)
+                self._fold_message(msg, timestamp, result)
+        self._trim_questions()
         self._process_current_batch()
 
+    def _fold_message(self, message: Dict[str, str], timestamp: float,
+                      result: Classification) -> None:
+        """Update every running counter with a single classified message (or weighted entry)."""
+        text = message['message']
+        weight = message.get('weight', 1)
+
+        self._total_messages += weight
+        self._users.update(message.get('usernames') or (message['username'],))
+        self._emoji_messages += weight * bool(result.emojis)
+        words = [
+            word for word in text.lower().split()
+            if word not in self.COMMON_WORDS and len(word) > self.MIN_WORD_LENGTH
+        ]
+        keywords = [word for word in text.split() if len(word) > self.MIN_WORD_LENGTH]
+        self._add_counts(self._tag_counts, result.tags, weight)
+        for word in words:
+            self._word_counts.add(word, weight)
+        self.trending_index.add(words, timestamp, weight)
+        self.timeseries.append(timestamp, result.moods, weight)
+
+        for mood in result.moods:
+            self._mood_counts[mood] += weight
+            for keyword in keywords[:self.KEYWORDS_PER_MOOD]:
+                self._mood_keywords[mood].add(keyword, weight)
+
+        self._basic_sentiment[result.polarity + '_count'] += weight
+
+        if '?' in text:
+            self._questions.append({
+                'question': text,
+                'username': message['username'],
+                'timestamp': datetime.fromtimestamp(timestamp),
+                'count': weight
+            })
+
+    def _trim_questions(self) -> None:
+        if self.max_questions is not None and len(self._questions) > self.max_questions:
+            del self._questions[:len(self._questions) - self.max_questions]
+
+    @staticmethod
+    def _add_counts(counter: Counter, items: List[str], weight: int) -> None:
+        # Cheaper than Counter.update for the few items of one message
+        for item in items:
+            counter[item] += weight
+
     def _find_emojis(self, text: str) -> Set[str]:
         """Utility method to find emojis in text."""
-        return set(re.findall(self.EMOJI_PATTERN, text))
+        return self.classifier.find_emojis(text)
 
     def _generate_tags(self, message: str) -> List[str]:
         """Generate tags based on message content."""
-        tags = []
-        message_lower = message.lower()
-        
-        # Tag rules
-        tag_rules = {
-            'chess': lambda m: 'chess' in m,
-            'game': lambda m: 'game' in m,
-            'technical': lambda m: any(word in m for word in ['video', 'stream', 'quality']),
-            'entertainment': lambda m: any(word in m for word in ['bheem', 'kaliya']),
-            'reaction': lambda m: bool(self._find_emojis(m))
-        }
-
-        return [tag for tag, rule in tag_rules.items() if rule(message_lower)]
+        return self.classifier.classify(message).tags
 
     def _process_current_batch(self) -> None:
-        """Process the current batch of messages."""
-        if not self.messages:
+        """Publish the running aggregates as processed data."""
+        if not self._total_messages:
             return
 
-        # Group messages by tags
-        tag_groups = self._group_messages_by_tags()
-        
-        self.processed_data.update({
-            'engagement': self._analyze_engagement(tag_groups),
-            'trending': self._extract_trending_topics(),
-            'sentiment': self._analyze_sentiment(),
-            'questions': self._extract_questions()
-        })
-
-    def _group_messages_by_tags(self) -> Dict[str, List[Dict]]:
-        """Group messages by their tags."""
-        tag_groups = defaultdict(list)
-        for msg in self.messages:
-            for tag in msg['tags']:
-                tag_groups[tag].append(msg)
-        return tag_groups
-
-    def _analyze_engagement(self, tag_groups: Dict[str, List[Dict]]) -> Dict[str, Any]:
+        stages = {
+            'engagement': self._analyze_engagement,
+            'trending': self._extract_trending_topics,
+            'trending_windows': self.get_trending_windows,
+            'trending_now': self.get_trending_now,
+            'sentiment': self._analyze_sentiment,
+            'activity': self.get_activity_series,
+            'questions': self._extract_questions
+        }
+        for key, stage in stages.items():
+            with self.metrics.timer('stage_seconds', component='processor', stage=key):
+                self.processed_data[key] = stage()
+
+    def _analyze_engagement(self) -> Dict[str, Any]:
         """Analyze engagement metrics."""
         return {
-            'total_messages': len(self.messages),
-            'unique_users': len(set(msg['username'] for msg in self.messages)),
-            'emoji_messages': len([msg for msg in self.messages if msg['has_emoji']]),
-            'tag_distribution': {tag: len(msgs) for tag, msgs in tag_groups.items()}
+            'total_messages': self._total_messages,
+            'unique_users': len(self._users),
+            'emoji_messages': self._emoji_messages,
+            'tag_distribution': dict(self._tag_counts)
         }
 
     def _extract_trending_topics(self) -> List[Dict[str, Any]]:
         """Extract trending topics from messages."""
-        word_counts = Counter(
-            word for msg in self.messages
-            for word in msg['message'].lower().split()
-            if word not in self.COMMON_WORDS and len(word) > self.MIN_WORD_LENGTH
+        top_words = heapq.nlargest(
+            self.TRENDING_TOPICS_LIMIT,
+            self._word_counts.items(),
+            key=lambda x: x[1]
         )
-        
-        return sorted(
-            [{'topic': word, 'count': count} for word, count in word_counts.items()],
-            key=lambda x: x['count'],
-            reverse=True
-        )[:self.TRENDING_TOPICS_LIMIT]
+        return [{'topic': word, 'count': count} for word, count in top_words]
+
+    def get_trending_windows(self) -> Dict[str, List[Dict[str, Any]]]:
+        """Get trending topics for each sliding time window (1m, 5m, 15m)."""
+        return self.trending_index.top_windows(self.TRENDING_TOPICS_LIMIT)
+
+    def get_trending_now(self) -> List[Dict[str, Any]]:
+        """Get topics ranked by exponentially decayed recent activity."""
+        return self.trending_index.trending_now(self.TRENDING_TOPICS_LIMIT)
+
+    def get_activity_series(self, resolution: float = None) -> Dict[str, Any]:
+        """Get messages per second, peak periods and moods over time."""
+        resolution = resolution or self.ACTIVITY_RESOLUTION
+        return {
+            'messages_per_second': self.timeseries.messages_per_second(resolution, self.ACTIVITY_BINS),
+            'peak_times': self.timeseries.peak_times(resolution),
+            'mood_series': self.timeseries.mood_series(resolution, self.ACTIVITY_BINS)
+        }
 
     def _analyze_sentiment(self) -> Dict[str, Any]:
         """Analyze message sentiment and moods."""
         mood_data = {
-            'distributions': {},  # Changed from defaultdict to regular dict
-            'mood_keywords': {},  # Changed from defaultdict to regular dict
+            'distributions': dict(self._mood_counts),
+            'mood_keywords': {
+                mood: self._get_top_keywords(keywords)
+                for mood, keywords in self._mood_keywords.items()
+            },
             'overall_mood': '',
             'mood_heatmap': self._generate_mood_heatmap(),
             'basic_sentiment': self._get_basic_sentiment()
         }
 
-        # Temporary defaultdict for counting
-        temp_distributions = defaultdict(int)
-        temp_keywords = defaultdict(list)
-
-        for msg in self.messages:
-            detected_moods = self._detect_message_moods(msg)
-            self._update_mood_data(temp_distributions, temp_keywords, msg, detected_moods)
-
-        # Convert defaultdict to regular dict for JSON serialization
-        mood_data['distributions'] = dict(temp_distributions)
-        mood_data['mood_keywords'] = {
-            mood: self._get_top_keywords(keywords)
-            for mood, keywords in temp_keywords.items()
-        }
-
         # Calculate overall mood
-        if temp_distributions:
+        if self._mood_counts:
             mood_data['overall_mood'] = max(
-                temp_distributions.items(),
+                self._mood_counts.items(),
                 key=lambda x: x[1]
             )[0]
 
         return mood_data
 
     def _generate_mood_heatmap(self) -> Dict[str, Any]:
-        """Generate mood heatmap data."""
-        # Initialize time slots (24 slots of 1 hour each)
-        time_slots = {str(i).zfill(2): {
-            'total': 0,
-            'moods': defaultdict(int)
-        } for i in range(24)}
-
-        for msg in self.messages:
-            hour = msg.get('timestamp').strftime('%H')
-            moods = self._detect_message_moods(msg)
-            
-            time_slots[hour]['total'] += 1
-            for mood in moods:
-                time_slots[hour]['moods'][mood] += 1
-
-        # Convert defaultdict to regular dict for JSON serialization
+        """Generate mood heatmap data by local hour of day."""
         return {
             hour: {
                 'total': data['total'],
-                'moods': dict(data['moods']),
+                'moods': data['moods'],
                 'dominant_mood': max(data['moods'].items(), key=lambda x: x[1])[0] if data['moods'] else 'neutral',
                 'intensity': data['total']  # For heatmap intensity
             }
-            for hour, data in time_slots.items()
+            for hour, data in self.timeseries.hour_of_day_heatmap().items()
         }
 
-    def _update_mood_data(self, distributions: Dict, keywords: Dict, 
-                         message: Dict, detected_moods: List[str]) -> None:
-        """Update mood data with message information."""
-        for mood in detected_moods:
-            # Update distributions
-            distributions[mood] += 1
-
-            # Update keywords
-            words = [word for word in message['message'].split() 
-                    if len(word) > self.MIN_WORD_LENGTH]
-            if words:
-                keywords[mood].extend(words[:self.KEYWORDS_PER_MOOD])
-
-    def _get_top_keywords(self, keywords: List[str]) -> List[str]:
+    def _get_top_keywords(self, keywords: SpaceSavingSketch) -> List[str]:
         """Get top keywords with counts."""
-        word_counter = Counter(keywords)
-        return [word for word, _ in word_counter.most_common(self.TOP_KEYWORDS_LIMIT)]
+        return [word for word, _ in keywords.most_common(self.TOP_KEYWORDS_LIMIT)]
 
     def _get_basic_sentiment(self) -> Dict[str, int]:
         """Calculate basic sentiment counts."""
-        sentiment = {'positive_count': 0, 'negative_count': 0, 'neutral_count': 0}
-        
-        for msg in self.messages:
-            emojis = self._find_emojis(msg['message'])
-            if any(emoji in self.POSITIVE_EMOJIS for emoji in emojis):
-                sentiment['positive_count'] += 1
-            elif any(emoji in self.NEGATIVE_EMOJIS for emoji in emojis):
-                sentiment['negative_count'] += 1
-            else:
-                sentiment['neutral_count'] += 1
-                
-        sentiment['total_messages'] = len(self.messages)
+        sentiment = dict(self._basic_sentiment)
+        sentiment['total_messages'] = self._total_messages
         return sentiment
 
-    def _detect_message_moods(self, message: Dict) -> List[str]:
-        """Detect moods in a single message."""
-        emojis = self._find_emojis(message['message'])
-        detected_moods = []
-
-        # Check emoji-based moods
-        for mood, indicators in self.MOOD_INDICATORS.items():
-            if any(emoji in indicators for emoji in emojis):
-                detected_moods.append(mood)
-
-        # Check keyword-based moods if no emojis detected
-        if not detected_moods:
-            message_lower = message['message'].lower()
-            for mood, keywords in self.MOOD_KEYWORDS.items():
-                if any(word in message_lower for word in keywords):
-                    detected_moods.append(mood)
-
-        return detected_moods or ['neutral']
-
-    def _update_mood_data(self, mood_data: Dict, message: Dict, detected_moods: List[str]) -> None:
-        """Update mood data with message information."""
-        for mood in detected_moods:
-            # Update distributions
-            mood_data['distributions'][mood] += 1
-
-            # Update keywords
-            words = [word for word in message['message'].split() 
-                    if len(word) > self.MIN_WORD_LENGTH]
-            if words:
-                mood_data['mood_keywords'][mood].extend(words[:self.KEYWORDS_PER_MOOD])
-
-            # Update timeline
-            mood_data['mood_timeline'].append({
-                'timestamp': message.get('timestamp', datetime.now()),
-                'mood': mood,
-                'message': message['message']
-            })
-
-    def _finalize_mood_analysis(self, mood_data: Dict) -> None:
-        """Finalize mood analysis by calculating overall mood and cleaning up keywords."""
-        if mood_data['distributions']:
-            mood_data['overall_mood'] = max(
-                mood_data['distributions'].items(),
-                key=lambda x: x[1]
-            )[0]
-
-        # Clean up keyword lists
-        for mood in mood_data['mood_keywords']:
-            word_counter = Counter(mood_data['mood_keywords'][mood])
-            mood_data['mood_keywords'][mood] = [
-                word for word, count in word_counter.most_common(self.TOP_KEYWORDS_LIMIT)
-            ]
-
     def _extract_questions(self) -> List[Dict[str, str]]:
         """Extract questions from messages."""
-        return [
-            {
-                'question': msg['message'],
-                'username': msg['username'],
-                'timestamp': msg['timestamp']
-            }
-            for msg in self.messages if '?' in msg['message']
-        ]
+        return list(self._questions)
 
     def get_processed_data(self) -> Dict[str, Any]:
         """Get the processed data."""
@@ -284,7 +362,7 @@ class MessageProcessor:
 
     def get_messages_by_tag(self, tag: str) -> List[Dict[str, Any]]:
         """Get messages filtered by tag."""
-        return [msg for msg in self.messages if tag in msg['tags']]
+        return self.messages.records_with_tag(tag)
 
 def process_chat_data(messages: List[Dict[str, str]]) -> Dict[str, Any]:
     """Process chat data and return analyzed results."""
@@ -0,0 +1,160 @@
+from typing import List, Dict, Any, Iterator, Tuple
+from array import array
+from datetime import datetime
+import sys
+
+
+class MessageStore:
+    """Columnar chat message store with interned usernames and tag bitmasks.
+
+    Each message costs one slot in a few typed arrays plus its text, instead
+    of a dict per message. With a ``capacity`` the store is a ring buffer that
+    overwrites the oldest messages; without one it grows append-only.
+    """
+
+    DEFAULT_TAGS = ('chess', 'game', 'technical', 'entertainment', 'reaction')
+    EMOJI_TAG = 'reaction'
+    MAX_TAGS = 32
+
+    def __init__(self, capacity: int = None, tags: Tuple[str, ...] = None):
+        self.capacity = capacity
+        self.timestamps = array('d')
+        self.user_ids = array('I')
+        self.tag_masks = array('I')
+        self.texts = []
+        self.usernames = []  # user id -> username
+        self._user_index = {}  # username -> user id
+        self.tag_bits = {}
+        for tag in tags or self.DEFAULT_TAGS:
+            self.register_tag(tag)
+        self.total_appended = 0
+        self._start = 0  # physical index of the oldest message once full
+
+    def register_tag(self, tag: str) -> int:
+        """Assign a bit to a tag name, returning its bit value."""
+        if tag not in self.tag_bits:
+            if len(self.tag_bits) >= self.MAX_TAGS:
+                raise ValueError(f"Cannot register more than {self.MAX_TAGS} tags")
+            self.tag_bits[tag] = 1 << len(self.tag_bits)
+        return self.tag_bits[tag]
+
+    def intern_user(self, username: str) -> int:
+        """Return the numeric id for a username, assigning one if new."""
+        user_id = self._user_index.get(username)
+        if user_id is None:
+            user_id = len(self.usernames)
+            self._user_index[username] = user_id
+            self.usernames.append(username)
+        return user_id
+
+    def tag_mask(self, tags: List[str]) -> int:
+        mask = 0
+        for tag in tags:
+            mask |= self.register_tag(tag)
+        return mask
+
+    def tags_from_mask(self, mask: int) -> List[str]:
+        return [tag for tag, bit in self.tag_bits.items() if mask & bit]
+
+    def append(self, username: str, message: str, timestamp: float, tags: List[str]) -> int:
+        """Store a message and return its stream-wide id."""
+        user_id = self.intern_user(username)
+        mask = self.tag_mask(tags)
+
+        if self.capacity is None or len(self.texts) < self.capacity:
+            self.timestamps.append(timestamp)
+            self.user_ids.append(user_id)
+            self.tag_masks.append(mask)
+            self.texts.append(message)
+        else:
+            pos = self._start
+            self.timestamps[pos] = timestamp
+            self.user_ids[pos] = user_id
+            self.tag_masks[pos] = mask
+            self.texts[pos] = message
+            self._start = (pos + 1) % self.capacity
+
+        self.total_appended += 1
+        return self.total_appended - 1
+
+    def merge(self, other: 'MessageStore') -> None:
+        """Append every message of another store, oldest first.
+
+        Usernames and tag bits are remapped in one pass over the other
+        store's distinct values; the columns are then extended in bulk
+        unless this store is a ring buffer or the other one has wrapped.
+        """
+        user_map = [self.intern_user(username) for username in other.usernames]
+        tag_map = {bit: self.register_tag(tag) for tag, bit in other.tag_bits.items()}
+        same_tags = all(bit == mapped for bit, mapped in tag_map.items())
+
+        def remap_mask(mask: int) -> int:
+            return mask if same_tags else sum(mapped for bit, mapped in tag_map.items() if mask & bit)
+
+        if self.capacity is not None or other._start:
+            for offset in range(len(other.texts)):
+                pos = (other._start + offset) % len(other.texts)
+                self.append(
+                    self.usernames[user_map[other.user_ids[pos]]], other.texts[pos],
+                    other.timestamps[pos], self.tags_from_mask(remap_mask(other.tag_masks[pos]))
+                )
+            return
+
+        self.timestamps.extend(other.timestamps)
+        self.user_ids.extend(map(user_map.__getitem__, other.user_ids))
+        self.tag_masks.extend(other.tag_masks if same_tags else map(remap_mask, other.tag_masks))
+        self.texts.extend(other.texts)
+        self.total_appended += len(other.texts)
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def __getitem__(self, index: int) -> Dict[str, Any]:
+        return self.record(index)
+
+    def _physical(self, index: int) -> int:
+        return (self._start + index) % len(self.texts)
+
+    def record(self, index: int) -> Dict[str, Any]:
+        """Materialize the message at a logical index as a dict."""
+        if index < 0:
+            index += len(self.texts)
+        if not 0 <= index < len(self.texts):
+            raise IndexError('message index out of range')
+        pos = self._physical(index)
+        mask = self.tag_masks[pos]
+        return {
+            'username': self.usernames[self.user_ids[pos]],
+            'message': self.texts[pos],
+            'timestamp': datetime.fromtimestamp(self.timestamps[pos]),
+            'id': self.total_appended - len(self.texts) + index,
+            'has_emoji': bool(mask & self.tag_bits[self.EMOJI_TAG]),
+            'tags': self.tags_from_mask(mask)
+        }
+
+    def iter_compact(self) -> Iterator[Tuple[str, str, float]]:
+        """Yield (username, message, timestamp) tuples, oldest first."""
+        for offset in range(len(self.texts)):
+            pos = (self._start + offset) % len(self.texts)
+            yield self.usernames[self.user_ids[pos]], self.texts[pos], self.timestamps[pos]
+
+    def records_with_tag(self, tag: str) -> List[Dict[str, Any]]:
+        """Materialize only the messages carrying a tag."""
+        bit = self.tag_bits.get(tag)
+        if bit is None:
+            return []
+        return [
+            self.record(index)
+            for index in range(len(self.texts))
+            if self.tag_masks[self._physical(index)] & bit
+        ]
+
+    def memory_usage(self) -> Dict[str, int]:
+        """Approximate bytes held by each column."""
+        return {
+            'timestamps': self.timestamps.buffer_info()[1] * self.timestamps.itemsize,
+            'user_ids': self.user_ids.buffer_info()[1] * self.user_ids.itemsize,
+            'tag_masks': self.tag_masks.buffer_info()[1] * self.tag_masks.itemsize,
+            'texts': sys.getsizeof(self.texts) + sum(sys.getsizeof(t) for t in self.texts),
+            'usernames': sys.getsizeof(self.usernames) + sum(sys.getsizeof(u) for u in self.usernames)
+        }
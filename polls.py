@@ -0,0 +1,183 @@
+from typing import List, Dict, Any, Optional
+from collections import Counter, defaultdict
+from datetime import datetime
+import re
+import time
+
+from timestamps import to_epoch
+
+
+class PollEngine:
+    """Live polls with unique ids and incrementally tallied votes.
+
+    Polls are indexed by an id that is never reused, and each keeps a count
+    per option next to its voter map, so casting a vote is a couple of dict
+    operations and reading the results never recounts. Votes arrive through
+    ``vote`` (the API) or in bulk from chat with ``ingest_votes``:
+    "!vote 2" votes for option 2 of the latest poll, "!vote 5 2" for option
+    2 of poll 5. A user's first vote on a poll is the one that counts.
+
+    ``snapshot`` returns the published view of the active polls (no voter
+    maps) and is rebuilt only after something changed.
+    """
+
+    POLL_TTL = 5 * 60  # seconds a poll stays open
+    MAX_ACTIVE_POLLS = 2
+    MIN_RELEVANCE = 70
+    VOTE_PATTERN = re.compile(r'^\s*!vote\s+(?:#?(\d+)\s+)?(\d+)\s*$', re.IGNORECASE)
+
+    def __init__(self, ttl: float = None, max_active: int = None):
+        self.ttl = ttl or self.POLL_TTL
+        self.max_active = max_active or self.MAX_ACTIVE_POLLS
+        self.polls = {}  # poll id -> poll, in creation order
+        self._voters = {}  # poll id -> {user: option}
+        self._next_id = 1
+        self._version = 0
+        self._published = (-1, [])  # (version, snapshot)
+        self.votes_rejected = 0
+
+    def __len__(self) -> int:
+        return len(self.polls)
+
+    def consider(self, suggestion: Dict[str, Any], now: float = None) -> Optional[Dict[str, Any]]:
+        """Open a poll for an LLM suggestion if it is relevant and there is room.
+
+        Returns the new poll, or None.
+        """
+        now = time.time() if now is None else now
+        self.expire(now)
+        if not suggestion or not suggestion.get('options'):
+            return None
+        if suggestion.get('relevance_score', 0) > self.MIN_RELEVANCE and len(self.polls) < self.max_active:
+            return self.create(suggestion, now)
+        return None
+
+    def create(self, suggestion: Dict[str, Any], now: float = None) -> Dict[str, Any]:
+        """Open a poll with the next id."""
+        options = [str(option) for option in suggestion['options']]
+        poll = {
+            **suggestion,
+            'id': self._next_id,
+            'options': options,
+            'counts': dict.fromkeys(options, 0),
+            'total_votes': 0,
+            'created_at': time.time() if now is None else now
+        }
+        self.add(poll)
+        return poll
+
+    def add(self, poll: Dict[str, Any]) -> None:
+        """Insert a poll as created elsewhere (e.g. replayed from the event log)."""
+        self.polls[poll['id']] = poll
+        self._voters[poll['id']] = {}
+        self._next_id = max(self._next_id, poll['id'] + 1)
+        self._version += 1
+
+    def expire(self, now: float = None) -> int:
+        """Close polls older than the TTL; returns how many were closed."""
+        cutoff = (time.time() if now is None else now) - self.ttl
+        expired = [poll_id for poll_id, poll in self.polls.items() if poll['created_at'] <= cutoff]
+        for poll_id in expired:
+            del self.polls[poll_id]
+            del self._voters[poll_id]
+        if expired:
+            self._version += 1
+        return len(expired)
+
+    def _resolve_option(self, poll: Dict[str, Any], option: Any) -> Optional[str]:
+        """Option text for an option given as its text or 1-based number."""
+        if option in poll['counts']:
+            return option
+        try:
+            index = int(option)
+        except (TypeError, ValueError):
+            return None
+        if 1 <= index <= len(poll['options']):
+            return poll['options'][index - 1]
+        return None
+
+    def vote(self, poll_id: int, option: Any, user: str, now: float = None) -> Dict[str, Any]:
+        """Cast a single vote; option is the option text or its 1-based number."""
+        poll = self.polls.get(poll_id)
+        now = time.time() if now is None else now
+        if poll is None or poll['created_at'] <= now - self.ttl:
+            return {'success': False, 'error': 'Poll not found'}
+        choice = self._resolve_option(poll, option)
+        if choice is None:
+            return {'success': False, 'error': 'Unknown option'}
+        voters = self._voters[poll_id]
+        if user in voters:
+            return {'success': False, 'error': 'User already voted'}
+
+        voters[user] = choice
+        poll['counts'][choice] += 1
+        poll['total_votes'] += 1
+        self._version += 1
+        return {'success': True, 'poll': self._publish(poll)}
+
+    def ingest_votes(self, messages: List[Dict[str, Any]]) -> int:
+        """Apply every "!vote" command in a batch of messages; returns the votes accepted.
+
+        Weighted entries from MessageDeduper vote once per sender.
+        """
+        if not self.polls:
+            return 0
+        latest_id = next(reversed(self.polls))
+        tallies = defaultdict(Counter)
+        for msg in messages:
+            text = msg['message']
+            if '!' not in text:
+                continue
+            match = self.VOTE_PATTERN.match(text)
+            if match is None:
+                continue
+            poll_id = int(match.group(1)) if match.group(1) else latest_id
+            poll = self.polls.get(poll_id)
+            timestamp = to_epoch(msg.get('timestamp'))
+            choice = None if poll is None else self._resolve_option(poll, match.group(2))
+            if choice is None or poll['created_at'] <= timestamp - self.ttl:
+                self.votes_rejected += 1
+                continue
+            voters = self._voters[poll_id]
+            for user in msg.get('usernames') or (msg['username'],):
+                if user in voters:
+                    self.votes_rejected += 1
+                    continue
+                voters[user] = choice
+                tallies[poll_id][choice] += 1
+
+        # Fold the batch into the live counts once per poll
+        accepted = 0
+        for poll_id, tally in tallies.items():
+            poll = self.polls[poll_id]
+            for choice, count in tally.items():
+                poll['counts'][choice] += count
+                poll['total_votes'] += count
+                accepted += count
+        if accepted:
+            self._version += 1
+        return accepted
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """Published view of the active polls, oldest first; cached until the next change."""
+        version, polls = self._published
+        if version != self._version:
+            polls = [self._publish(poll) for poll in self.polls.values()]
+            self._published = (self._version, polls)
+        return polls
+
+    @staticmethod
+    def _publish(poll: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            **poll,
+            'counts': dict(poll['counts']),
+            'created_at': datetime.fromtimestamp(poll['created_at'])
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'active_polls': len(self.polls),
+            'next_id': self._next_id,
+            'total_votes': sum(poll['total_votes'] for poll in self.polls.values()),
+            'votes_rejected': self.votes_rejected
+        }
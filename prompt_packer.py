@@ -0,0 +1,93 @@
+from typing import List, Dict, Any, NamedTuple
+from collections import Counter
+import re
+
+
+class PackedPrompt(NamedTuple):
+    text: str
+    tokens: int
+    messages_in: int
+    lines_out: int
+    omitted: int
+
+
+class PromptPacker:
+    """Compact, deduplicated and token-budgeted serialization of chat messages.
+
+    Messages become ``username: message`` lines instead of a dict repr.
+    Repeated lines are merged with an ``(xN)`` count, emoji-only messages are
+    rolled up into a single reactions line, and when the batch is still over
+    budget the most repeated lines are kept (in chat order) and the rest are
+    reported as omitted.
+    """
+
+    DEFAULT_TOKEN_BUDGET = 2000
+    BYTES_PER_TOKEN = 4
+    HEADER = "Chat messages, one per line as 'username: message'; (xN) marks a line repeated N times."
+    OMITTED_NOTE = "({} more messages omitted)"
+    EMOJI_ONLY_PATTERN = re.compile(r'^[\W_]+$')
+    WHITESPACE_PATTERN = re.compile(r'\s+')
+
+    def __init__(self, token_budget: int = None):
+        self.token_budget = token_budget or self.DEFAULT_TOKEN_BUDGET
+
+    def estimate_tokens(self, text: str) -> int:
+        """Rough token estimate without a tokenizer (UTF-8 bytes / 4)."""
+        return len(text.encode('utf-8')) // self.BYTES_PER_TOKEN + 1
+
+    def pack(self, messages: List[Dict[str, Any]]) -> PackedPrompt:
+        """Serialize a batch of messages to fit within the token budget."""
+        lines = {}  # normalized text -> [first index, count, rendered line]
+        reactions = Counter()
+        for idx, msg in enumerate(messages):
+            text = self.WHITESPACE_PATTERN.sub(' ', msg.get('message', '')).strip()
+            if not text:
+                continue
+            # Weighted entries from MessageDeduper stand for several messages
+            weight = msg.get('weight', 1)
+            if self.EMOJI_ONLY_PATTERN.match(text):
+                for ch in text:
+                    if ord(ch) > 0x2000:
+                        reactions[ch] += weight
+                continue
+
+            key = text.lower()
+            if key in lines:
+                lines[key][1] += weight
+            else:
+                lines[key] = [idx, weight, f"{msg.get('username', '')}: {text}"]
+
+        entries = [
+            (idx, line if count == 1 else f"{line} (x{count})", count)
+            for idx, count, line in lines.values()
+        ]
+        header_tokens = self.estimate_tokens(self.HEADER)
+        reaction_line = ''
+        if reactions:
+            reaction_line = 'Emoji reactions: ' + ' '.join(
+                f"{emoji}x{count}" for emoji, count in reactions.most_common(10)
+            )
+            header_tokens += self.estimate_tokens(reaction_line)
+
+        # Keep the most repeated lines first when over budget, leaving room for the omitted note
+        budget = self.token_budget - header_tokens - self.estimate_tokens(self.OMITTED_NOTE.format(10 ** 6))
+        kept = []
+        used = 0
+        for entry in sorted(entries, key=lambda e: (-e[2], e[0])):
+            cost = self.estimate_tokens(entry[1])
+            if used + cost > budget:
+                continue
+            kept.append(entry)
+            used += cost
+        kept.sort()
+
+        omitted = sum(e[2] for e in entries) - sum(e[2] for e in kept)
+        body = [self.HEADER]
+        if reaction_line:
+            body.append(reaction_line)
+        body.extend(line for _, line, _ in kept)
+        if omitted:
+            body.append(self.OMITTED_NOTE.format(omitted))
+
+        text = '\n'.join(body)
+        return PackedPrompt(text, self.estimate_tokens(text), len(messages), len(kept), omitted)
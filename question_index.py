@@ -0,0 +1,79 @@
+from typing import FrozenSet, Optional, Set
+from collections import defaultdict
+import math
+import re
+
+
+class QuestionIndex:
+    """Inverted token index for finding near-duplicate question clusters.
+
+    A question joins the first (oldest) cluster whose representative has a
+    Jaccard similarity above the threshold. Candidates are found with prefix
+    filtering: every set is indexed only by the first few tokens of its sorted
+    token list, which is enough to guarantee that any pair above the threshold
+    shares at least one indexed token.
+    """
+
+    SIMILARITY_THRESHOLD = 0.5
+    PUNCTUATION_PATTERN = re.compile(r'[^\w\s]')
+
+    def __init__(self, threshold: float = None):
+        self.threshold = self.SIMILARITY_THRESHOLD if threshold is None else threshold
+        self.postings = defaultdict(set)  # token -> cluster ids
+        self.token_sets = {}  # cluster id -> cached token set
+
+    @classmethod
+    def tokenize(cls, text: str) -> FrozenSet[str]:
+        """Clean and tokenize a question the same way for every comparison."""
+        return frozenset(cls.PUNCTUATION_PATTERN.sub('', text.lower()).split())
+
+    def similarity(self, tokens1: Set[str], tokens2: Set[str]) -> float:
+        """Jaccard similarity between two token sets."""
+        union = len(tokens1 | tokens2)
+        return len(tokens1 & tokens2) / union if union > 0 else 0.0
+
+    def find(self, tokens: FrozenSet[str]) -> Optional[int]:
+        """Return the oldest cluster similar to the given tokens, if any."""
+        if not tokens:
+            return None
+
+        size = len(tokens)
+        candidates = set()
+        for token in self._prefix(tokens):
+            candidates.update(self.postings.get(token, ()))
+
+        for cluster_id in sorted(candidates):
+            other = self.token_sets[cluster_id]
+            # Length filter: J > t requires t * |A| < |B| < |A| / t
+            if not self.threshold * size < len(other) < size / self.threshold:
+                continue
+            if self.similarity(tokens, other) > self.threshold:
+                return cluster_id
+        return None
+
+    def add(self, cluster_id: int, tokens: FrozenSet[str]) -> None:
+        """Index a new cluster by its representative question's tokens."""
+        self.token_sets[cluster_id] = tokens
+        for token in self._prefix(tokens):
+            self.postings[token].add(cluster_id)
+
+    def remove(self, cluster_id: int) -> None:
+        """Drop a cluster from the index."""
+        tokens = self.token_sets.pop(cluster_id, None)
+        if tokens is None:
+            return
+        for token in self._prefix(tokens):
+            posting = self.postings.get(token)
+            if posting is not None:
+                posting.discard(cluster_id)
+                if not posting:
+                    del self.postings[token]
+
+    def __len__(self) -> int:
+        return len(self.token_sets)
+
+    def _prefix(self, tokens: FrozenSet[str]):
+        """Return the prefix tokens that must overlap for a possible match."""
+        ordered = sorted(tokens)
+        prefix_length = len(ordered) - math.ceil(self.threshold * len(ordered)) + 1
+        return ordered[:prefix_length]
@@ -0,0 +1,162 @@
+from typing import List, Dict, Any, Iterable, Sequence
+import re
+import zlib
+
+import numpy as np
+
+
+class SentimentModel:
+    """CPU-only per-message sentiment: a linear model over hashed n-grams.
+
+    Word unigrams, word bigrams and single symbols (emojis) are hashed into
+    a fixed-size weight vector. The weights start from a small English and
+    Hinglish lexicon plus the emoji polarity sets, with every "negator word"
+    bigram set to flip the word it negates, and can be refined with
+    ``partial_fit`` on labelled messages (e.g. LLM-checked samples).
+    Scoring a batch is one gather and one ``np.bincount`` over all of its
+    features, so the per-message cost is tokenizing and hashing.
+    """
+
+    N_FEATURES = 2 ** 18
+    FEATURE_CACHE_SIZE = 50000
+    HASH_CACHE_SIZE = 200000
+    POLARITY_THRESHOLD = 0.5
+    EMOJI_WEIGHT = 1.0
+    LABEL_VALUES = {'positive': 1.0, 'neutral': 0.0, 'negative': -1.0}
+
+    POSITIVE_WORDS = {
+        'good': 1.0, 'great': 1.5, 'awesome': 2.0, 'amazing': 2.0, 'love': 1.5,
+        'nice': 1.0, 'best': 1.5, 'wow': 1.0, 'lol': 0.5, 'haha': 0.5, 'gg': 1.0,
+        'op': 1.5, 'legend': 1.5, 'king': 1.0, 'thanks': 1.0, 'thank': 1.0,
+        'congrats': 1.5, 'pog': 1.5, 'hype': 1.0, 'brilliant': 2.0, 'genius': 1.5,
+        'mast': 1.5, 'badhiya': 1.5, 'badiya': 1.5, 'accha': 1.0, 'achha': 1.0,
+        'acha': 1.0, 'shandar': 1.5, 'zabardast': 2.0, 'jabardast': 2.0,
+        'kamaal': 1.5, 'kamal': 1.5, 'maza': 1.5, 'mazaa': 1.5, 'shukriya': 1.0,
+        'dhanyawad': 1.0, 'sahi': 1.0, 'bawaal': 1.5, 'jhakaas': 1.5
+    }
+    NEGATIVE_WORDS = {
+        'bad': -1.0, 'worst': -2.0, 'hate': -2.0, 'boring': -1.5, 'lag': -1.0,
+        'laggy': -1.5, 'buffering': -1.5, 'trash': -2.0, 'noob': -1.0, 'sad': -1.0,
+        'cringe': -1.5, 'scam': -2.0, 'fake': -1.5, 'ugh': -1.0, 'wtf': -1.0,
+        'problem': -0.5, 'issue': -0.5, 'stop': -0.5, 'annoying': -1.5,
+        'bakwas': -2.0, 'bekar': -1.5, 'bekaar': -1.5, 'ganda': -1.5,
+        'faltu': -1.5, 'ghatiya': -2.0, 'bura': -1.0, 'pakau': -1.5,
+        'bore': -1.5, 'dukh': -1.0
+    }
+    NEGATORS = ('not', 'no', 'never', 'dont', "don't", 'nahi', 'nahin', 'na', 'mat')
+
+    TOKEN_PATTERN = re.compile(r"[\w']+|[^\w\s]")
+
+    def __init__(self, positive_emojis: Iterable[str] = (), negative_emojis: Iterable[str] = (),
+                 weights_path: str = None, n_features: int = None):
+        self.n_features = n_features or self.N_FEATURES
+        self._hash_cache = {}
+        self._feature_cache = {}
+        if weights_path:
+            self.load(weights_path)
+        else:
+            self.weights = np.zeros(self.n_features, dtype=np.float64)
+            self.bias = 0.0
+            self._seed_lexicon(positive_emojis, negative_emojis)
+
+    def _seed_lexicon(self, positive_emojis: Iterable[str], negative_emojis: Iterable[str]) -> None:
+        lexicon = {**self.POSITIVE_WORDS, **self.NEGATIVE_WORDS}
+        lexicon.update({emoji: self.EMOJI_WEIGHT for emoji in positive_emojis})
+        lexicon.update({emoji: -self.EMOJI_WEIGHT for emoji in negative_emojis})
+        for token, weight in lexicon.items():
+            self.weights[self._hash(token)] = weight
+        # "not good": the bigram cancels the word and adds its opposite
+        for negator in self.NEGATORS:
+            for word, weight in {**self.POSITIVE_WORDS, **self.NEGATIVE_WORDS}.items():
+                self.weights[self._hash(f"{negator} {word}")] = -2 * weight
+
+    def _hash(self, feature: str) -> int:
+        index = self._hash_cache.get(feature)
+        if index is None:
+            index = zlib.crc32(feature.encode('utf-8')) % self.n_features
+            if len(self._hash_cache) < self.HASH_CACHE_SIZE:
+                self._hash_cache[feature] = index
+        return index
+
+    def tokenize(self, text: str) -> List[str]:
+        return self.TOKEN_PATTERN.findall(text.lower())
+
+    def featurize(self, texts: Sequence[str]):
+        """Row index and hashed feature index of every feature in the batch."""
+        cols = []
+        lengths = []
+        cache = self._feature_cache
+        for text in texts:
+            # Chat repeats itself a lot (spam, emoji floods, copypasta)
+            features = cache.get(text)
+            if features is None:
+                features = self._features(text)
+                if len(cache) >= self.FEATURE_CACHE_SIZE:
+                    cache.clear()
+                cache[text] = features
+            cols.extend(features)
+            lengths.append(len(features))
+        rows = np.repeat(np.arange(len(texts)), lengths)
+        return rows, np.array(cols, dtype=np.int64)
+
+    def _features(self, text: str) -> List[int]:
+        hash_feature = self._hash
+        tokens = self.tokenize(text)
+        features = [hash_feature(token) for token in tokens]
+        features.extend(hash_feature(f"{a} {b}") for a, b in zip(tokens, tokens[1:]))
+        return features
+
+    def score_batch(self, texts: Sequence[str]) -> np.ndarray:
+        """Raw polarity score of every message; > 0 is positive."""
+        rows, cols = self.featurize(texts)
+        return np.bincount(rows, weights=self.weights[cols], minlength=len(texts)) + self.bias
+
+    def polarities(self, texts: Sequence[str]) -> List[str]:
+        """'positive', 'negative' or 'neutral' for every message."""
+        return self._label(self.score_batch(texts))
+
+    def _label(self, scores: np.ndarray) -> List[str]:
+        labels = np.full(len(scores), 'neutral', dtype=object)
+        labels[scores > self.POLARITY_THRESHOLD] = 'positive'
+        labels[scores < -self.POLARITY_THRESHOLD] = 'negative'
+        return labels.tolist()
+
+    def summarize(self, texts: Sequence[str], weights: Sequence[int] = None) -> Dict[str, Any]:
+        """Batch sentiment in the shape of the LLM sentiment result (without topics).
+
+        weights gives how many messages each text stands for (default one each).
+        """
+        if not texts:
+            return {'score': 50.0, 'positive': 0.0, 'negative': 0.0}
+        scores = self.score_batch(texts)
+        return {
+            # Mean squashed score mapped onto 0-100, 50 being neutral
+            'score': round(float(np.average(np.tanh(scores), weights=weights) * 50 + 50), 1),
+            'positive': round(float(np.average(scores > self.POLARITY_THRESHOLD, weights=weights) * 100), 1),
+            'negative': round(float(np.average(scores < -self.POLARITY_THRESHOLD, weights=weights) * 100), 1)
+        }
+
+    def partial_fit(self, texts: Sequence[str], labels: Sequence[str],
+                    learning_rate: float = 0.1) -> float:
+        """One gradient step towards the given labels; returns prior agreement."""
+        targets = np.array([self.LABEL_VALUES[label] for label in labels])
+        rows, cols = self.featurize(texts)
+        scores = np.bincount(rows, weights=self.weights[cols], minlength=len(texts)) + self.bias
+        agreement = float(np.mean(np.array(self._label(scores)) == np.array(labels)))
+
+        # Squared error on tanh(score): each message's error spread over its features
+        errors = (targets - np.tanh(scores)) * (1 - np.tanh(scores) ** 2)
+        np.add.at(self.weights, cols, learning_rate * errors[rows])
+        self.bias += learning_rate * float(errors.mean())
+        return agreement
+
+    def save(self, path: str) -> None:
+        np.savez_compressed(path, weights=self.weights, bias=self.bias)
+
+    def load(self, path: str) -> None:
+        data = np.load(path)
+        self.weights = data['weights'].astype(np.float64)
+        self.bias = float(data['bias'])
+        self.n_features = len(self.weights)
+        self._hash_cache = {}
+        self._feature_cache = {}
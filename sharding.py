@@ -0,0 +1,193 @@
+from typing import List, Dict, Any, Callable
+from collections import defaultdict, deque
+import asyncio
+import multiprocessing
+import queue
+import time
+import zlib
+
+
+class _QueuePublisher:
+    """Controller publisher that forwards insights to the supervisor."""
+
+    def __init__(self, outbox, shard_id: int, channel_id: str):
+        self.outbox = outbox
+        self.shard_id = shard_id
+        self.channel_id = channel_id
+
+    def publish(self, insights: Dict[str, Any]) -> None:
+        self.outbox.put(('insights', self.shard_id, self.channel_id, insights))
+
+
+def _run_worker(shard_id: int, inbox, outbox, controller_factory: Callable) -> None:
+    """Worker process entry point: one StreamController per channel on this shard."""
+    asyncio.run(_worker_loop(shard_id, inbox, outbox, controller_factory))
+
+
+async def _worker_loop(shard_id: int, inbox, outbox, controller_factory: Callable) -> None:
+    loop = asyncio.get_running_loop()
+    controllers = {}
+    while True:
+        command = await loop.run_in_executor(None, inbox.get)
+        if command is None:
+            break
+
+        channel_id, batch_id, messages = command
+        controller = controllers.get(channel_id)
+        if controller is None:
+            controller = controller_factory(channel_id=channel_id)
+            controller.publisher = _QueuePublisher(outbox, shard_id, channel_id)
+            controllers[channel_id] = controller
+        if controller.last_batch_id is not None and batch_id <= controller.last_batch_id:
+            continue  # resent after a crash, but already recovered from the channel's event log
+        try:
+            await controller.process_messages(messages, batch_id)
+        except Exception as e:
+            outbox.put(('error', shard_id, channel_id, str(e)))
+
+    for controller in controllers.values():
+        await controller.wait_for_llm_tasks()
+
+
+class ShardSupervisor:
+    """Run many StreamControllers sharded across worker processes by channel id.
+
+    Channels map to shards with a stable hash, so a channel always lands on
+    the same worker. Each worker has its own inbox and outbox queue, so a
+    worker killed mid-write can only damage its own queues. If a worker dies,
+    only its channels are affected: the worker is restarted and the
+    supervisor resends the recent batches it keeps per channel, while every
+    other shard keeps running untouched. Batches carry increasing ids: a
+    channel whose controller has an event log (e.g. create_stream_controller
+    with event_log_dir) recovers from it and skips the batches it already
+    logged, so only the batches lost with the worker are processed again. A
+    channel without one is rebuilt from the resent batches alone.
+    """
+
+    REPLAY_MESSAGES_PER_CHANNEL = 1000
+
+    def __init__(self, controller_factory: Callable, num_workers: int = None,
+                 replay_size: int = None):
+        """controller_factory is called with channel_id=... and must be
+        picklable, e.g. a functools.partial of create_stream_controller.
+
+        replay_size is the number of recent messages kept per channel for
+        resending after a crash.
+        """
+        self.controller_factory = controller_factory
+        self.num_workers = num_workers or multiprocessing.cpu_count()
+        self.replay_size = replay_size or self.REPLAY_MESSAGES_PER_CHANNEL
+        self._context = multiprocessing.get_context('spawn')
+        self.workers = [None] * self.num_workers
+        self.inboxes = [None] * self.num_workers
+        self.outboxes = [None] * self.num_workers
+        self._stopping = False
+        self.latest_insights = {}
+        self.errors = []
+        self.restarts = 0
+        self._recent = defaultdict(deque)  # channel -> (batch id, messages), oldest first
+        self._recent_sizes = defaultdict(int)
+        self._last_batch_ids = {}
+        self._shard_channels = defaultdict(set)
+
+    def start(self) -> None:
+        for shard_id in range(self.num_workers):
+            self._start_worker(shard_id)
+
+    def _start_worker(self, shard_id: int) -> None:
+        inbox = self._context.Queue()
+        outbox = self._context.Queue()
+        worker = self._context.Process(
+            target=_run_worker,
+            args=(shard_id, inbox, outbox, self.controller_factory),
+            name=f"stream-shard-{shard_id}",
+            daemon=True
+        )
+        worker.start()
+        self.inboxes[shard_id] = inbox
+        self.outboxes[shard_id] = outbox
+        self.workers[shard_id] = worker
+
+    def shard_for(self, channel_id: str) -> int:
+        """Stable shard assignment for a channel."""
+        return zlib.crc32(channel_id.encode('utf-8')) % self.num_workers
+
+    def route(self, channel_id: str, messages: List[Dict[str, Any]]) -> None:
+        """Send a batch of a channel's messages to its shard."""
+        shard_id = self.shard_for(channel_id)
+        # Ids only need to increase per channel, including across supervisor runs
+        batch_id = max(time.time_ns(), self._last_batch_ids.get(channel_id, 0) + 1)
+        self._last_batch_ids[channel_id] = batch_id
+        self._remember(channel_id, batch_id, messages)
+        self._shard_channels[shard_id].add(channel_id)
+        self.inboxes[shard_id].put((channel_id, batch_id, messages))
+
+    def _remember(self, channel_id: str, batch_id: int, messages: List[Dict[str, Any]]) -> None:
+        """Keep the batches holding a channel's last replay_size messages."""
+        recent = self._recent[channel_id]
+        recent.append((batch_id, messages))
+        self._recent_sizes[channel_id] += len(messages)
+        while self._recent_sizes[channel_id] - len(recent[0][1]) >= self.replay_size:
+            self._recent_sizes[channel_id] -= len(recent.popleft()[1])
+
+    def collect(self, timeout: float = 0.0) -> Dict[str, Dict[str, Any]]:
+        """Drain insights sent back by the workers and restart any dead ones."""
+        self.check_workers()
+        deadline = time.monotonic() + timeout
+        while True:
+            received = 0
+            for outbox in self.outboxes:
+                received += self._drain(outbox)
+            if received or time.monotonic() >= deadline:
+                return self.latest_insights
+            time.sleep(0.01)
+
+    def _drain(self, outbox) -> int:
+        received = 0
+        while True:
+            try:
+                kind, shard_id, channel_id, payload = outbox.get_nowait()
+            except queue.Empty:
+                return received
+            received += 1
+            if kind == 'insights':
+                self.latest_insights[channel_id] = payload
+            else:
+                self.errors.append((shard_id, channel_id, payload))
+
+    def check_workers(self) -> List[int]:
+        """Restart crashed workers and resend their channels' recent batches."""
+        restarted = []
+        for shard_id, worker in enumerate(self.workers):
+            if self._stopping or worker is None or worker.is_alive():
+                continue
+            print(f"Shard {shard_id} exited with code {worker.exitcode}, restarting")
+            # Nobody reads the old inbox any more; don't block exit flushing it
+            self.inboxes[shard_id].cancel_join_thread()
+            self._start_worker(shard_id)
+            for channel_id in self._shard_channels[shard_id]:
+                for batch_id, messages in self._recent[channel_id]:
+                    self.inboxes[shard_id].put((channel_id, batch_id, messages))
+            self.restarts += 1
+            restarted.append(shard_id)
+        return restarted
+
+    def shutdown(self, timeout: float = 10.0) -> None:
+        """Stop every worker after it finishes its queued work."""
+        self._stopping = True
+        for inbox in self.inboxes:
+            if inbox is not None:
+                inbox.put(None)
+        # Keep draining while joining: a worker cannot exit with unflushed queue data
+        deadline = time.monotonic() + timeout
+        workers = [w for w in self.workers if w is not None]
+        while any(w.is_alive() for w in workers) and time.monotonic() < deadline:
+            for outbox in self.outboxes:
+                self._drain(outbox)
+            for worker in workers:
+                worker.join(0.05)
+        for worker in workers:
+            if worker.is_alive():
+                worker.terminate()
+        for outbox in self.outboxes:
+            self._drain(outbox)
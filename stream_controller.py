@@ -1,136 +1,411 @@
 import asyncio
 from typing import Dict, List, Any
-from datetime import datetime, timedelta
+from collections import defaultdict, deque
+from itertools import islice
+import copy
 import json
+import os
+import re
+import time
+
+from dedup import MessageDeduper
+from event_log import EventLog
+from highlights import HighlightStore
+from ingest import MessageBuffer
+from instrumentation import Metrics, default_metrics
+from message_processor import MessageProcessor
+from polls import PollEngine
+from timestamps import to_epoch
 
 class StreamController:
-    def __init__(self, analyzer):
+    # Seconds between runs of each LLM task; local stats update on every batch
+    DEFAULT_TASK_INTERVALS = {
+        'sentiment': 15,
+        'qa': 30,
+        'highlights': 30,
+        'polls': 60
+    }
+    MAX_LLM_BACKLOG = 2000  # most recent (collapsed) entries kept for the next LLM runs
+    LOCAL_CAPACITY = 10000  # newest messages the local tier keeps, like the analyzer history
+    LOCAL_QUESTIONS = 50  # newest questions the local tier keeps and publishes
+    SNAPSHOT_INTERVAL = 300  # seconds between state snapshots when logging events
+
+    def __init__(self, analyzer, max_batch_size: int = 200, max_batch_delay: float = 2.0,
+                 max_pending: int = 5000, overflow_policy: str = 'drop_oldest',
+                 task_intervals: Dict[str, float] = None, publisher=None,
+                 metrics: Metrics = None, dedup: bool = True,
+                 event_log: EventLog = None, snapshot_interval: float = None,
+                 highlight_archive_path: str = None):
+        """Create a controller for one stream.
+
+        With an event_log, every ingested batch, poll and vote is appended to
+        it before being applied and the aggregate state is checkpointed every
+        snapshot_interval seconds, so recover() can resume after a restart.
+        Highlights that leave the live list are archived to
+        highlight_archive_path (JSONL) for VOD chapters.
+        """
         self.analyzer = analyzer
-        self.active_polls = []
-        self.current_highlights = []
-        self.update_interval = 30  # seconds
-        self.last_update = datetime.now()
+        self.metrics = metrics or default_metrics
+        self.publisher = publisher  # e.g. an InsightServer; gets every insights refresh
+        self.polls = PollEngine()
+        self.highlights = HighlightStore(archive_path=highlight_archive_path)
         self.cached_insights = {}
 
-    async def process_messages(self, messages: List[Dict[str, str]]) -> Dict[str, Any]:
-        """Process new messages and update all insights."""
-        current_time = datetime.now()
-        
-        # Only update if enough time has passed or cache is empty
-        if (current_time - self.last_update).seconds >= self.update_interval or not self.cached_insights:
-            analysis = self.analyzer.process_new_messages(messages)
-            
-            # Update polls if needed
-            self._update_polls(analysis['polls'])
-            
-            # Update highlights
-            self._update_highlights(analysis['highlights'])
-            
-            # Get engagement metrics
-            metrics = self.analyzer.get_engagement_metrics()
-            
-            # Combine all insights
-            self.cached_insights = {
-                "polls": self.active_polls,
-                "qa": analysis['qa'],
-                "sentiment": analysis['sentiment'],
-                "highlights": self.current_highlights,
-                "metrics": metrics
+        # Duplicate and flood messages are collapsed into weighted entries up front
+        self.deduper = MessageDeduper() if dedup else None
+
+        # Local tier: cheap stats refreshed on every batch
+        self.local_processor = MessageProcessor(
+            metrics=self.metrics, capacity=self.LOCAL_CAPACITY, max_questions=self.LOCAL_QUESTIONS
+        )
+        self.local_metrics = {}
+
+        # LLM tier: each task reads the messages that arrived since its last run
+        self.task_intervals = {**self.DEFAULT_TASK_INTERVALS, **(task_intervals or {})}
+        self.task_results = {'qa': [], 'sentiment': None}
+        self._llm_backlog = deque(maxlen=self.MAX_LLM_BACKLOG)
+        self._next_seq = 0  # sequence number of the next message appended to the backlog
+        self._task_seq = {task: 0 for task in self.task_intervals}
+        self._task_last_run = {task: None for task in self.task_intervals}
+        self._tasks_in_flight = set()
+        self._llm_runs = set()
+
+        self.latency = {}
+
+        # Durability: write-ahead event log plus periodic snapshots
+        self.event_log = event_log
+        self.snapshot_interval = snapshot_interval or self.SNAPSHOT_INTERVAL
+        self._last_snapshot = time.monotonic()
+        self.last_batch_id = None  # id of the last batch processed, if the sender numbers them
+
+        # Micro-batching ingest
+        self.max_batch_size = max_batch_size
+        self.max_batch_delay = max_batch_delay  # seconds
+        self.buffer = MessageBuffer(max_pending=max_pending, policy=overflow_policy)
+        self._message_queue = None
+        self.last_batch_size = 0
+        self.batches_processed = 0
+
+    async def process_messages(self, messages: List[Dict[str, str]], batch_id: int = None) -> Dict[str, Any]:
+        """Process new messages: refresh local stats now and schedule any due LLM tasks.
+
+        A sender that numbers its batches with increasing ids can compare
+        them with last_batch_id after recover() to skip the logged ones.
+        """
+        started = time.perf_counter()
+        if self.deduper is not None:
+            messages = self.deduper.collapse(messages)
+        if self.event_log is not None:
+            messages = self._stamp(messages)
+            self.event_log.append_messages(messages, batch_id)
+        if batch_id is not None:
+            self.last_batch_id = batch_id
+        self._apply_messages(messages)
+        self.local_metrics = self.analyzer.get_engagement_metrics()
+        self._record_latency('local', time.perf_counter() - started)
+        await self._maybe_checkpoint()
+
+        self._schedule_llm_tasks()
+        self._refresh_insights()
+        return self.cached_insights
+
+    def _apply_messages(self, messages: List[Dict[str, Any]]) -> None:
+        """Fold messages into the local stats, the history, poll votes and the LLM backlog."""
+        self.local_processor.ingest_messages(messages)
+        self.analyzer.record_messages(messages)
+        self.polls.ingest_votes(messages)
+        self._llm_backlog.extend(messages)
+        self._next_seq += len(messages)
+
+    @staticmethod
+    def _stamp(messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Give every message an epoch timestamp, so a replay lands in the same time bins."""
+        now = time.time()
+        return [{**msg, 'timestamp': to_epoch(msg.get('timestamp'), now)} for msg in messages]
+
+    async def _maybe_checkpoint(self) -> None:
+        if self.event_log is not None and time.monotonic() - self._last_snapshot >= self.snapshot_interval:
+            await self.checkpoint()
+
+    async def checkpoint(self) -> None:
+        """Snapshot the aggregate state, covering everything logged so far.
+
+        The snapshot is pickled, compressed and written in a worker thread.
+        Ingest waits for it, since process_messages awaits this; LLM results
+        and API votes can still land meanwhile, so the state they touch is
+        copied first.
+        """
+        started = time.perf_counter()
+        offset = self.event_log.size
+        state = self.get_state()
+        state.update(
+            polls=copy.deepcopy(state['polls']),
+            highlights=copy.deepcopy(state['highlights']),
+            task_results=copy.deepcopy(state['task_results']),
+            analyzer={
+                name: value if name == 'message_history' else copy.deepcopy(value)
+                for name, value in state['analyzer'].items()
             }
-            
-            self.last_update = current_time
-        
+        )
+        await asyncio.get_running_loop().run_in_executor(None, self.event_log.write_snapshot, state, offset)
+        self._last_snapshot = time.monotonic()
+        self._record_latency('snapshot', time.perf_counter() - started)
+
+    def get_state(self) -> Dict[str, Any]:
+        """Picklable state of the controller, its local processor and its analyzer.
+
+        The local processor's stored messages are left out: the aggregates
+        do not need them and the analyzer history keeps the recent ones.
+        """
+        return {
+            'processor': self.local_processor.get_state(include_messages=False),
+            'analyzer': self.analyzer.get_state(),
+            'polls': self.polls,
+            'highlights': self.highlights,
+            'task_results': self.task_results,
+            'last_batch_id': self.last_batch_id
+        }
+
+    def load_state(self, state: Dict[str, Any]) -> None:
+        self.local_processor.load_state(state['processor'])
+        self.analyzer.load_state(state['analyzer'])
+        self.polls = state['polls']
+        self.highlights.close()
+        self.highlights = state['highlights']
+        self.task_results = state['task_results']
+        self.last_batch_id = state.get('last_batch_id')
+
+    def recover(self) -> int:
+        """Resume from the latest snapshot plus the log tail; returns the records replayed.
+
+        LLM tasks are not re-run for replayed messages; they run again on the
+        next batch over the replayed backlog.
+        """
+        started = time.perf_counter()
+        offset, state = self.event_log.load_snapshot()
+        if state is not None:
+            self.load_state(state)
+        replayed = 0
+        for kind, payload, _ in self.event_log.replay(offset):
+            if kind == EventLog.MESSAGES:
+                if isinstance(payload, dict):
+                    self.last_batch_id = payload['batch_id']
+                    payload = payload['messages']
+                self._apply_messages(payload)
+            elif kind == EventLog.VOTE:
+                self.polls.vote(payload['poll_id'], payload['option'], payload['user'], payload['timestamp'])
+            elif kind == EventLog.POLL:
+                self.polls.add(payload)
+            replayed += 1
+        self.local_metrics = self.analyzer.get_engagement_metrics()
+        self._refresh_insights()
+        self._last_snapshot = time.monotonic()
+        self.metrics.inc('recovered_records_total', replayed)
+        self._record_latency('recover', time.perf_counter() - started)
+        return replayed
+
+    def _schedule_llm_tasks(self) -> None:
+        """Start every due LLM task in the background.
+
+        Tasks that are due together and last ran at the same point in the
+        stream share one analyzer call (and one combined request when the
+        analyzer supports it).
+        """
+        now = time.monotonic()
+        groups = defaultdict(list)
+        for task, interval in self.task_intervals.items():
+            last_run = self._task_last_run[task]
+            if (
+                task not in self._tasks_in_flight
+                and self._task_seq[task] < self._next_seq
+                and (last_run is None or now - last_run >= interval)
+            ):
+                groups[self._task_seq[task]].append(task)
+
+        for seq, tasks in groups.items():
+            messages = self._messages_since(seq)
+            for task in tasks:
+                self._task_seq[task] = self._next_seq
+                self._task_last_run[task] = now
+                self._tasks_in_flight.add(task)
+            run = asyncio.create_task(self._run_llm_tasks(tasks, messages))
+            self._llm_runs.add(run)
+            run.add_done_callback(self._llm_runs.discard)
+
+    def _messages_since(self, seq: int) -> List[Dict[str, str]]:
+        """Messages appended after the given sequence number that are still in the backlog."""
+        first_seq = self._next_seq - len(self._llm_backlog)
+        return list(islice(self._llm_backlog, max(seq - first_seq, 0), None))
+
+    async def _run_llm_tasks(self, tasks: List[str], messages: List[Dict[str, str]]) -> None:
+        started = time.perf_counter()
+        try:
+            try:
+                analysis = await self.analyzer.analyze_async(messages, tasks)
+            except Exception as e:
+                self.metrics.inc('errors_total', component='controller', stage='llm')
+                print(f"Error running LLM tasks {tasks}: {e}")
+                analysis = {}
+            # Apply each result on its own, so one bad field doesn't drop the others
+            for task, result in analysis.items():
+                try:
+                    self._apply_task_result(task, result)
+                except Exception as e:
+                    self.metrics.inc('errors_total', component='controller', stage=f'llm:{task}')
+                    print(f"Error applying {task} result: {e}")
+        finally:
+            elapsed = time.perf_counter() - started
+            for task in tasks:
+                self._tasks_in_flight.discard(task)
+                self._record_latency(f'llm:{task}', elapsed)
+            self._refresh_insights()
+
+    async def wait_for_llm_tasks(self) -> Dict[str, Any]:
+        """Wait for in-flight LLM tasks and return the refreshed insights."""
+        while self._llm_runs:
+            await asyncio.gather(*list(self._llm_runs), return_exceptions=True)
         return self.cached_insights
 
+    def _refresh_insights(self) -> None:
+        """Combine the latest local stats and LLM results."""
+        self.cached_insights = {
+            "polls": self.polls.snapshot(),
+            "qa": self.task_results['qa'],
+            "sentiment": self.task_results['sentiment'],
+            "highlights": self.highlights.recent(),
+            "metrics": self.local_metrics,
+            "local": self.local_processor.get_processed_data()
+        }
+        if self.publisher is not None:
+            self.publisher.publish(self.cached_insights)
+
+    def _record_latency(self, name: str, seconds: float) -> None:
+        stats = self.latency.setdefault(name, {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0})
+        ms = seconds * 1000
+        stats['count'] += 1
+        stats['total_ms'] += ms
+        stats['last_ms'] = ms
+        stats['max_ms'] = max(stats['max_ms'], ms)
+        self.metrics.observe('stage_seconds', seconds, component='controller', stage=name)
+
+    def get_latency_metrics(self) -> Dict[str, Any]:
+        """Get per-tier latency: 'local' and one 'llm:<task>' entry per LLM task."""
+        return {
+            name: {
+                'count': stats['count'],
+                'last_ms': stats['last_ms'],
+                'avg_ms': stats['total_ms'] / stats['count'],
+                'max_ms': stats['max_ms']
+            }
+            for name, stats in self.latency.items()
+        }
+
+    def _apply_task_result(self, task: str, result: Any) -> None:
+        if task == 'polls':
+            self._update_polls(result)
+        elif task == 'highlights':
+            self._update_highlights(result)
+        elif task in self.task_results:
+            self.task_results[task] = result
+
     def _update_polls(self, poll_suggestion: Dict[str, Any]) -> None:
-        """Update active polls based on new suggestions."""
-        if not poll_suggestion:
+        """Open a poll for the suggestion if it is valid, relevant and there is room."""
+        if poll_suggestion is None:
             return
-            
-        # Remove expired polls
-        current_time = datetime.now()
-        self.active_polls = [
-            poll for poll in self.active_polls 
-            if current_time - poll['created_at'] < timedelta(minutes=5)
-        ]
-        
-        # Add new poll if it's relevant enough and we don't have too many active polls
-        if (
-            poll_suggestion.get('relevance_score', 0) > 70 
-            and len(self.active_polls) < 2
-        ):
-            new_poll = {
-                **poll_suggestion,
-                'created_at': current_time,
-                'votes': {},
-                'id': len(self.active_polls)
-            }
-            self.active_polls.append(new_poll)
+        if not self.analyzer._is_valid_poll(poll_suggestion):
+            self.metrics.inc('errors_total', component='controller', stage='llm:polls')
+            print(f"Skipping invalid poll suggestion: {poll_suggestion!r}")
+            return
+        poll = self.polls.consider(poll_suggestion)
+        if poll is not None and self.event_log is not None:
+            self.event_log.append_poll(poll)
 
     def _update_highlights(self, new_highlights: List[Dict[str, str]]) -> None:
-        """Update stream highlights."""
-        # Keep only recent highlights
-        current_time = datetime.now()
-        self.current_highlights = [
-            h for h in self.current_highlights 
-            if current_time - h['timestamp'] < timedelta(minutes=30)
-        ]
-        
-        # Add new highlights
-        for highlight in new_highlights:
-            if highlight not in self.current_highlights:
-                self.current_highlights.append({
-                    **highlight,
-                    'timestamp': current_time
-                })
-        
-        # Keep only the most recent highlights
-        self.current_highlights = sorted(
-            self.current_highlights,
-            key=lambda x: x['timestamp'],
-            reverse=True
-        )[:10]
+        """Add new highlights; expired and overflowing ones move to the archive."""
+        self.highlights.add(new_highlights or [])
 
     def record_poll_vote(self, poll_id: int, option: str, user: str) -> Dict[str, Any]:
-        """Record a vote for a poll option."""
-        for poll in self.active_polls:
-            if poll['id'] == poll_id:
-                if user not in poll['votes']:
-                    poll['votes'][user] = option
-                    return {
-                        'success': True,
-                        'poll': poll
-                    }
-                return {
-                    'success': False,
-                    'error': 'User already voted'
-                }
-        return {
-            'success': False,
-            'error': 'Poll not found'
-        }
+        """Record a vote for a poll option (its text or 1-based number)."""
+        now = time.time()
+        result = self.polls.vote(poll_id, option, user, now)
+        if result['success'] and self.event_log is not None:
+            self.event_log.append_vote(poll_id, option, user, now)
+        return result
 
     async def start_monitoring(self, message_queue):
         """Start monitoring chat messages."""
+        self._message_queue = message_queue
+        pump = asyncio.create_task(self._pump_queue(message_queue))
+        try:
+            while True:
+                try:
+                    messages = await self.buffer.get_batch(self.max_batch_size, self.max_batch_delay)
+                    self.last_batch_size = len(messages)
+                    insights = await self.process_messages(messages)
+                    self.batches_processed += 1
+                    for name, value in self.get_ingest_metrics().items():
+                        self.metrics.set(f'ingest_{name}', value)
+
+                    # Insights are pushed by the publisher when one is attached
+                    if self.publisher is None:
+                        print("New insights generated:", json.dumps(insights, indent=2, default=str))
+
+                except Exception as e:
+                    self.metrics.inc('errors_total', component='controller', stage='monitor')
+                    print(f"Error processing messages: {e}")
+        finally:
+            pump.cancel()
+
+    async def _pump_queue(self, message_queue):
+        """Move everything arriving on the queue into the bounded buffer."""
         while True:
-            try:
-                messages = await message_queue.get()
-                insights = await self.process_messages(messages)
-                
-                # Here you would emit the insights to your frontend
-                # For example, using websockets or server-sent events
-                print("New insights generated:", json.dumps(insights, indent=2))
-                
-            except Exception as e:
-                print(f"Error processing messages: {e}")
-            
-            await asyncio.sleep(self.update_interval)
+            self.buffer.put_many(await message_queue.get())
+            # Drain whatever else is already queued without yielding per item
+            while not message_queue.empty():
+                self.buffer.put_many(message_queue.get_nowait())
+
+    def get_ingest_metrics(self) -> Dict[str, Any]:
+        """Get queue depth, lag and overload counters for the ingest loop."""
+        return {
+            "queue_depth": self._message_queue.qsize() if self._message_queue else 0,
+            "pending_messages": len(self.buffer),
+            "pending_lag_seconds": self.buffer.lag(),
+            "last_batch_size": self.last_batch_size,
+            "last_batch_lag_seconds": self.buffer.last_batch_lag,
+            "batches_processed": self.batches_processed,
+            "messages_enqueued": self.buffer.total_enqueued,
+            "messages_dropped": self.buffer.dropped,
+            "messages_coalesced": self.buffer.coalesced,
+            # Every value is exported as an ingest_* gauge, so keep them numeric
+            "messages_collapsed": (
+                self.deduper.messages_in - self.deduper.entries_out - self.deduper.empty_dropped
+                if self.deduper else 0
+            )
+        }
+
+def create_stream_controller(nebius_api_key: str, event_log_path: str = None,
+                             highlight_archive_path: str = None, channel_id: str = None,
+                             event_log_dir: str = None, **analyzer_options):
+    """Create and initialize a new stream controller.
 
-def create_stream_controller(nebius_api_key: str):
-    """Create and initialize a new stream controller."""
+    With event_log_path, events are logged there and any state from a
+    previous run is recovered first. With event_log_dir and a channel_id
+    instead, the log is <event_log_dir>/<channel_id>.log, so a ShardSupervisor
+    can rebuild each channel from its own log.
+    """
     from chat_analyzer import StreamChatAnalyzer
     
-    analyzer = StreamChatAnalyzer(nebius_api_key)
-    controller = StreamController(analyzer)
+    if event_log_path is None and event_log_dir and channel_id is not None:
+        name = re.sub(r'[^\w.-]+', '_', str(channel_id))
+        event_log_path = os.path.join(event_log_dir, f"{name}.log")
+    analyzer = StreamChatAnalyzer(nebius_api_key, **analyzer_options)
+    event_log = EventLog(event_log_path) if event_log_path else None
+    controller = StreamController(
+        analyzer, metrics=analyzer.metrics, event_log=event_log,
+        highlight_archive_path=highlight_archive_path
+    )
+    if event_log is not None:
+        replayed = controller.recover()
+        print(f"Recovered stream state, replayed {replayed} logged events")
     
     return controller
\ No newline at end of file
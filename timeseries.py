@@ -0,0 +1,298 @@
+from typing import List, Dict, Any, Iterable, Tuple
+from collections import Counter, defaultdict
+from datetime import datetime
+from functools import partial
+
+import numpy as np
+
+from timestamps import to_epoch  # re-exported for existing callers
+
+
+DENSE_SPAN_LIMIT = 4096
+
+
+def local_hours(timestamps: np.ndarray) -> np.ndarray:
+    """Local hour of day (0-23) of every epoch timestamp."""
+    # Every UTC offset is a multiple of 15 minutes, so the local hour is
+    # constant within a quarter hour: convert each quarter hour once
+    quarters = (timestamps // 900).astype(np.int64)
+    if not len(quarters):
+        return quarters
+    first = int(quarters.min())
+    span = int(quarters.max()) - first + 1
+    if span <= DENSE_SPAN_LIMIT:
+        # Chat is dense in time: a lookup table avoids sorting
+        distinct, index = range(first, first + span), quarters - first
+    else:
+        distinct, index = np.unique(quarters, return_inverse=True)
+        distinct = distinct.tolist()
+    hours = np.array([datetime.fromtimestamp(q * 900).hour for q in distinct], dtype=np.int64)
+    return hours[index]
+
+
+class ChatTimeSeries:
+    """Per-message timestamps and mood bitmasks in NumPy arrays.
+
+    An entry may stand for several identical messages through its weight.
+    Appends go to plain lists and are moved into the arrays in bulk on the
+    next read, where each new chunk is also folded into two rollups with a
+    few vectorized passes: counts per local hour of day and counts per bin
+    of ``resolution`` seconds. Reading either rollup therefore costs
+    nothing per stored message; any other resolution is binned over the
+    full arrays with one integer division and ``np.bincount``.
+    Mood bits are registered on first use (up to 64).
+
+    With a ``capacity`` only the newest entries are kept in the arrays, so
+    other resolutions cover just those; the rollups still count everything.
+    """
+
+    DEFAULT_RESOLUTION = 60
+    MAX_MOODS = 64
+    INITIAL_CAPACITY = 1024
+
+    def __init__(self, resolution: float = None, moods: Iterable[str] = (), capacity: int = None):
+        self.resolution = resolution or self.DEFAULT_RESOLUTION
+        self.capacity = capacity
+        self.moods = []
+        self._mood_bits = {}
+        for mood in moods:
+            self.mood_bit(mood)
+        self._timestamps = np.empty(self.INITIAL_CAPACITY, dtype=np.float64)
+        self._masks = np.empty(self.INITIAL_CAPACITY, dtype=np.uint64)
+        self._size = 0
+        self._pending_timestamps = []
+        self._pending_masks = []
+        self._pending_weights = []
+        self._weights = np.empty(self.INITIAL_CAPACITY, dtype=np.int64)
+        self._weighted = False  # any weight other than 1 so far
+
+        self._hour_totals = np.zeros(24, dtype=np.int64)
+        self._hour_moods = defaultdict(partial(np.zeros, 24, dtype=np.int64))
+        self._bin_totals = Counter()  # bin index -> messages
+        self._bin_moods = defaultdict(Counter)  # mood -> bin index -> messages
+
+    def __len__(self) -> int:
+        """Number of entries recorded (each may stand for several messages)."""
+        return self._size + len(self._pending_timestamps)
+
+    def mood_bit(self, mood: str) -> int:
+        bit = self._mood_bits.get(mood)
+        if bit is None:
+            if len(self.moods) >= self.MAX_MOODS:
+                raise ValueError(f"At most {self.MAX_MOODS} moods are supported")
+            bit = 1 << len(self.moods)
+            self._mood_bits[mood] = bit
+            self.moods.append(mood)
+        return bit
+
+    def append(self, timestamp: float, moods: Iterable[str] = (), weight: int = 1) -> None:
+        """Record a message, or ``weight`` identical messages, at an epoch timestamp."""
+        mask = 0
+        for mood in moods:
+            mask |= self._mood_bits.get(mood) or self.mood_bit(mood)
+        self._pending_timestamps.append(timestamp)
+        self._pending_masks.append(mask)
+        self._pending_weights.append(weight)
+
+    def arrays(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Timestamps and mood masks of every entry, in arrival order."""
+        if self._pending_timestamps:
+            self._flush()
+        return self._timestamps[:self._size], self._masks[:self._size]
+
+    def weights(self) -> np.ndarray:
+        """Messages each entry stands for, or None while every weight is 1."""
+        self.arrays()
+        return self._weights[:self._size] if self._weighted else None
+
+    def _flush(self) -> None:
+        timestamps = np.array(self._pending_timestamps, dtype=np.float64)
+        masks = np.array(self._pending_masks, dtype=np.uint64)
+        weights = np.array(self._pending_weights, dtype=np.int64)
+        self._pending_timestamps = []
+        self._pending_masks = []
+        self._pending_weights = []
+        chunk_weights = weights if (weights != 1).any() else None
+        self._weighted = self._weighted or chunk_weights is not None
+        self._store(timestamps, masks, weights)
+
+        hours = local_hours(timestamps)
+        bins = np.floor(timestamps / self.resolution).astype(np.int64)
+        self._hour_totals += self._count(hours, chunk_weights, 24)
+        self._add_bins(self._bin_totals, bins, chunk_weights)
+        for mood, has_mood in self._mood_selections(masks):
+            mood_weights = None if chunk_weights is None else chunk_weights[has_mood]
+            self._hour_moods[mood] += self._count(hours[has_mood], mood_weights, 24)
+            self._add_bins(self._bin_moods[mood], bins[has_mood], mood_weights)
+
+    def _store(self, timestamps: np.ndarray, masks: np.ndarray, weights: np.ndarray) -> None:
+        """Append entries to the arrays, doubling their capacity as needed."""
+        if self.capacity is not None and self._size + len(timestamps) > self.capacity:
+            # Drop the oldest entries: incoming ones past the capacity, then stored ones
+            timestamps, masks, weights = (
+                timestamps[-self.capacity:], masks[-self.capacity:], weights[-self.capacity:]
+            )
+            keep = self.capacity - len(timestamps)
+            drop = self._size - keep
+            for column in (self._timestamps, self._masks, self._weights):
+                column[:keep] = column[drop:self._size]
+            self._size = keep
+        end = self._size + len(timestamps)
+        if end > len(self._timestamps):
+            capacity = max(end, 2 * len(self._timestamps))
+            self._timestamps = np.resize(self._timestamps, capacity)
+            self._masks = np.resize(self._masks, capacity)
+            self._weights = np.resize(self._weights, capacity)
+        self._timestamps[self._size:end] = timestamps
+        self._masks[self._size:end] = masks
+        self._weights[self._size:end] = weights
+        self._size = end
+
+    def merge(self, other: 'ChatTimeSeries') -> None:
+        """Append another series' entries and add its rollups into this one's.
+
+        Mood bits are remapped by name. Both series must share a resolution.
+        """
+        if other.resolution != self.resolution:
+            raise ValueError("Cannot merge time series with different resolutions")
+        timestamps, masks = other.arrays()
+        self.arrays()
+        remapped = np.zeros(len(masks), dtype=np.uint64)
+        for mood, has_mood in other._mood_selections(masks):
+            remapped[has_mood] |= np.uint64(self.mood_bit(mood))
+        self._store(timestamps, remapped, other._weights[:other._size])
+        self._weighted = self._weighted or other._weighted
+
+        self._hour_totals += other._hour_totals
+        self._bin_totals.update(other._bin_totals)
+        for mood, counts in other._hour_moods.items():
+            self._hour_moods[mood] += counts
+        for mood, bins in other._bin_moods.items():
+            self._bin_moods[mood].update(bins)
+
+    @staticmethod
+    def _count(bins: np.ndarray, weights: np.ndarray, size: int) -> np.ndarray:
+        """Weighted message count per bin."""
+        if weights is None:
+            return np.bincount(bins, minlength=size)
+        return np.bincount(bins, weights=weights, minlength=size).astype(np.int64)
+
+    def _mood_selections(self, masks: np.ndarray):
+        """(mood, boolean selector) for every mood present in masks."""
+        present = np.bitwise_or.reduce(masks) if len(masks) else 0
+        for mood in self.moods:
+            bit = np.uint64(self._mood_bits[mood])
+            if present & bit:
+                yield mood, (masks & bit) != 0
+
+    @classmethod
+    def _add_bins(cls, counter: Counter, bins: np.ndarray, weights: np.ndarray) -> None:
+        if not len(bins):
+            return
+        first = int(bins.min())
+        if int(bins.max()) - first < DENSE_SPAN_LIMIT:
+            counts = cls._count(bins - first, weights, 0)
+            distinct = np.flatnonzero(counts)
+            counts = counts[distinct]
+            distinct += first
+        else:
+            distinct, inverse = np.unique(bins, return_inverse=True)
+            counts = cls._count(inverse, weights, len(distinct))
+        for bin_index, count in zip(distinct.tolist(), counts.tolist()):
+            counter[bin_index] += count
+
+    def series(self, resolution: float = None,
+               max_bins: int = None) -> Tuple[np.ndarray, np.ndarray, Dict[str, np.ndarray]]:
+        """Bin start times (epoch seconds), message counts and per-mood counts.
+
+        Bins run contiguously up to the last non-empty one, from the first
+        non-empty one or, with max_bins, from max_bins - 1 bins before the last.
+        """
+        resolution = resolution or self.resolution
+        timestamps, masks = self.arrays()
+        weights = self.weights()
+        if not self._size:
+            return np.empty(0), np.empty(0, dtype=np.int64), {}
+
+        if resolution == self.resolution:
+            first, last = min(self._bin_totals), max(self._bin_totals)
+            if max_bins:
+                first = max(first, last - max_bins + 1)
+            size = last - first + 1
+            totals = self._dense(self._bin_totals, first, size)
+            moods = {mood: self._dense(bins, first, size) for mood, bins in self._bin_moods.items()}
+        else:
+            bins = np.floor(timestamps / resolution).astype(np.int64)
+            first, last = int(bins.min()), int(bins.max())
+            if max_bins and last - first + 1 > max_bins:
+                first = last - max_bins + 1
+                keep = bins >= first
+                bins, masks = bins[keep], masks[keep]
+                weights = None if weights is None else weights[keep]
+            bins -= first
+            size = last - first + 1
+            totals = self._count(bins, weights, size)
+            moods = {
+                mood: self._count(bins[has_mood], None if weights is None else weights[has_mood], size)
+                for mood, has_mood in self._mood_selections(masks)
+            }
+        return (first + np.arange(size)) * float(resolution), totals, moods
+
+    @staticmethod
+    def _dense(counter: Counter, first: int, size: int) -> np.ndarray:
+        dense = np.zeros(size, dtype=np.int64)
+        if counter:
+            keys = np.fromiter(counter.keys(), dtype=np.int64, count=len(counter))
+            values = np.fromiter(counter.values(), dtype=np.int64, count=len(counter))
+            in_range = (keys >= first) & (keys < first + size)
+            dense[keys[in_range] - first] = values[in_range]
+        return dense
+
+    def messages_per_second(self, resolution: float = None,
+                            max_bins: int = None) -> List[Dict[str, Any]]:
+        """Message rate per bin of ``resolution`` seconds."""
+        resolution = resolution or self.resolution
+        starts, totals, _ = self.series(resolution, max_bins)
+        return [
+            {'start': start, 'messages': count, 'per_second': count / resolution}
+            for start, count in zip(starts.tolist(), totals.tolist())
+        ]
+
+    def mood_series(self, resolution: float = None, max_bins: int = None) -> Dict[str, Any]:
+        """Message and per-mood counts over time at the given resolution."""
+        resolution = resolution or self.resolution
+        starts, totals, moods = self.series(resolution, max_bins)
+        return {
+            'resolution': resolution,
+            'starts': starts.tolist(),
+            'totals': totals.tolist(),
+            'moods': {mood: counts.tolist() for mood, counts in moods.items()}
+        }
+
+    def peak_times(self, resolution: float = None, limit: int = 3) -> List[Dict[str, Any]]:
+        """Busiest bins of ``resolution`` seconds, busiest first."""
+        starts, totals, _ = self.series(resolution)
+        if not len(totals):
+            return []
+        top = np.argsort(-totals, kind='stable')[:limit]
+        total = totals.sum()
+        return [
+            {
+                'start': float(starts[i]),
+                'message_count': int(totals[i]),
+                'percentage': float(totals[i] / total * 100)
+            }
+            for i in top
+        ]
+
+    def hour_of_day_heatmap(self) -> Dict[str, Dict[str, Any]]:
+        """Message and mood counts per local hour of day, keyed '00'..'23'."""
+        self.arrays()
+        heatmap = {}
+        for hour in range(24):
+            moods = {
+                mood: int(counts[hour])
+                for mood, counts in self._hour_moods.items() if counts[hour]
+            }
+            heatmap[str(hour).zfill(2)] = {'total': int(self._hour_totals[hour]), 'moods': moods}
+        return heatmap
@@ -0,0 +1,20 @@
+from typing import Any
+from datetime import datetime
+import time
+
+
+def to_epoch(timestamp: Any, default: float = None) -> float:
+    """Normalize datetime/epoch/ISO-8601 timestamps to epoch seconds.
+
+    Missing or unparseable timestamps fall back to ``default`` (now if unset).
+    """
+    if isinstance(timestamp, datetime):
+        return timestamp.timestamp()
+    if isinstance(timestamp, (int, float)):
+        return float(timestamp)
+    if isinstance(timestamp, str):
+        try:
+            return datetime.fromisoformat(timestamp.replace('Z', '+00:00')).timestamp()
+        except ValueError:
+            pass
+    return time.time() if default is None else default
@@ -0,0 +1,239 @@
+from typing import List, Dict, Any, Iterable, Iterator, Tuple
+from collections import Counter, defaultdict
+import copy
+import heapq
+import math
+
+
+class SpaceSavingSketch:
+    """Bounded heavy-hitter counter using the Space-Saving algorithm."""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.counts = {}
+        self._heap = []  # one (count, item) entry per item, refreshed lazily when popped
+
+    def add(self, item: str, count: int = 1) -> None:
+        """Count an item, replacing the current minimum when full."""
+        if item in self.counts:
+            # Its heap entry is now too low; _pop_min brings it up to date
+            self.counts[item] += count
+            return
+        if len(self.counts) < self.capacity:
+            self.counts[item] = count
+        else:
+            victim, victim_count = self._pop_min()
+            del self.counts[victim]
+            self.counts[item] = victim_count + count
+        heapq.heappush(self._heap, (self.counts[item], item))
+
+    def _pop_min(self) -> Tuple[str, int]:
+        """Pop the item with the smallest current count."""
+        while True:
+            count, item = heapq.heappop(self._heap)
+            current = self.counts[item]
+            if current == count:
+                return item, count
+            heapq.heappush(self._heap, (current, item))
+
+    def merge(self, other: 'SpaceSavingSketch') -> None:
+        """Add another sketch's counts (e.g. from another slice of the stream)."""
+        for item, count in other.counts.items():
+            self.add(item, count)
+
+    def most_common(self, n: int) -> List[Tuple[str, int]]:
+        return heapq.nlargest(n, self.counts.items(), key=lambda x: x[1])
+
+    def items(self):
+        return self.counts.items()
+
+    def __len__(self) -> int:
+        return len(self.counts)
+
+
+class TrendingIndex:
+    """Time-windowed and exponentially decayed top-K word index."""
+
+    BUCKET_SECONDS = 10
+    WINDOWS = {'1m': 60, '5m': 300, '15m': 900}
+    BUCKET_CAPACITY = 500
+    DECAY_HALF_LIFE = 120  # seconds
+    DECAY_CAPACITY = 1000
+
+    def __init__(self, bucket_seconds: int = None, windows: Dict[str, int] = None,
+                 bucket_capacity: int = None, half_life: float = None,
+                 decay_capacity: int = None):
+        self.bucket_seconds = bucket_seconds or self.BUCKET_SECONDS
+        self.windows = windows or dict(self.WINDOWS)
+        self.bucket_capacity = bucket_capacity or self.BUCKET_CAPACITY
+        self.half_life = half_life or self.DECAY_HALF_LIFE
+        self.decay_capacity = decay_capacity or self.DECAY_CAPACITY
+
+        # Sealed buckets by id, summed into each window's running totals
+        self._buckets = {}
+        self._window_totals = {name: Counter() for name in self.windows}
+        self._window_oldest = {name: 0 for name in self.windows}
+        self._first_bucket_id = 0
+        self._next_bucket_id = 0
+        self._open_start = None
+        self._open = SpaceSavingSketch(self.bucket_capacity)
+
+        self._decayed = {}  # word -> (score, last_update)
+        self._decay_rate = math.log(2) / self.half_life
+        self.latest_time = None
+
+    def add(self, words: Iterable[str], timestamp: float, weight: int = 1) -> None:
+        """Count words seen in one message (or weight identical ones) at an epoch timestamp."""
+        self._advance(timestamp)
+        for word in words:
+            self._open.add(word, weight)
+            score, last = self._decayed.get(word, (0.0, timestamp))
+            self._decayed[word] = (self._decay(score, timestamp - last) + weight, timestamp)
+
+        if len(self._decayed) > 2 * self.decay_capacity:
+            self._prune_decayed()
+
+    def top_window(self, window: str, k: int = 10) -> List[Dict[str, Any]]:
+        """Return the top-K words within a sliding window such as '5m'."""
+        if window not in self.windows:
+            raise ValueError(f"Unknown window: {window}")
+        if self.latest_time is not None:
+            self._advance(self.latest_time)
+
+        top_words = heapq.nlargest(k, self._window_items(window), key=lambda x: x[1])
+        return [{'topic': word, 'count': count} for word, count in top_words]
+
+    def top_windows(self, k: int = 10) -> Dict[str, List[Dict[str, Any]]]:
+        """Return the top-K words for every configured window."""
+        return {name: self.top_window(name, k) for name in self.windows}
+
+    def trending_now(self, k: int = 10) -> List[Dict[str, Any]]:
+        """Return the top-K words by exponentially decayed score."""
+        if self.latest_time is None:
+            return []
+
+        top_words = heapq.nlargest(k, self._decayed_scores(), key=lambda x: x[1])
+        return [{'topic': word, 'score': round(score, 3)} for word, score in top_words]
+
+    def _decay(self, score: float, elapsed: float) -> float:
+        """Decay a score by the elapsed number of seconds."""
+        return score * math.exp(-self._decay_rate * max(elapsed, 0))
+
+    def _decayed_scores(self) -> Iterator[Tuple[str, float]]:
+        return self._decayed_scores_at(self.latest_time)
+
+    def _prune_decayed(self) -> None:
+        """Keep only the highest decayed scores so memory stays bounded."""
+        keep = heapq.nlargest(self.decay_capacity, self._decayed_scores(), key=lambda x: x[1])
+        self._decayed = {word: (score, self.latest_time) for word, score in keep}
+
+    def _window_items(self, window: str) -> Iterator[Tuple[str, int]]:
+        """Yield window totals merged with the still-open bucket."""
+        totals = self._window_totals[window]
+        open_counts = self._open.counts
+        for word, count in totals.items():
+            yield word, count + open_counts.get(word, 0)
+        for word, count in open_counts.items():
+            if word not in totals:
+                yield word, count
+
+    def _advance(self, timestamp: float) -> None:
+        """Seal the open bucket and evict expired buckets up to timestamp."""
+        if self.latest_time is None or timestamp > self.latest_time:
+            self.latest_time = timestamp
+
+        bucket_start = timestamp - timestamp % self.bucket_seconds
+        if self._open_start is None:
+            self._open_start = bucket_start
+        elif bucket_start > self._open_start:
+            self._seal_open_bucket()
+            self._open_start = bucket_start
+
+        for name, length in self.windows.items():
+            totals = self._window_totals[name]
+            oldest = self._window_oldest[name]
+            while oldest < self._next_bucket_id and \
+                    self._buckets[oldest][0] + self.bucket_seconds <= self.latest_time - length:
+                for word, count in self._buckets[oldest][1].items():
+                    remaining = totals[word] - count
+                    if remaining > 0:
+                        totals[word] = remaining
+                    else:
+                        del totals[word]
+                oldest += 1
+            self._window_oldest[name] = oldest
+
+        # Drop buckets no window references any more
+        first_live = min(self._window_oldest.values())
+        while self._first_bucket_id < first_live:
+            del self._buckets[self._first_bucket_id]
+            self._first_bucket_id += 1
+
+    def merge(self, other: 'TrendingIndex') -> None:
+        """Fold another index (e.g. built over another slice of the stream) into this one.
+
+        Buckets with the same start are summed (trimmed to bucket_capacity)
+        and the windows are rebuilt as of the later latest time; decayed
+        scores are decayed to a common time and added, which is exact
+        because the decay is linear.
+        """
+        if other.latest_time is None:
+            return
+        if self.latest_time is None:
+            self.__dict__.update(copy.deepcopy(other.__dict__))
+            return
+        if (self.bucket_seconds, self.windows) != (other.bucket_seconds, other.windows):
+            raise ValueError("Cannot merge trending indexes with different buckets or windows")
+
+        buckets = defaultdict(Counter)
+        for index in (self, other):
+            for start, counts in index._live_buckets():
+                buckets[start].update(counts)
+        latest_time = max(self.latest_time, other.latest_time)
+
+        decayed = {}
+        for index in (self, other):
+            for word, score in index._decayed_scores_at(latest_time):
+                decayed[word] = decayed.get(word, 0.0) + score
+
+        # Rebuild the buckets and windows from scratch, oldest bucket first
+        self._buckets = {}
+        self._window_totals = {name: Counter() for name in self.windows}
+        self._window_oldest = {name: 0 for name in self.windows}
+        self._first_bucket_id = 0
+        self._next_bucket_id = 0
+        self._open_start = None
+        self._open = SpaceSavingSketch(self.bucket_capacity)
+        self.latest_time = None
+        for start in sorted(buckets):
+            counts = buckets[start]
+            if len(counts) > self.bucket_capacity:
+                counts = dict(counts.most_common(self.bucket_capacity))
+            self._advance(start)
+            for word, count in counts.items():
+                self._open.add(word, count)
+        self._advance(latest_time)
+
+        self._decayed = {word: (score, latest_time) for word, score in decayed.items()}
+        if len(self._decayed) > 2 * self.decay_capacity:
+            self._prune_decayed()
+
+    def _live_buckets(self) -> Iterator[Tuple[float, Dict[str, int]]]:
+        """(start, counts) of every retained sealed bucket and the open one."""
+        for bucket_id in range(self._first_bucket_id, self._next_bucket_id):
+            yield self._buckets[bucket_id]
+        if self._open_start is not None:
+            yield self._open_start, self._open.counts
+
+    def _decayed_scores_at(self, timestamp: float) -> Iterator[Tuple[str, float]]:
+        for word, (score, last) in self._decayed.items():
+            yield word, self._decay(score, timestamp - last)
+
+    def _seal_open_bucket(self) -> None:
+        """Move the open bucket into every window's running totals."""
+        counts = dict(self._open.items())
+        self._buckets[self._next_bucket_id] = (self._open_start, counts)
+        self._next_bucket_id += 1
+        for totals in self._window_totals.values():
+            totals.update(counts)
+        self._open = SpaceSavingSketch(self.bucket_capacity)